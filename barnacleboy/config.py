@@ -1,6 +1,6 @@
 from functools import lru_cache
 from pathlib import Path
-from typing import List
+from typing import List, Optional
 
 from pydantic import BaseSettings
 
@@ -11,6 +11,16 @@ class Settings(BaseSettings):
     TEMPLATE_DIR: Path = Path(__file__).parent / "templates"
     VALID_THEMES: List[str] = ["default", "forest", "dark", "neutral", "base"]
     VALID_MERMAID_CLI_EXTENSIONS: List[str] = [".png", ".svg", ".pdf", ".md"]
+    MERMAID_CLI: str = "mmdc"
+    RENDER_TIMEOUT: float = 120.0
+    RENDER_MEMORY_LIMIT: Optional[int] = None
+    RENDER_RETRIES: int = 1
+    RENDER_BACKOFF: float = 1.0
+    RENDERER: str = "mmdc"
+    NOTEBOOK_RENDERER: Optional[str] = None
+    RENDER_WORKERS: Optional[int] = None
+    RENDER_URL: str = "https://kroki.io"
+    RENDER_POOL_SIZE: int = 4
 
 
 @lru_cache()
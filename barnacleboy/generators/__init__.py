@@ -0,0 +1 @@
+"""Generators that build diagrams from other sources."""
@@ -0,0 +1,129 @@
+"""Flowcharts of the call graph of a cProfile profile.
+
+Profiles are pruned before any diagram element is created, so profiles with tens
+of thousands of functions only cost a scan over the raw statistics.
+"""
+
+import heapq
+import os
+import pstats
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from barnacleboy import instrumentation
+from barnacleboy.mermaid.flowchart import Flowchart, Node, Relationship, quote_label
+
+Function = Tuple[str, int, str]
+
+COLD_COLOR = (255, 245, 204)
+HOT_COLOR = (204, 0, 0)
+
+
+def function_name(function: Function) -> str:
+    """Get a readable name of a profiled function.
+
+    Args:
+        function: The (filename, line number, function name) key of pstats.
+
+    Returns:
+        The name, e.g. "run (pipeline.py:12)".
+
+    """
+    filename, line, name = function
+    if filename == "~":
+        return name
+    return f"{name} ({os.path.basename(filename)}:{line})"
+
+
+def hotness_color(fraction: float) -> str:
+    """Interpolate between a cold and a hot fill color.
+
+    Args:
+        fraction: The fraction of the total time, between 0 and 1.
+
+    Returns:
+        A hex color.
+
+    """
+    fraction = min(max(fraction, 0.0), 1.0)
+    channels = (
+        round(cold + (hot - cold) * fraction)
+        for cold, hot in zip(COLD_COLOR, HOT_COLOR)
+    )
+    return "#" + "".join(f"{channel:02x}" for channel in channels)
+
+
+def _load(profile: Union[pstats.Stats, str, Path]) -> pstats.Stats:
+    if isinstance(profile, pstats.Stats):
+        return profile
+    return pstats.Stats(str(profile))
+
+
+def call_graph(
+    profile: Union[pstats.Stats, str, Path],
+    threshold: float = 0.01,
+    max_nodes: Optional[int] = 200,
+    **kwargs: Any,
+) -> Flowchart:
+    """Build a call graph flowchart from a profile.
+
+    Functions are kept if their cumulative time is at least `threshold` of the
+    total time of the profile. Edges are labelled with the number of calls and
+    the cumulative time spent in the callee when called from the caller. Node
+    fill colors range from pale yellow to red by cumulative time.
+
+    Args:
+        profile: A pstats.Stats object or the path to a profile written by
+            cProfile, e.g. with `python -m cProfile -o out.prof`.
+        threshold: The minimum fraction of the total time of a function.
+        max_nodes: The maximum number of functions, the slowest are kept.
+        **kwargs: Keyword arguments to pass to the Flowchart constructor.
+
+    Returns:
+        The flowchart.
+
+    """
+    stats: Dict[Function, Tuple[Any, ...]] = _load(profile).stats  # type: ignore
+    if "orientation" not in kwargs:
+        kwargs["orientation"] = "LR"
+
+    with instrumentation.span("call_graph.prune", functions=len(stats)):
+        total = max(
+            [float(entry[3]) for entry in stats.values()]
+            + [sum(float(entry[2]) for entry in stats.values())]
+        )
+        minimum = threshold * total
+        kept = [function for function, entry in stats.items() if entry[3] >= minimum]
+        if max_nodes is not None and len(kept) > max_nodes:
+            kept = heapq.nlargest(max_nodes, kept, key=lambda f: stats[f][3])
+        kept.sort(key=lambda f: -stats[f][3])
+
+    with instrumentation.span("call_graph.build", functions=len(kept)):
+        nodes: Dict[Function, Node] = {}
+        for function in kept:
+            fraction = stats[function][3] / total if total else 0.0
+            nodes[function] = Node(
+                quote_label(function_name(function)),
+                style={"fill": hotness_color(fraction)},
+            )
+
+        relationships: List[Relationship] = []
+        for function in kept:
+            callers = stats[function][4]
+            for caller, call_stats in callers.items():
+                if caller not in nodes:
+                    continue
+                if isinstance(call_stats, tuple):
+                    n_calls, cumulative = call_stats[1], call_stats[3]
+                    label = f"{n_calls} calls, {cumulative:.3g}s"
+                else:
+                    label = f"{call_stats} calls"
+                relationships.append(
+                    Relationship(
+                        [nodes[caller], nodes[function]],
+                        output_arrow=">",
+                        label=label,
+                    )
+                )
+
+    return Flowchart(nodes=list(nodes.values()), relationships=relationships, **kwargs)
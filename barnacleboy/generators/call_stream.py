@@ -0,0 +1,116 @@
+"""Flowcharts of the heaviest calls in an unbounded stream of calls.
+
+Calls, e.g. (caller, callee) pairs parsed from request logs, are counted with the
+Space-Saving algorithm in bounded memory, see `barnacleboy.mermaid.heavy_hitters`.
+Every call that was made more than `total / capacity` times is guaranteed to be
+counted, and counts overestimate the true count by at most their error.
+
+Events are counted in batches: a batch is first tallied with
+`collections.Counter`, and every distinct call is then added once with its
+weight.
+"""
+
+import threading
+from collections import Counter
+from typing import Any, Dict, Iterable, Tuple
+
+from barnacleboy import instrumentation
+from barnacleboy.generators.call_graph import hotness_color
+from barnacleboy.mermaid.flowchart import Flowchart, Node, Relationship, quote_label
+from barnacleboy.mermaid.heavy_hitters import HeavyHitters
+
+Call = Tuple[str, str]
+
+
+class CallStream:
+    """Aggregates a stream of calls into a flowchart of the heaviest calls.
+
+    Calls and the services they connect are counted separately, so a service
+    that is called from many places is counted as such. Counting and snapshots
+    can happen in different threads.
+
+    Args:
+        capacity: The maximum number of calls that are counted.
+        service_capacity: The maximum number of services that are counted,
+            defaults to the capacity.
+
+    """
+
+    def __init__(self, capacity: int = 10000, service_capacity: int = 0) -> None:
+        self.calls: HeavyHitters[Call] = HeavyHitters(capacity)
+        self.services: HeavyHitters[str] = HeavyHitters(service_capacity or capacity)
+        self._lock = threading.Lock()
+
+    def add(self, caller: str, callee: str) -> None:
+        """Count a single call.
+
+        Args:
+            caller: The name of the calling service.
+            callee: The name of the called service.
+
+        """
+        with self._lock:
+            self.calls.add((caller, callee))
+            self.services.add(caller)
+            self.services.add(callee)
+
+    def update(self, calls: Iterable[Call]) -> None:
+        """Count a batch of calls, which is much faster than adding them one by one.
+
+        Args:
+            calls: (caller, callee) pairs.
+
+        """
+        weights = Counter(calls)
+        services: Dict[str, int] = Counter()
+        for (caller, callee), weight in weights.items():
+            services[caller] += weight
+            services[callee] += weight
+        with self._lock:
+            self.calls.merge(weights)
+            self.services.merge(services)
+
+    def flowchart(self, k: int = 50, **kwargs: Any) -> Flowchart:
+        """Create a flowchart of the calls with the highest counts so far.
+
+        Edges are labelled with the approximate number of calls, prefixed with
+        "~" if it may be overestimated. Service fill colors range from pale
+        yellow to red by their share of the calls.
+
+        Args:
+            k: The maximum number of calls.
+            **kwargs: Keyword arguments to pass to the Flowchart constructor.
+
+        Returns:
+            The flowchart.
+
+        """
+        with self._lock:
+            top = self.calls.top(k)
+            service_counts = dict(self.services.counts)
+            total = self.calls.total
+
+        if "orientation" not in kwargs:
+            kwargs["orientation"] = "LR"
+        with instrumentation.span("call_stream.flowchart", calls=len(top)):
+            nodes: Dict[str, Node] = {}
+
+            def node(service: str) -> Node:
+                if service not in nodes:
+                    fraction = service_counts.get(service, 0) / total if total else 0.0
+                    nodes[service] = Node(
+                        quote_label(service), style={"fill": hotness_color(fraction)}
+                    )
+                return nodes[service]
+
+            relationships = [
+                Relationship(
+                    [node(caller), node(callee)],
+                    output_arrow=">",
+                    label=f"~{count}" if error else str(count),
+                )
+                for (caller, callee), count, error in top
+            ]
+        return Flowchart(
+            nodes=list(nodes.values()), relationships=relationships, **kwargs
+        )
@@ -0,0 +1,393 @@
+"""Flowcharts of the class relationships in a Python source tree.
+
+Source files are parsed with `ast`, so no code is imported or executed. Files are
+parsed in a process pool and the results are cached per file; a file is only
+parsed again when both its modification time and its content hash changed.
+"""
+
+import ast
+import dataclasses
+import hashlib
+import json
+import os
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple, Union
+
+from barnacleboy import instrumentation
+from barnacleboy.mermaid.flowchart import Flowchart, Node, Relationship, Subgraph
+
+CACHE_VERSION = 1
+
+
+@dataclasses.dataclass
+class ClassInfo:
+    """A class found in a source file.
+
+    Args:
+        module: The dotted name of the module defining the class.
+        name: The name of the class.
+        bases: The qualified names of the base classes.
+        attributes: The qualified names of classes used by attributes, mapped to
+            the names of those attributes.
+
+    """
+
+    module: str
+    name: str
+    bases: List[str] = dataclasses.field(default_factory=list)
+    attributes: Dict[str, List[str]] = dataclasses.field(default_factory=dict)
+
+    @property
+    def qualified_name(self) -> str:
+        """The dotted name of the class."""
+        return f"{self.module}.{self.name}"
+
+
+def module_name(path: Path, root: Path) -> str:
+    """Get the dotted module name of a source file relative to a root directory.
+
+    Args:
+        path: The path to the source file.
+        root: The root of the source tree.
+
+    Returns:
+        The module name, e.g. "package.module" for "package/module.py".
+
+    """
+    parts = list(path.relative_to(root).with_suffix("").parts)
+    if parts[-1] == "__init__" and len(parts) > 1:
+        parts.pop()
+    return ".".join(parts)
+
+
+def _dotted_name(node: ast.AST) -> Optional[str]:
+    """Get the dotted name of a Name or Attribute expression."""
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Attribute):
+        value = _dotted_name(node.value)
+        return f"{value}.{node.attr}" if value else None
+    if isinstance(node, ast.Subscript):
+        return _dotted_name(node.value)
+    if isinstance(node, ast.Call):
+        return _dotted_name(node.func)
+    return None
+
+
+def _annotation_names(annotation: Optional[ast.AST]) -> Iterator[str]:
+    """Get all names in an annotation, e.g. "A" and "B" in Dict[A, List["B"]]."""
+    if annotation is None:
+        return
+    for node in ast.walk(annotation):
+        if isinstance(node, ast.Constant) and isinstance(node.value, str):
+            try:
+                yield from _annotation_names(ast.parse(node.value, mode="eval"))
+            except SyntaxError:
+                continue
+        elif isinstance(node, (ast.Name, ast.Attribute)):
+            name = _dotted_name(node)
+            if name:
+                yield name
+
+
+class _ModuleVisitor:
+    """Extracts the classes of a module and resolves names through its imports."""
+
+    def __init__(self, module: str, is_package: bool) -> None:
+        self.module = module
+        self.package = module if is_package else module.rpartition(".")[0]
+        self.imports: Dict[str, str] = {}
+        self.classes: List[ClassInfo] = []
+        self.defined: Set[str] = set()
+
+    def visit(self, tree: ast.Module) -> List[ClassInfo]:
+        class_nodes = []
+        for node in tree.body:
+            if isinstance(node, ast.Import):
+                for alias in node.names:
+                    self.imports[alias.asname or alias.name.split(".")[0]] = (
+                        alias.name if alias.asname else alias.name.split(".")[0]
+                    )
+            elif isinstance(node, ast.ImportFrom):
+                base = self._resolve_relative(node.module, node.level)
+                for alias in node.names:
+                    self.imports[alias.asname or alias.name] = f"{base}.{alias.name}"
+            elif isinstance(node, ast.ClassDef):
+                class_nodes.append(node)
+                self.defined.add(node.name)
+        return [self._visit_class(node) for node in class_nodes]
+
+    def _resolve_relative(self, module: Optional[str], level: int) -> str:
+        if not level:
+            return module or ""
+        package = self.package.split(".") if self.package else []
+        package = package[: len(package) - (level - 1)] if level > 1 else package
+        return ".".join(package + ([module] if module else []))
+
+    def qualify(self, name: str) -> str:
+        head, _, tail = name.partition(".")
+        if head in self.imports:
+            return self.imports[head] + (f".{tail}" if tail else "")
+        if head in self.defined:
+            return f"{self.module}.{name}"
+        return name
+
+    def _visit_class(self, node: ast.ClassDef) -> ClassInfo:
+        info = ClassInfo(self.module, node.name)
+        for base in node.bases:
+            name = _dotted_name(base)
+            if name:
+                info.bases.append(self.qualify(name))
+
+        def add(attribute: str, names: Iterator[str]) -> None:
+            for name in names:
+                qualified = self.qualify(name)
+                if attribute not in info.attributes.setdefault(qualified, []):
+                    info.attributes[qualified].append(attribute)
+
+        for statement in node.body:
+            if isinstance(statement, ast.AnnAssign) and isinstance(
+                statement.target, ast.Name
+            ):
+                add(statement.target.id, _annotation_names(statement.annotation))
+            elif (
+                isinstance(statement, ast.FunctionDef) and statement.name == "__init__"
+            ):
+                for child in ast.walk(statement):
+                    target: Optional[ast.expr] = None
+                    value: Optional[ast.expr] = None
+                    annotation: Optional[ast.expr] = None
+                    if isinstance(child, ast.AnnAssign):
+                        target, value = child.target, child.value
+                        annotation = child.annotation
+                    elif isinstance(child, ast.Assign) and len(child.targets) == 1:
+                        target, value = child.targets[0], child.value
+                    if not (
+                        isinstance(target, ast.Attribute)
+                        and isinstance(target.value, ast.Name)
+                        and target.value.id == "self"
+                    ):
+                        continue
+                    add(target.attr, _annotation_names(annotation))
+                    if isinstance(value, ast.Call):
+                        name = _dotted_name(value.func)
+                        if name and name.split(".")[-1][:1].isupper():
+                            add(target.attr, iter([name]))
+        return info
+
+
+def scan_file(path: Union[str, Path], module: str) -> List[ClassInfo]:
+    """Extract the classes of a source file.
+
+    Args:
+        path: The path to the source file.
+        module: The dotted name of the module.
+
+    Returns:
+        The classes defined at the top level of the file.
+
+    """
+    path = Path(path)
+    tree = ast.parse(path.read_bytes(), filename=str(path))
+    return _ModuleVisitor(module, path.name == "__init__.py").visit(tree)
+
+
+def _scan_file_safe(path: str, module: str) -> Optional[List[Dict[str, Any]]]:
+    """Scan a file in a worker process; returns None on syntax errors."""
+    try:
+        return [dataclasses.asdict(info) for info in scan_file(path, module)]
+    except (SyntaxError, ValueError):
+        return None
+
+
+class ClassScanner:
+    """Scans a source tree for classes, caching the results per file."""
+
+    def __init__(
+        self,
+        root: Union[str, Path],
+        cache_dir: Optional[Union[str, Path]] = None,
+        n_jobs: Optional[int] = None,
+    ) -> None:
+        """Initialize a class scanner.
+
+        Args:
+            root: The root of the source tree; module names are relative to it.
+            cache_dir: The directory to store the cache in, no caching if None.
+            n_jobs: The number of processes to parse with, defaults to the number
+                of CPUs. With 1, files are parsed in the current process.
+
+        """
+        self.root = Path(root)
+        self.cache_file = (
+            Path(cache_dir) / "class_relationships.json" if cache_dir else None
+        )
+        self.n_jobs = n_jobs or os.cpu_count() or 1
+        self.parsed_files: List[Path] = []
+        self.failed_files: List[Path] = []
+
+    def _load_cache(self) -> Dict[str, Dict[str, Any]]:
+        if self.cache_file is None or not self.cache_file.exists():
+            return {}
+        with open(self.cache_file, "r") as file:
+            cache = json.load(file)
+        if cache.get("version") != CACHE_VERSION:
+            return {}
+        return cache["files"]
+
+    def _save_cache(self, files: Dict[str, Dict[str, Any]]) -> None:
+        if self.cache_file is None:
+            return
+        self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+        temporary_file = self.cache_file.with_suffix(".tmp")
+        with open(temporary_file, "w") as file:
+            json.dump({"version": CACHE_VERSION, "files": files}, file)
+        temporary_file.replace(self.cache_file)
+
+    def scan(self) -> List[ClassInfo]:
+        """Scan the source tree.
+
+        Returns:
+            All classes in the tree, ordered by file path.
+
+        """
+        cache = self._load_cache()
+        files: Dict[str, Dict[str, Any]] = {}
+        to_parse: List[Tuple[str, str]] = []
+
+        with instrumentation.span("class_relationships.check_cache"):
+            for path in sorted(self.root.rglob("*.py")):
+                key = str(path.relative_to(self.root))
+                stat = path.stat()
+                entry: Dict[str, Any] = {
+                    "mtime": stat.st_mtime_ns,
+                    "size": stat.st_size,
+                }
+                cached = cache.get(key)
+                if cached and all(cached[k] == v for k, v in entry.items()):
+                    files[key] = cached
+                    continue
+                entry["sha256"] = hashlib.sha256(path.read_bytes()).hexdigest()
+                if cached and cached["sha256"] == entry["sha256"]:
+                    files[key] = {**cached, **entry}
+                    continue
+                files[key] = entry
+                to_parse.append((str(path), module_name(path, self.root)))
+
+        with instrumentation.span("class_relationships.parse", files=len(to_parse)):
+            paths = [Path(path) for path, _ in to_parse]
+            modules = [module for _, module in to_parse]
+            if self.n_jobs == 1 or len(to_parse) < 2:
+                results = list(map(_scan_file_safe, map(str, paths), modules))
+            else:
+                with ProcessPoolExecutor(self.n_jobs) as executor:
+                    chunksize = max(len(paths) // (self.n_jobs * 4), 1)
+                    results = list(
+                        executor.map(
+                            _scan_file_safe,
+                            map(str, paths),
+                            modules,
+                            chunksize=chunksize,
+                        )
+                    )
+
+        self.parsed_files = paths
+        self.failed_files = []
+        for path, result in zip(paths, results):
+            key = str(path.relative_to(self.root))
+            if result is None:
+                self.failed_files.append(path)
+                warnings.warn(f"Could not parse {path}, skipping it.")
+                del files[key]
+            else:
+                files[key]["classes"] = result
+        instrumentation.count("class_relationships.parsed_files", len(paths))
+
+        self._save_cache(files)
+        return [
+            ClassInfo(**info) for key in sorted(files) for info in files[key]["classes"]
+        ]
+
+
+def to_flowchart(classes: List[ClassInfo], **kwargs: Any) -> Flowchart:
+    """Build a flowchart of class relationships with a subgraph per module.
+
+    Inheritance is drawn as a solid arrow to the base class, composition as a
+    dotted arrow labelled with the attribute names. Only relationships between the
+    given classes are included.
+
+    Args:
+        classes: The classes to include.
+        **kwargs: Keyword arguments to pass to the Flowchart constructor.
+
+    Returns:
+        The flowchart.
+
+    """
+    nodes: Dict[str, Node] = {}
+    by_name: Dict[str, List[str]] = {}
+    modules: Dict[str, List[Union[Node, Subgraph]]] = {}
+    for info in classes:
+        node = Node(info.name)
+        nodes[info.qualified_name] = node
+        by_name.setdefault(info.name, []).append(info.qualified_name)
+        modules.setdefault(info.module, []).append(node)
+
+    def resolve(name: str) -> Optional[Node]:
+        if name in nodes:
+            return nodes[name]
+        candidates = by_name.get(name.split(".")[-1], [])
+        return nodes[candidates[0]] if len(candidates) == 1 else None
+
+    relationships = []
+    for info in classes:
+        node = nodes[info.qualified_name]
+        for base_name in info.bases:
+            base = resolve(base_name)
+            if base is not None and base is not node:
+                relationships.append(
+                    Relationship([node, base], output_arrow=">", label="inherits")
+                )
+        for name, attributes in info.attributes.items():
+            component = resolve(name)
+            if component is not None and component is not node:
+                relationships.append(
+                    Relationship(
+                        [node, component],
+                        style="DOTTED",
+                        output_arrow=">",
+                        label=", ".join(attributes),
+                    )
+                )
+
+    subgraphs = [Subgraph(module, members) for module, members in modules.items()]
+    return Flowchart(
+        nodes=list(nodes.values()),
+        relationships=relationships,
+        subgraphs=subgraphs,
+        **kwargs,
+    )
+
+
+def class_flowchart(
+    root: Union[str, Path],
+    cache_dir: Optional[Union[str, Path]] = None,
+    n_jobs: Optional[int] = None,
+    **kwargs: Any,
+) -> Flowchart:
+    """Build a flowchart of the class relationships in a source tree.
+
+    Args:
+        root: The root of the source tree.
+        cache_dir: The directory to cache parsed files in, no caching if None.
+        n_jobs: The number of processes to parse with.
+        **kwargs: Keyword arguments to pass to the Flowchart constructor.
+
+    Returns:
+        The flowchart.
+
+    """
+    classes = ClassScanner(root, cache_dir, n_jobs).scan()
+    return to_flowchart(classes, **kwargs)
@@ -0,0 +1,279 @@
+"""Phase level timing instrumentation.
+
+Instrumentation is disabled by default, in which case `span`, `count` and
+functions decorated with `traced` do no work beyond a single check. Enable it
+with one or more sinks to receive events as they happen:
+
+    >>> from barnacleboy import instrumentation
+    >>> tracer = instrumentation.enable(instrumentation.LoggingSink())
+    >>> with instrumentation.span("export", diagram="flowchart"):
+    ...     pass
+    >>> tracer = instrumentation.disable()
+    >>> tracer.dump_json("trace.json")  # doctest: +SKIP
+
+"""
+
+import dataclasses
+import functools
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+from contextlib import nullcontext
+from pathlib import Path
+from typing import (
+    Any,
+    Callable,
+    ContextManager,
+    DefaultDict,
+    Dict,
+    List,
+    Optional,
+    TypeVar,
+    Union,
+    cast,
+)
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+_NULL_SPAN: ContextManager[None] = nullcontext()
+_tracer: Optional["Tracer"] = None
+
+
+@dataclasses.dataclass
+class Event:
+    """A finished span or a counter increment.
+
+    Args:
+        kind: Either "span" or "counter".
+        name: The name of the span or counter.
+        value: The duration of a span in seconds, or the counter increment.
+        start: The start time of a span, relative to enabling the tracer.
+        depth: The nesting depth of a span.
+        attributes: Additional attributes of a span.
+
+    """
+
+    kind: str
+    name: str
+    value: float
+    start: float = 0.0
+    depth: int = 0
+    attributes: Dict[str, Any] = dataclasses.field(default_factory=dict)
+
+
+Sink = Callable[[Event], None]
+
+
+class LoggingSink:
+    """A sink that logs every event."""
+
+    def __init__(
+        self, logger: Optional[logging.Logger] = None, level: int = logging.DEBUG
+    ) -> None:
+        """Initialize a logging sink.
+
+        Args:
+            logger: The logger to write to, defaults to the barnacleboy logger.
+            level: The level to log events at.
+
+        """
+        self.logger = logger or logging.getLogger("barnacleboy")
+        self.level = level
+
+    def __call__(self, event: Event) -> None:
+        """Log an event."""
+        if event.kind == "span":
+            self.logger.log(
+                self.level,
+                "%s%s took %.6fs %s",
+                "  " * event.depth,
+                event.name,
+                event.value,
+                event.attributes,
+            )
+        else:
+            self.logger.log(self.level, "%s += %s", event.name, event.value)
+
+
+class _Span:
+    """Times a block of code and reports it to the tracer."""
+
+    def __init__(self, tracer: "Tracer", name: str, attributes: Dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.attributes = attributes
+        self.start = 0.0
+
+    def __enter__(self) -> None:
+        self.start = time.perf_counter()
+        self.tracer._local.depth = self.tracer.depth + 1
+
+    def __exit__(self, *args: Any) -> None:
+        duration = time.perf_counter() - self.start
+        depth = self.tracer.depth - 1
+        self.tracer._local.depth = depth
+        self.tracer.emit(
+            Event(
+                "span",
+                self.name,
+                duration,
+                self.start - self.tracer.origin,
+                depth,
+                self.attributes,
+            )
+        )
+
+
+class Tracer:
+    """Collects spans and counters and forwards them to sinks."""
+
+    def __init__(self, *sinks: Sink, record: bool = True) -> None:
+        """Initialize a tracer.
+
+        Args:
+            *sinks: Callables that receive every event.
+            record: Whether to keep events in memory for `dump_json`.
+
+        """
+        self.sinks = list(sinks)
+        self.record = record
+        self.events: List[Event] = []
+        self.counters: DefaultDict[str, float] = defaultdict(float)
+        self.origin = time.perf_counter()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    @property
+    def depth(self) -> int:
+        """The span nesting depth of the current thread."""
+        return getattr(self._local, "depth", 0)
+
+    def emit(self, event: Event) -> None:
+        """Record an event and forward it to the sinks."""
+        with self._lock:
+            if event.kind == "counter":
+                self.counters[event.name] += event.value
+            if self.record:
+                self.events.append(event)
+        for sink in self.sinks:
+            sink(event)
+
+    def span(self, name: str, **attributes: Any) -> ContextManager[None]:
+        """Create a span that times the enclosed block."""
+        return _Span(self, name, attributes)
+
+    def totals(self) -> Dict[str, float]:
+        """Get the total time spent per span name."""
+        totals: DefaultDict[str, float] = defaultdict(float)
+        for event in self.events:
+            if event.kind == "span":
+                totals[event.name] += event.value
+        return dict(totals)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Get a JSON serializable representation of the trace."""
+        return {
+            "spans": [
+                {
+                    "name": event.name,
+                    "start": event.start,
+                    "duration": event.value,
+                    "depth": event.depth,
+                    "attributes": event.attributes,
+                }
+                for event in self.events
+                if event.kind == "span"
+            ],
+            "counters": dict(self.counters),
+        }
+
+    def dump_json(self, filename: Union[str, Path]) -> None:
+        """Write the trace to a JSON file.
+
+        Args:
+            filename: The path to write the trace to.
+
+        """
+        with open(filename, "w") as file:
+            json.dump(self.to_dict(), file, default=str)
+
+
+def enable(*sinks: Sink, record: bool = True) -> Tracer:
+    """Enable instrumentation.
+
+    Args:
+        *sinks: Callables that receive every event.
+        record: Whether to keep events in memory for `Tracer.dump_json`.
+
+    Returns:
+        The active tracer.
+
+    """
+    global _tracer
+    _tracer = Tracer(*sinks, record=record)
+    return _tracer
+
+
+def disable() -> Optional[Tracer]:
+    """Disable instrumentation.
+
+    Returns:
+        The tracer that was active, if any.
+
+    """
+    global _tracer
+    tracer, _tracer = _tracer, None
+    return tracer
+
+
+def get_tracer() -> Optional[Tracer]:
+    """Get the active tracer, or None if instrumentation is disabled."""
+    return _tracer
+
+
+def span(name: str, **attributes: Any) -> ContextManager[None]:
+    """Time the enclosed block if instrumentation is enabled.
+
+    Args:
+        name: The name of the span.
+        **attributes: Additional attributes to attach to the span.
+
+    """
+    if _tracer is None:
+        return _NULL_SPAN
+    return _tracer.span(name, **attributes)
+
+
+def count(name: str, value: float = 1) -> None:
+    """Increment a counter if instrumentation is enabled.
+
+    Args:
+        name: The name of the counter.
+        value: The increment.
+
+    """
+    if _tracer is not None:
+        _tracer.emit(Event("counter", name, value))
+
+
+def traced(name: str) -> Callable[[F], F]:
+    """Decorate a function to run inside a span if instrumentation is enabled.
+
+    Args:
+        name: The name of the span.
+
+    """
+
+    def decorator(function: F) -> F:
+        @functools.wraps(function)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if _tracer is None:
+                return function(*args, **kwargs)
+            with _tracer.span(name):
+                return function(*args, **kwargs)
+
+        return cast(F, wrapper)
+
+    return decorator
@@ -1,13 +1,18 @@
 import base64
-import shutil
-import subprocess
-import tempfile
+import dataclasses
+from functools import lru_cache
 from pathlib import Path
-from typing import Union, Optional, Any, Dict
+from typing import TYPE_CHECKING, Callable, Union, Optional, Any, Dict, Tuple, ClassVar
 
 from pydantic import Field, BaseModel, Extra
 
+from barnacleboy import instrumentation
 from barnacleboy.config import get_settings
+from barnacleboy.mermaid.hashing import Hashed, structural_hash
+from barnacleboy.mermaid.utils import init_string
+
+if TYPE_CHECKING:
+    from barnacleboy.mermaid.rendering import Renderer
 
 settings = get_settings()
 VALID_THEMES = settings.VALID_THEMES
@@ -45,44 +50,167 @@ class ThemeVariables(BaseModel):
         """Config for the theme variables."""
 
         extra = Extra.forbid
+        frozen = True
 
 
-class MermaidBase:
-    """Base class for mermaid objects. Provides methods for saving and rendering."""
+@dataclasses.dataclass(frozen=True)
+class Theme:
+    """An immutable mermaid theme that can be shared between diagrams.
 
-    def __init__(self, theme: str = "base", **kwargs: Any) -> None:
-        """Initialize a mermaid object."""
-        if theme not in VALID_THEMES:
-            raise ValueError(f"Theme {theme} is not supported.")
-        if theme != "base" and kwargs:
-            raise ValueError("Theme variables can only be set for the base theme.")
+    Use `get_theme` to obtain instances; it validates the theme variables once
+    and returns the same object for the same arguments.
 
-        self.theme = theme
-        self.theme_variables = ThemeVariables(**kwargs)
+    Args:
+        name: The name of the mermaid theme.
+        variables: The theme variables, only used by the base theme.
 
-    @property
-    def base_config(self) -> Dict[str, Dict[str, str]]:
+    """
+
+    name: str = "base"
+    variables: ThemeVariables = dataclasses.field(
+        default_factory=ThemeVariables.construct
+    )
+    header: str = dataclasses.field(init=False, repr=False, compare=False)
+    compact_header: str = dataclasses.field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        object.__setattr__(self, "header", init_string(self.as_config(), {}))
+        compact_header = ""
+        if self.as_config() != {"init": {"theme": "default"}}:
+            compact_header = init_string(self.as_config(), {}, compact=True)
+        object.__setattr__(self, "compact_header", compact_header)
+
+    def as_config(self) -> Dict[str, Dict[str, Any]]:
         """Get a dictionary representation of the init settings."""
-        config = {
-            "init": {
-                "theme": self.theme,
-            }
-        }
-        theme_variables = self.theme_variables.dict(exclude_none=True)
-        if self.theme == "base" and theme_variables:
+        config: Dict[str, Dict[str, Any]] = {"init": {"theme": self.name}}
+        theme_variables = self.variables.dict(exclude_none=True)
+        if self.name == "base" and theme_variables:
             config["init"]["themeVariables"] = theme_variables
         return config
 
-    def jupyter_plot(self) -> None:
+    def get_init_string(
+        self, object_config: Optional[Dict[str, Any]] = None, compact: bool = False
+    ) -> str:
+        """Get the mermaid init header, reusing the precomputed one if possible.
+
+        Args:
+            object_config: Diagram specific configuration to merge into the header.
+            compact: Whether to leave out optional whitespace, and the whole
+                header if it only selects mermaid's default theme.
+
+        Returns:
+            The init header.
+
+        """
+        if not object_config:
+            return self.compact_header if compact else self.header
+        return init_string(self.as_config(), object_config, compact)
+
+
+def get_theme(name: str = "base", **kwargs: Any) -> Theme:
+    """Get a shared theme object.
+
+    Args:
+        name: The name of the mermaid theme.
+        **kwargs: Theme variables, see `ThemeVariables`.
+
+    Returns:
+        The theme. Equal arguments return the same object.
+
+    """
+    if name not in VALID_THEMES:
+        raise ValueError(f"Theme {name} is not supported.")
+    if name != "base" and kwargs:
+        raise ValueError("Theme variables can only be set for the base theme.")
+    return _intern_theme(name, tuple(sorted(kwargs.items())))
+
+
+@lru_cache(maxsize=None)
+def _intern_theme(name: str, variables: Tuple[Tuple[str, Any], ...]) -> Theme:
+    """Validates the theme variables once per distinct set of arguments."""
+    with instrumentation.span("theme.validate", theme=name):
+        return Theme(name, ThemeVariables(**dict(variables)))
+
+
+class MermaidBase(Hashed):
+    """Base class for mermaid objects. Provides methods for saving and rendering.
+
+    Diagrams compare and hash by their structural fingerprint, see
+    `barnacleboy.mermaid.hashing`, so equal diagrams render the same text.
+    """
+
+    _hashed_fields: ClassVar[Tuple[str, ...]] = ("_theme", "compact", "config")
+
+    def __init__(
+        self, theme: Union[str, Theme] = "base", compact: bool = False, **kwargs: Any
+    ) -> None:
+        """Initialize a mermaid object.
+
+        Args:
+            theme: The name of the theme, or a shared `Theme` object.
+            compact: Whether to render without optional whitespace and default
+                configuration, with shorter IDs where the diagram generates them.
+            **kwargs: Theme variables, only allowed for the base theme.
+
+        """
+        if isinstance(theme, Theme):
+            if kwargs:
+                raise ValueError("Theme variables cannot be set on a Theme object.")
+            self._theme = theme
+        else:
+            self._theme = get_theme(theme, **kwargs)
+        self.config: Dict[str, Any] = {}
+        self.compact = compact
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, MermaidBase) or type(other) is not type(self):
+            return NotImplemented
+        return self._fingerprint() == other._fingerprint()
+
+    def __hash__(self) -> int:
+        return structural_hash(self)
+
+    @property
+    def theme(self) -> str:
+        """The name of the theme."""
+        return self._theme.name
+
+    @property
+    def theme_variables(self) -> ThemeVariables:
+        """The variables of the theme."""
+        return self._theme.variables
+
+    @property
+    def base_config(self) -> Dict[str, Dict[str, Any]]:
+        """Get a dictionary representation of the init settings."""
+        return self._theme.as_config()
+
+    def get_init_string(self) -> str:
+        """Get the mermaid init header of the object."""
+        return self._theme.get_init_string(self.config, self.compact)
+
+    def jupyter_plot(self, renderer: Optional["Renderer"] = None) -> None:
         """Render the graph in a Jupyter notebook.
 
+        Args:
+            renderer: The backend to render with. Defaults to the one selected by
+                `Settings.NOTEBOOK_RENDERER`, or mermaid.ink if that is not set.
+
         Notes:
-            This method requires an internet connection.
+            Rendering with mermaid.ink requires an internet connection.
         """
         if not self.is_notebook():
             raise RuntimeError("This method can only be used in a Jupyter notebook.")
         from IPython.display import Image, display  # type: ignore
 
+        from barnacleboy.mermaid.rendering import get_renderer
+
+        if renderer is None and settings.NOTEBOOK_RENDERER:
+            renderer = get_renderer(settings.NOTEBOOK_RENDERER)
+        if renderer is not None:
+            display(Image(data=renderer.render_bytes(str(self), ".png")))
+            return
+
         graphbytes = str(self).encode("ascii")
         base64_bytes = base64.b64encode(graphbytes)
         base64_string = base64_bytes.decode("ascii")
@@ -95,46 +223,59 @@ class MermaidBase:
             filename: The path to save the graph to.
         """
         filename = Path(filename)
+        save: Callable[[Path], None]
         if filename.suffix == ".html":
-            return self.save_html(filename)
+            save = self.save_html
         elif filename.suffix in VALID_MERMAID_CLI_EXTENSIONS:
-            return self.save_image(filename)
-        raise ValueError("File type not supported.")
+            save = self.save_image
+        else:
+            raise ValueError("File type not supported.")
+        with instrumentation.span("save", filename=str(filename)):
+            save(filename)
 
-    def save_html(self, filename: Union[str, Path]) -> None:
+    def save_html(
+        self, filename: Union[str, Path], template: str = "mermaid_diagram.html"
+    ) -> None:
         """Save the graph to an html file.
 
         Args:
             filename: The path to save the graph to.
+            template: The name of the template in the template directory.
         """
         filename = Path(filename)
-        template = TEMPLATE_DIR / "mermaid_diagram.html"
+        template_file = TEMPLATE_DIR / template
 
-        with open(template, "r") as file:
-            html = file.read()
-            html = html.replace("{{GRAPH}}", str(self))
+        with instrumentation.span("save_html.template"):
+            with open(template_file, "r") as file:
+                html = file.read()
+        html = html.replace("{{GRAPH}}", str(self))
 
-        with open(filename, "w") as file:
-            file.write(html)
+        with instrumentation.span("save_html.write"):
+            with open(filename, "w") as file:
+                file.write(html)
+        instrumentation.count("bytes_written", len(html))
 
-    def save_image(self, filename: Union[str, Path]) -> None:
+    def save_image(
+        self,
+        filename: Union[str, Path],
+        renderer: Optional["Renderer"] = None,
+    ) -> None:
         """Save the graph to an image file.
 
         Args:
             filename: The path to save the graph to.
+            renderer: The backend to render with, defaults to the one selected by
+                `Settings.RENDERER`. See `barnacleboy.mermaid.rendering`.
+
+        Raises:
+            RenderError: If rendering failed.
+
         """
-        if shutil.which("mmdc") is None:
-            raise RuntimeError("Saving images requires mermaid-cli to be installed.")
-
-        with tempfile.NamedTemporaryFile(suffix=".txt") as mermaid_file:
-            mermaid_file.write(str(self).encode())
-            mermaid_file.seek(0)
-
-            exit_code = subprocess.call(
-                ["mmdc", "-i", mermaid_file.name, "-o", str(filename)]
-            )
-            if exit_code != 0:
-                raise RuntimeError("Failed to save graph.")
+        from barnacleboy.mermaid.rendering import get_renderer
+
+        renderer = renderer or get_renderer()
+        renderer.render(str(self), filename)
+        instrumentation.count("bytes_written", Path(filename).stat().st_size)
 
     @staticmethod
     def is_notebook() -> bool:
@@ -0,0 +1,314 @@
+"""Canonical rendering of flowcharts and entity relation diagrams.
+
+A canonical diagram renders the same bytes however it was built, so the text
+can be used as a cache key or compared between runs. Elements are rendered in
+an order that only depends on their content, and flowchart IDs are derived from
+the content of the entity they belong to, so adding an entity does not shift the
+IDs of the others.
+
+- Nodes and subgraphs are ordered by name, then by the rest of their content and
+  that of their members, then by the relationships they take part in and the
+  content of the entities at the other end. IDs are a prefix of a hash of the
+  content: "n" for nodes and "s" for subgraphs.
+- Relationships are ordered by the positions of their entities, then by their
+  style, arrows and label.
+- ER entities are ordered by name and their attributes, primary keys first, by
+  name. ER relationships are ordered by the names of their entities, then by
+  their cardinalities and label.
+- Configuration and class definitions are ordered by key.
+
+Entities with the same content and the same kind of relationships to the same
+kind of entities are interchangeable in every way the order looks at, so they
+keep the order they were added in. Any two diagrams that only differ in the
+order of their elements render the same bytes, unless they contain such
+entities. Sorting and hashing take O(N log N) time in the number of elements.
+
+The canonical text is rendered from copies, so the diagram itself keeps its IDs.
+"""
+
+from typing import Any, Dict, Iterable, List, Set, Tuple, Union
+
+from barnacleboy import instrumentation
+from barnacleboy.mermaid.er_diagram import Entity, EntityRelationDiagram, Field
+from barnacleboy.mermaid.flowchart import Flowchart, Node, Relationship, Subgraph
+from barnacleboy.mermaid.hashing import digest
+
+FlowchartEntity = Union[Node, Subgraph]
+# Entities are ordered by name, content digest and relationship digest.
+SortKey = Tuple[str, bytes, bytes]
+
+
+def canonical_config(config: Dict[str, Any]) -> Dict[str, Any]:
+    """Order the keys of a configuration, including those of nested dictionaries.
+
+    Args:
+        config: The configuration.
+
+    Returns:
+        A copy with keys in sorted order.
+
+    """
+    return {
+        key: canonical_config(value) if isinstance(value, dict) else value
+        for key, value in sorted(config.items())
+    }
+
+
+def _encode(value: Any) -> bytes:
+    return repr(value).encode("utf-8")
+
+
+def _node_content(node: Node) -> bytes:
+    return _encode(
+        (
+            node.name,
+            node.shape.name,
+            node.link,
+            sorted((node.style or {}).items()),
+            node.class_name,
+        )
+    )
+
+
+def _digests(flowchart: Flowchart, contents: Dict[int, bytes]) -> Dict[int, bytes]:
+    """Hash every node, and every subgraph with its name, direction and members.
+
+    Members are hashed before the subgraph containing them, with an explicit
+    stack so deeply nested subgraphs are fine.
+    """
+    digests = {key: digest(content) for key, content in contents.items()}
+    n_nodes = len(digests)
+    for root in flowchart.subgraphs:
+        stack: List[Tuple[Subgraph, bool]] = [(root, False)]
+        while stack:
+            subgraph, members_done = stack.pop()
+            if id(subgraph) in digests:
+                continue
+            if not members_done:
+                stack.append((subgraph, True))
+                stack.extend(
+                    (entity, False)
+                    for entity in subgraph.entities
+                    if isinstance(entity, Subgraph)
+                )
+                continue
+            members = []
+            for entity in subgraph.entities:
+                if id(entity) not in digests:
+                    raise ValueError(
+                        f"Subgraph {subgraph.name!r} contains {entity.name!r}, "
+                        "which is not in the flowchart."
+                    )
+                members.append(digests[id(entity)])
+            digests[id(subgraph)] = digest(
+                b"subgraph",
+                _encode((subgraph.name, subgraph.direction)),
+                *sorted(members),
+            )
+    if len(digests) != n_nodes + len(flowchart.subgraphs):
+        raise ValueError("A subgraph contains a subgraph that is not in the flowchart.")
+    return digests
+
+
+def _relationship_content(relationship: Relationship) -> bytes:
+    return _encode(
+        (
+            relationship.style,
+            relationship.input_arrow,
+            relationship.output_arrow,
+            relationship.label,
+        )
+    )
+
+
+def _signatures(
+    relationships: Iterable[Relationship], digests: Dict[int, bytes]
+) -> Dict[int, bytes]:
+    """Hash the relationships of every entity with the content at the other end."""
+    ends: Dict[int, List[bytes]] = {}
+    for relationship in relationships:
+        source, target = relationship.entities
+        for entity in (source, target):
+            if id(entity) not in digests:
+                raise ValueError(
+                    f"Relationship {relationship.link()!r} connects an entity that "
+                    "is not in the flowchart."
+                )
+        content = _relationship_content(relationship)
+        ends.setdefault(id(source), []).append(b">" + content + digests[id(target)])
+        ends.setdefault(id(target), []).append(b"<" + content + digests[id(source)])
+    return {key: digest(*sorted(values)) for key, values in ends.items()}
+
+
+class _ContentIds:
+    """Derives IDs from a hash of the content of entities.
+
+    The hash is lengthened on the rare collision of a short prefix, and entities
+    with the same content are numbered in the order they are assigned.
+    """
+
+    def __init__(self) -> None:
+        self.used: Set[str] = set()
+        self.first: Dict[bytes, str] = {}
+        self.counts: Dict[bytes, int] = {}
+
+    def assign(self, prefix: str, content: bytes) -> str:
+        """Get the ID of the next entity with some content.
+
+        Args:
+            prefix: The first character of the ID.
+            content: The content of the entity.
+
+        Returns:
+            The ID.
+
+        """
+        key = prefix.encode("utf-8") + content
+        if key in self.first:
+            self.counts[key] += 1
+            return f"{self.first[key]}_{self.counts[key]}"
+        hexdigest = digest(key).hex()
+        for length in (6, 12, len(hexdigest)):
+            candidate = prefix + hexdigest[:length]
+            if candidate not in self.used:
+                break
+        self.used.add(candidate)
+        self.first[key] = candidate
+        self.counts[key] = 1
+        return candidate
+
+
+def canonical_flowchart(flowchart: Flowchart) -> Flowchart:
+    """Copy a flowchart in canonical order with content derived IDs.
+
+    Args:
+        flowchart: The flowchart.
+
+    Returns:
+        A flowchart of copies of the elements, which is not canonical itself
+        because it is already in canonical order.
+
+    Raises:
+        ValueError: If a subgraph or relationship refers to an entity that is
+            not in the flowchart.
+
+    """
+    with instrumentation.span("canonical.flowchart"):
+        contents = {id(node): _node_content(node) for node in flowchart.nodes}
+        digests = _digests(flowchart, contents)
+        signatures = _signatures(flowchart.relationships, digests)
+
+        def sort_key(entity: FlowchartEntity) -> SortKey:
+            return (
+                entity.name,
+                digests[id(entity)],
+                signatures.get(id(entity), b""),
+            )
+
+        ids = _ContentIds()
+        copies: Dict[int, FlowchartEntity] = {}
+        nodes: List[Node] = []
+        for node in sorted(flowchart.nodes, key=sort_key):
+            copy = Node(node.name, node.shape, node.link, node.style, node.class_name)
+            copy._internal_id = ids.assign("n", digests[id(node)])
+            copies[id(node)] = copy
+            nodes.append(copy)
+
+        ordered = sorted(flowchart.subgraphs, key=sort_key)
+        subgraphs: List[Subgraph] = []
+        for subgraph in ordered:
+            copy_subgraph = Subgraph(subgraph.name, [])
+            copy_subgraph.direction = subgraph.direction
+            copy_subgraph._internal_id = ids.assign(
+                "s", _encode((subgraph.name, subgraph.direction))
+            )
+            copies[id(subgraph)] = copy_subgraph
+            subgraphs.append(copy_subgraph)
+        for subgraph, copy_subgraph in zip(ordered, subgraphs):
+            members = sorted(subgraph.entities, key=sort_key)
+            copy_subgraph.entities = [copies[id(entity)] for entity in members]
+
+        # Relationships follow the order the entities are rendered in.
+        rendered: List[FlowchartEntity] = [*nodes, *subgraphs]
+        ranks = {id(entity): rank for rank, entity in enumerate(rendered)}
+
+        def relationship_key(relationship: Relationship) -> Tuple[int, int, bytes]:
+            source, target = relationship.entities
+            return (
+                ranks[id(copies[id(source)])],
+                ranks[id(copies[id(target)])],
+                _relationship_content(relationship),
+            )
+
+        relationships = [
+            relationship.rewire(
+                copies[id(relationship.entities[0])],
+                copies[id(relationship.entities[1])],
+            )
+            for relationship in sorted(flowchart.relationships, key=relationship_key)
+        ]
+
+        canonical = flowchart.derive(nodes, relationships, subgraphs)
+        canonical.canonical = False
+        canonical.config = canonical_config(flowchart.config)
+        canonical.class_defs = {
+            name: dict(sorted(style.items()))
+            for name, style in sorted(flowchart.class_defs.items())
+        }
+    return canonical
+
+
+def _field_key(field: Field) -> Tuple[bool, str, str, str, bool]:
+    return (
+        not field.primary_key,
+        field.name,
+        field.vartype,
+        field.description or "",
+        field.foreign_key,
+    )
+
+
+def canonical_er_diagram(diagram: EntityRelationDiagram) -> EntityRelationDiagram:
+    """Copy an entity relation diagram in canonical order.
+
+    Args:
+        diagram: The diagram.
+
+    Returns:
+        A diagram that shares the attributes and copies the entities and
+        relationships, which is not canonical itself because it is already in
+        canonical order.
+
+    """
+    with instrumentation.span("canonical.er_diagram"):
+        copies: Dict[int, Entity] = {}
+        for entity in diagram.entities:
+            attributes = entity.attributes
+            if attributes is not None:
+                attributes = sorted(attributes, key=_field_key)
+            copies[id(entity)] = Entity(entity.name, attributes)
+
+        def entity_key(entity: Entity) -> Tuple[str, List[Tuple[Any, ...]]]:
+            return entity.name, [_field_key(field) for field in entity.attributes or []]
+
+        entities = sorted(copies.values(), key=entity_key)
+        relationships = sorted(
+            (
+                relationship.rewire(
+                    copies.get(id(relationship.entity1), relationship.entity1),
+                    copies.get(id(relationship.entity2), relationship.entity2),
+                )
+                for relationship in diagram.relationships
+            ),
+            key=lambda relationship: (
+                relationship.entity1.name,
+                relationship.entity2.name,
+                relationship.relationship_1,
+                relationship.relationship_2,
+                relationship.label,
+            ),
+        )
+        canonical = diagram.derive(entities, relationships)
+        canonical.canonical = False
+        canonical.config = canonical_config(diagram.config)
+    return canonical
@@ -0,0 +1,163 @@
+"""Collapsible HTML export of flowcharts with deep subgraph hierarchies.
+
+Rendering every level of a large hierarchy at once makes the browser slow, so
+the page embeds the hierarchy as compact JSON and renders only the expanded
+levels, initially the top level. Collapsed subgraphs are drawn as single nodes
+that expand when clicked, and the mermaid text of the expanded levels is built
+in the browser from fragments precomputed here:
+
+- The definition of every node, and its link and style lines.
+- For every subgraph, its label, direction and direct members.
+- For the flowchart and every subgraph, the boundary edges that it is the
+  innermost container of both ends of. While the container is expanded, each
+  end is drawn at its outermost collapsed ancestor, or itself if there is none,
+  and edges that end up inside one collapsed subgraph are left out.
+
+Building the mermaid text of a view only touches the expanded subgraphs and
+their boundary edges, so the time to first paint does not depend on the size of
+the collapsed levels.
+"""
+
+import html
+import json
+from pathlib import Path
+from typing import Any, Dict, List, Set, Union
+
+from barnacleboy import instrumentation
+from barnacleboy.mermaid.base import TEMPLATE_DIR
+from barnacleboy.mermaid.flowchart import Flowchart, Node, Subgraph, render_styles
+
+Entity = Union[Node, Subgraph]
+
+# The key of the flowchart itself among the containers.
+ROOT = ""
+
+
+def drilldown_data(flowchart: Flowchart, depth: int = 0) -> Dict[str, Any]:
+    """Precompute the fragments of a collapsible flowchart.
+
+    Args:
+        flowchart: The flowchart to export.
+        depth: The number of subgraph levels that are initially expanded.
+
+    Returns:
+        A JSON-serializable dictionary with the header of the flowchart, the
+        fragments of its nodes, its containers and their boundary edges, the
+        parents of nested entities and the initially expanded subgraphs.
+
+    """
+    with instrumentation.span("drilldown.build", nodes=len(flowchart.nodes)):
+        header = flowchart.get_init_string()
+        if flowchart.title:
+            header += f"---\ntitle: {flowchart.title}\n---\n"
+        header += f"graph {flowchart.orientation}"
+
+        nodes: Dict[str, List[str]] = {
+            node._internal_id: [str(node)] for node in flowchart.nodes
+        }
+        for node in flowchart.nodes:
+            if node.link:
+                nodes[node._internal_id].append(
+                    f'click {node._internal_id} href "{node.link}"'
+                )
+        # Assignments are split per node, so they can be left out with the node.
+        class_lines = []
+        for line in render_styles(flowchart.nodes, flowchart.class_defs):
+            keyword, ids, properties = line.split(" ", 2)
+            if keyword == "classDef":
+                class_lines.append(line)
+                continue
+            for node_id in ids.split(","):
+                nodes[node_id].append(f"{keyword} {node_id} {properties}")
+
+        parents: Dict[str, str] = {}
+        containers: Dict[str, Dict[str, Any]] = {ROOT: {"members": [], "edges": []}}
+        for node in flowchart.nodes:
+            if flowchart.parent(node) is None:
+                containers[ROOT]["members"].append(node._internal_id)
+        for subgraph in flowchart.subgraphs:
+            containers[subgraph._internal_id] = {
+                "label": subgraph.name,
+                "direction": subgraph.direction,
+                "members": [
+                    entity._internal_id
+                    for entity in subgraph.children()
+                    if flowchart.parent(entity) is subgraph
+                ],
+                "edges": [],
+            }
+            if flowchart.parent(subgraph) is None:
+                containers[ROOT]["members"].append(subgraph._internal_id)
+            for entity in subgraph.children():
+                if flowchart.parent(entity) is subgraph:
+                    parents[entity._internal_id] = subgraph._internal_id
+
+        for relationship in flowchart.relationships:
+            source, target = relationship.entities
+            container = _innermost_container(flowchart, source, target)
+            containers[container]["edges"].append(
+                [source._internal_id, target._internal_id, relationship.link()]
+            )
+
+        expanded = [
+            subgraph._internal_id
+            for subgraph in flowchart.subgraphs
+            if _depth(flowchart, subgraph) < depth
+        ]
+
+    return {
+        "header": header,
+        "nodes": nodes,
+        "classes": class_lines,
+        "containers": containers,
+        "parents": parents,
+        "expanded": expanded,
+    }
+
+
+def _ancestors(flowchart: Flowchart, entity: Entity) -> List[str]:
+    """Get the IDs of the subgraphs containing an entity, innermost first."""
+    ancestors = []
+    parent = flowchart.parent(entity)
+    while parent is not None:
+        ancestors.append(parent._internal_id)
+        parent = flowchart.parent(parent)
+    return ancestors
+
+
+def _innermost_container(flowchart: Flowchart, source: Entity, target: Entity) -> str:
+    """Get the innermost subgraph containing both entities, or the flowchart."""
+    containing: Set[str] = set(_ancestors(flowchart, source))
+    for ancestor in _ancestors(flowchart, target):
+        if ancestor in containing:
+            return ancestor
+    return ROOT
+
+
+def _depth(flowchart: Flowchart, subgraph: Subgraph) -> int:
+    """Get the number of subgraphs containing a subgraph."""
+    return len(_ancestors(flowchart, subgraph))
+
+
+def save_drilldown(
+    flowchart: Flowchart, filename: Union[str, Path], depth: int = 0
+) -> None:
+    """Save a collapsible flowchart to an html file.
+
+    Args:
+        flowchart: The flowchart to export.
+        filename: The path to save the page to.
+        depth: The number of subgraph levels that are initially expanded.
+
+    """
+    data = json.dumps(drilldown_data(flowchart, depth), separators=(",", ":"))
+    with open(TEMPLATE_DIR / "drilldown.html", "r") as file:
+        page = file.read()
+    page = page.replace("{{TITLE}}", html.escape(flowchart.title or "Flowchart"))
+    # Keep "</script>" in names from closing the data block.
+    page = page.replace("{{DATA}}", data.replace("</", "<\\/"))
+
+    with instrumentation.span("save_html.write"):
+        with open(filename, "w") as file:
+            file.write(page)
+    instrumentation.count("bytes_written", len(page))
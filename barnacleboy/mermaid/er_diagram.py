@@ -1,9 +1,14 @@
+import copy
 import dataclasses
 from enum import Enum
-from typing import Any, List, Tuple, Optional
+from typing import TYPE_CHECKING, Any, Dict, List, Tuple, Optional, Union
 
+from barnacleboy import instrumentation
 from barnacleboy.mermaid.base import MermaidBase
-from barnacleboy.mermaid.utils import init_string
+from barnacleboy.mermaid.hashing import Hashed
+
+if TYPE_CHECKING:
+    from barnacleboy.mermaid.er_queries import ForeignKeyIndex
 
 
 class RelationshipType(Enum):
@@ -15,9 +20,11 @@ class RelationshipType(Enum):
     ONE_OR_MORE: Tuple[str, str] = ("}|", "|{")
 
 
-class Field:
+class Field(Hashed):
     """An entity attribute."""
 
+    _hashed_fields = ("vartype", "name", "description", "primary_key", "foreign_key")
+
     def __init__(
         self,
         vartype: str,
@@ -48,7 +55,11 @@ class Field:
 
     def __str__(self) -> str:
         """Get a string representation of the object."""
-        output_string = f"  {self.vartype} {self.name}"
+        return "  " + self.get_field_string()
+
+    def get_field_string(self) -> str:
+        """Get a string representation of the object without indentation."""
+        output_string = f"{self.vartype} {self.name}"
         if self.primary_key:
             output_string += " PK"
         if self.foreign_key:
@@ -59,25 +70,39 @@ class Field:
 
 
 @dataclasses.dataclass
-class Entity:
+class Entity(Hashed):
     """An entity in an ER diagram."""
 
     name: str
     attributes: Optional[List[Field]] = None
 
+    _hashed_fields = ("name", "attributes")
+
     def __str__(self) -> str:
         """Get a string representation of the object."""
+        return self.get_entity_string()
+
+    def get_entity_string(self, compact: bool = False) -> str:
+        """Get a string representation of the object.
+
+        Args:
+            compact: Whether to leave out indentation and the trailing newline.
+
+        """
         if not self.attributes:
             return self.name
 
         output_string = self.name + " {\n"
         for attribute in self.attributes:
-            output_string += f"{attribute}\n"
-        output_string += "}\n"
+            field = attribute.get_field_string() if compact else str(attribute)
+            output_string += f"{field}\n"
+        output_string += "}" if compact else "}\n"
         return output_string
 
 
-class Relationship:
+class Relationship(Hashed):
+    _hashed_fields = ("entity1", "entity2", "relationship_1", "relationship_2", "label")
+
     def __init__(
         self,
         entity1: Entity,
@@ -93,6 +118,22 @@ class Relationship:
         self.relationship_2 = relationship_2.value[1]
         self.label = label
 
+    def rewire(self, entity1: Entity, entity2: Entity) -> "Relationship":
+        """Copy the relationship between two other entities.
+
+        Args:
+            entity1: The first entity of the copy.
+            entity2: The second entity of the copy.
+
+        Returns:
+            A relationship with the same cardinalities and label.
+
+        """
+        relationship = copy.copy(self)
+        relationship.entity1 = entity1
+        relationship.entity2 = entity2
+        return relationship
+
     def __str__(self) -> str:
         """Get a string representation of the object."""
         return f"{self.entity1.name}{self.relationship_1}--{self.relationship_2}{self.entity2.name} : {self.label}"
@@ -101,10 +142,17 @@ class Relationship:
 class EntityRelationDiagram(MermaidBase):
     """An entity relation diagram."""
 
+    _hashed_fields = MermaidBase._hashed_fields + (
+        "entities",
+        "relationships",
+        "canonical",
+    )
+
     def __init__(
         self,
         entities: Optional[List[Entity]] = None,
         relationships: Optional[List[Relationship]] = None,
+        canonical: bool = False,
         **kwargs: Any,
     ):
         """Initialize an entity relationship diagram.
@@ -112,12 +160,22 @@ class EntityRelationDiagram(MermaidBase):
         Args:
             entities: A list of entities to add to the diagram.
             relationships: A list of relationships to add to the diagram.
+            canonical: Whether to render entities, attributes and relationships
+                in an order that only depends on their content, see
+                `barnacleboy.mermaid.canonical`.
             **kwargs: Keyword arguments to pass to the MermaidBase constructor.
         """
         super(EntityRelationDiagram, self).__init__(**kwargs)
         self.entities = entities if entities else []
         self.relationships = relationships if relationships else []
-        self.config = {}  # type: ignore
+        self.canonical = canonical
+        self._fk_index: Optional["ForeignKeyIndex"] = None
+
+    def __getstate__(self) -> Dict[str, Any]:
+        state = super().__getstate__()
+        # The index refers to elements by identity, so it is rebuilt instead.
+        state["_fk_index"] = None
+        return state
 
     def add_entity(self, *args: Any, **kwargs: Any) -> None:
         """Add an entity to the diagram.
@@ -137,12 +195,116 @@ class EntityRelationDiagram(MermaidBase):
         """
         self.relationships.append(Relationship(*args, **kwargs))
 
+    @classmethod
+    def from_models(cls, *models: Any, **kwargs: Any) -> "EntityRelationDiagram":
+        """Create a diagram of pydantic models and the models they refer to.
+
+        Args:
+            *models: The pydantic model classes.
+            **kwargs: Keyword arguments to pass to the constructor.
+
+        Returns:
+            A diagram with an entity for every model, see
+            `barnacleboy.mermaid.er_models.from_models`.
+
+        """
+        from barnacleboy.mermaid.er_models import from_models
+
+        return from_models(*models, **kwargs)
+
+    def derive(
+        self, entities: List[Entity], relationships: List[Relationship]
+    ) -> "EntityRelationDiagram":
+        """Create a diagram that shares elements with this diagram.
+
+        Args:
+            entities: The entities of the new diagram.
+            relationships: The relationships of the new diagram.
+
+        Returns:
+            A diagram with the same theme and settings.
+
+        """
+        diagram = EntityRelationDiagram(
+            list(entities),
+            list(relationships),
+            canonical=self.canonical,
+            theme=self._theme,
+            compact=self.compact,
+        )
+        diagram.config = dict(self.config)
+        return diagram
+
+    def fk_index(self) -> "ForeignKeyIndex":
+        """Get the foreign key index of the diagram, updated with new elements.
+
+        Returns:
+            The index, see `barnacleboy.mermaid.er_queries.ForeignKeyIndex`.
+
+        """
+        from barnacleboy.mermaid.er_queries import ForeignKeyIndex
+
+        if self._fk_index is None:
+            self._fk_index = ForeignKeyIndex(self)
+        self._fk_index.update()
+        return self._fk_index
+
+    def focus(
+        self, entity: Union[Entity, str], depth: int = 1, attributes: str = "all"
+    ) -> "EntityRelationDiagram":
+        """Get the entities within a number of relationships of an entity.
+
+        Args:
+            entity: The entity at the center, or its name.
+            depth: The maximum number of relationships from the center.
+            attributes: "all", "focused" or "none", see
+                `barnacleboy.mermaid.er_queries.focus`.
+
+        Returns:
+            A diagram of the neighborhood of the entity.
+
+        """
+        from barnacleboy.mermaid.er_queries import focus
+
+        return focus(self.fk_index(), entity, depth, attributes)
+
+    def between(
+        self,
+        first: Union[Entity, str],
+        second: Union[Entity, str],
+        attributes: str = "all",
+    ) -> "EntityRelationDiagram":
+        """Get the entities on the shortest foreign key paths between two entities.
+
+        Args:
+            first: The entity at one end, or its name.
+            second: The entity at the other end, or its name.
+            attributes: "all", "focused" or "none", see
+                `barnacleboy.mermaid.er_queries.between`.
+
+        Returns:
+            A diagram of the paths.
+
+        """
+        from barnacleboy.mermaid.er_queries import between
+
+        return between(self.fk_index(), first, second, attributes)
+
+    @instrumentation.traced("render.er_diagram")
     def __str__(self) -> str:
         """Get a string representation of the object."""
-        output_string = init_string(self.base_config, self.config)
+        diagram = self
+        if self.canonical:
+            from barnacleboy.mermaid.canonical import canonical_er_diagram
+
+            diagram = canonical_er_diagram(self)
+        output_string = diagram.get_init_string()
         output_string += "erDiagram\n"
-        for entity in self.entities:
-            output_string += f"{entity}\n"
-        for relationship in self.relationships:
+        for entity in diagram.entities:
+            output_string += f"{entity.get_entity_string(self.compact)}\n"
+        for relationship in diagram.relationships:
             output_string += f"{relationship}\n"
+        instrumentation.count(
+            "elements_rendered", len(diagram.entities) + len(diagram.relationships)
+        )
         return output_string
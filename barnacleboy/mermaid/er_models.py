@@ -0,0 +1,186 @@
+"""Entity relation diagrams of pydantic models.
+
+Every model becomes an entity. Fields of plain types become its attributes, and
+fields that refer to other models, directly or through `Optional`, `List`,
+`Dict` or `Union`, become relationships labeled with the field name. The
+cardinality on the side of the referenced model follows from the field:
+
+- A required model is `ONE`, an optional one `ZERO_OR_ONE`.
+- A collection of models is `ZERO_OR_MORE`, or `ONE_OR_MORE` if it has a
+  minimum length of at least one.
+- Every alternative of a `Union` is `ZERO_OR_ONE`, unless the `Union` is in a
+  collection, such as `List[Union[A, B]]`.
+
+Descriptions of fields become comments of attributes, with double quotes
+escaped.
+
+A referenced model is embedded in the model referring to it, so the other side
+is always `ONE`. Models are walked breadth-first and each is visited once, so
+cyclic references are fine. The introspection of a model is cached, since large
+schema packages refer to the same models many times.
+"""
+
+import re
+from collections import deque
+from functools import lru_cache
+from typing import Any, Deque, Dict, List, NamedTuple, Optional, Tuple, Type
+
+from pydantic import BaseModel
+from pydantic.fields import SHAPE_SINGLETON, ModelField
+
+from barnacleboy import instrumentation
+from barnacleboy.mermaid.er_diagram import (
+    Entity,
+    EntityRelationDiagram,
+    Field,
+    Relationship,
+    RelationshipType,
+)
+
+
+class _Attribute(NamedTuple):
+    vartype: str
+    name: str
+    description: Optional[str]
+
+
+class _Reference(NamedTuple):
+    model: Type[BaseModel]
+    cardinality: RelationshipType
+    label: str
+
+
+@lru_cache(maxsize=None)
+def describe_model(
+    model: Type[BaseModel],
+) -> Tuple[Tuple[_Attribute, ...], Tuple[_Reference, ...]]:
+    """Get the attributes of a model and its references to other models.
+
+    Args:
+        model: The pydantic model class.
+
+    Returns:
+        The attributes and the references, in the order of the fields.
+
+    """
+    attributes = []
+    references = []
+    for field in model.__fields__.values():
+        field_references = _references(field)
+        if field_references:
+            references += field_references
+        else:
+            attributes.append(
+                _Attribute(
+                    _type_name(field),
+                    field.name,
+                    _comment(field.field_info.description),
+                )
+            )
+    return tuple(attributes), tuple(references)
+
+
+def _is_model(value: Any) -> bool:
+    return isinstance(value, type) and issubclass(value, BaseModel)
+
+
+def _comment(description: Optional[str]) -> Optional[str]:
+    """Escape a description, which is rendered in double quotes."""
+    return description and description.replace('"', "#quot;")
+
+
+def _models(field: ModelField) -> List[Type[BaseModel]]:
+    """Get the model of a field, or the models of its alternatives."""
+    if _is_model(field.type_):
+        return [field.type_]
+    # Union fields have a sub field for every alternative, and collections a sub
+    # field for their items, e.g. for the Union of List[Union[A, B]].
+    models = [
+        model for sub_field in field.sub_fields or () for model in _models(sub_field)
+    ]
+    return list(dict.fromkeys(models))
+
+
+def _references(field: ModelField) -> List[_Reference]:
+    """Get the models a field refers to."""
+    models = _models(field)
+    if models:
+        if field.shape != SHAPE_SINGLETON:
+            # conlist sets the minimum on the type, Field(min_items=...) on the info.
+            min_items = max(
+                getattr(field.field_info, "min_items", None) or 0,
+                getattr(field.outer_type_, "min_items", None) or 0,
+            )
+            cardinality = (
+                RelationshipType.ONE_OR_MORE
+                if min_items >= 1
+                else RelationshipType.ZERO_OR_MORE
+            )
+        elif field.allow_none or not _is_model(field.type_):
+            cardinality = RelationshipType.ZERO_OR_ONE
+        else:
+            cardinality = RelationshipType.ONE
+        return [_Reference(model, cardinality, field.name) for model in models]
+    return []
+
+
+def _type_name(field: ModelField) -> str:
+    """Get the name of the type of a field, as allowed in a diagram."""
+    vartype = field.type_
+    name = getattr(vartype, "__name__", None) or getattr(vartype, "_name", None)
+    name = re.sub(r"\W", "_", name or str(vartype))
+    if field.shape != SHAPE_SINGLETON:
+        name += "[]"
+    return name
+
+
+def from_models(*models: Type[BaseModel], **kwargs: Any) -> EntityRelationDiagram:
+    """Create an entity relation diagram of pydantic models.
+
+    Args:
+        *models: The models to start from. Models they refer to are included.
+        **kwargs: Keyword arguments to pass to the EntityRelationDiagram
+            constructor.
+
+    Returns:
+        A diagram with an entity for every model.
+
+    """
+    with instrumentation.span("er_models.from_models", models=len(models)):
+        entities: Dict[Type[BaseModel], Entity] = {}
+        names: Dict[str, Type[BaseModel]] = {}
+        queue: Deque[Type[BaseModel]] = deque()
+
+        def visit(model: Type[BaseModel]) -> None:
+            if model in entities:
+                return
+            name = model.__name__
+            suffix = 1
+            while name in names:
+                suffix += 1
+                name = f"{model.__name__}_{suffix}"
+            names[name] = model
+            attributes, _ = describe_model(model)
+            entities[model] = Entity(
+                name, [Field(*attribute) for attribute in attributes]
+            )
+            queue.append(model)
+
+        for model in models:
+            visit(model)
+        relationships = []
+        while queue:
+            model = queue.popleft()
+            for reference in describe_model(model)[1]:
+                visit(reference.model)
+                relationships.append(
+                    Relationship(
+                        entities[model],
+                        entities[reference.model],
+                        RelationshipType.ONE,
+                        reference.cardinality,
+                        reference.label,
+                    )
+                )
+
+    return EntityRelationDiagram(list(entities.values()), relationships, **kwargs)
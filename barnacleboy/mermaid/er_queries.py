@@ -0,0 +1,262 @@
+"""Focus views of entity relation diagrams.
+
+A `ForeignKeyIndex` maps every entity of a diagram to the positions of its
+relationships, in either direction. It is built once and then kept up to date
+by indexing elements appended to the diagram, so views only touch the entities
+and relationships around the entities they start from.
+
+Entities are dataclasses that compare by value, so they are indexed by identity.
+Views share entities and relationships with the original diagram, except for
+entities whose attributes are left out, which are copied.
+"""
+
+from collections import deque
+from typing import Deque, Dict, Iterable, List, Optional, Set, Tuple, Union
+
+from barnacleboy import instrumentation
+from barnacleboy.mermaid.er_diagram import Entity, EntityRelationDiagram, Relationship
+
+ATTRIBUTES = ("all", "focused", "none")
+
+
+class ForeignKeyIndex:
+    """The relationships of every entity of an entity relation diagram.
+
+    The index assumes that entities and relationships are only appended to the
+    lists of the diagram. Replacing or shrinking a list rebuilds it.
+    """
+
+    def __init__(self, diagram: EntityRelationDiagram) -> None:
+        self.diagram = diagram
+        self.positions: Dict[int, int] = {}
+        self.names: Dict[str, Entity] = {}
+        self.relationships: Dict[int, List[int]] = {}
+        self._indexed: Tuple[int, ...] = (0, 0)
+        self._identities: Tuple[int, ...] = ()
+
+    def update(self) -> None:
+        """Index the elements appended since the last update."""
+        diagram = self.diagram
+        counts = (len(diagram.entities), len(diagram.relationships))
+        identities = (id(diagram.entities), id(diagram.relationships))
+        if identities != self._identities or any(
+            count < n for count, n in zip(counts, self._indexed)
+        ):
+            self.positions.clear()
+            self.names.clear()
+            self.relationships.clear()
+            self._identities = identities
+            self._indexed = (0, 0)
+        n_entities, n_relationships = self._indexed
+        if self._indexed == counts:
+            return
+
+        with instrumentation.span("er_queries.index"):
+            for position in range(n_entities, len(diagram.entities)):
+                entity = diagram.entities[position]
+                self.positions[id(entity)] = position
+                self.names.setdefault(entity.name, entity)
+            for position in range(n_relationships, len(diagram.relationships)):
+                relationship = diagram.relationships[position]
+                self.relationships.setdefault(id(relationship.entity1), []).append(
+                    position
+                )
+                if relationship.entity2 is not relationship.entity1:
+                    self.relationships.setdefault(id(relationship.entity2), []).append(
+                        position
+                    )
+        self._indexed = counts
+
+    def lookup(self, entity: Union[Entity, str]) -> Entity:
+        """Get an entity of the diagram.
+
+        Args:
+            entity: The entity or its name.
+
+        Returns:
+            The entity.
+
+        Raises:
+            ValueError: If the entity is not in the diagram.
+
+        """
+        if isinstance(entity, str):
+            if entity not in self.names:
+                raise ValueError(f"Entity {entity} is not in the diagram.")
+            return self.names[entity]
+        if id(entity) not in self.positions:
+            raise ValueError(f"Entity {entity.name} is not in the diagram.")
+        return entity
+
+    def edges(self, entity: Entity) -> Iterable[Tuple[int, Entity]]:
+        """Iterate over the relationships of an entity and the entities they reach.
+
+        Args:
+            entity: The entity to start from.
+
+        Yields:
+            The position of every relationship and the entity at its other end.
+
+        """
+        relationships = self.diagram.relationships
+        for position in self.relationships.get(id(entity), ()):
+            relationship = relationships[position]
+            if relationship.entity1 is entity:
+                yield position, relationship.entity2
+            else:
+                yield position, relationship.entity1
+
+
+def _distances(
+    index: ForeignKeyIndex, start: Entity, depth: Optional[int], stop: Optional[Entity]
+) -> Dict[int, Tuple[Entity, int]]:
+    """Find the entities within a number of relationships, breadth-first.
+
+    Args:
+        index: The foreign key index of the diagram.
+        start: The entity to start from.
+        depth: The maximum number of relationships, None for no limit.
+        stop: An entity to stop at, after the level it is found on.
+
+    Returns:
+        Every entity found and its distance, by identity.
+
+    """
+    found = {id(start): (start, 0)}
+    queue: Deque[Entity] = deque([start])
+    limit = 0 if start is stop else depth
+    while queue:
+        entity = queue.popleft()
+        distance = found[id(entity)][1]
+        if limit is not None and distance >= limit:
+            continue
+        for _, neighbor in index.edges(entity):
+            if id(neighbor) not in found:
+                found[id(neighbor)] = (neighbor, distance + 1)
+                queue.append(neighbor)
+                if neighbor is stop:
+                    limit = distance + 1
+    return found
+
+
+def focus(
+    index: ForeignKeyIndex,
+    entity: Union[Entity, str],
+    depth: int = 1,
+    attributes: str = "all",
+) -> EntityRelationDiagram:
+    """Create a diagram of the entities around an entity.
+
+    Args:
+        index: The foreign key index of the diagram.
+        entity: The entity at the center, or its name.
+        depth: The maximum number of relationships from the center.
+        attributes: Which entities to render the attributes of: "all", "focused"
+            for only the center or "none".
+
+    Returns:
+        A diagram of the entities and every relationship between them.
+
+    Raises:
+        ValueError: If the entity is not in the diagram.
+
+    """
+    _check_attributes(attributes)
+    center = index.lookup(entity)
+    found = _distances(index, center, depth, None)
+    entities = [found_entity for found_entity, _ in found.values()]
+    positions = {
+        position
+        for found_entity in entities
+        for position, neighbor in index.edges(found_entity)
+        if id(neighbor) in found
+    }
+    return _view(index, entities, positions, [center], attributes)
+
+
+def between(
+    index: ForeignKeyIndex,
+    first: Union[Entity, str],
+    second: Union[Entity, str],
+    attributes: str = "all",
+) -> EntityRelationDiagram:
+    """Create a diagram of the shortest foreign key paths between two entities.
+
+    Relationships are followed in either direction. Only the entities within the
+    length of the shortest path of either entity are visited.
+
+    Args:
+        index: The foreign key index of the diagram.
+        first: The entity at one end, or its name.
+        second: The entity at the other end, or its name.
+        attributes: Which entities to render the attributes of: "all", "focused"
+            for only the two ends or "none".
+
+    Returns:
+        A diagram of the entities and relationships on the shortest paths.
+
+    Raises:
+        ValueError: If an entity is not in the diagram or there is no path.
+
+    """
+    _check_attributes(attributes)
+    source, target = index.lookup(first), index.lookup(second)
+    from_source = _distances(index, source, None, target)
+    if id(target) not in from_source:
+        raise ValueError(f"There is no path from {source.name} to {target.name}.")
+    length = from_source[id(target)][1]
+    from_target = _distances(index, target, length, None)
+
+    def remaining(entity: Entity) -> Optional[int]:
+        if id(entity) not in from_target:
+            return None
+        return from_target[id(entity)][1]
+
+    entities = []
+    positions = set()
+    for entity, distance in from_source.values():
+        if remaining(entity) != length - distance:
+            continue
+        entities.append(entity)
+        for position, neighbor in index.edges(entity):
+            if remaining(neighbor) == length - distance - 1:
+                positions.add(position)
+    return _view(index, entities, positions, [source, target], attributes)
+
+
+def _check_attributes(attributes: str) -> None:
+    if attributes not in ATTRIBUTES:
+        raise ValueError(f"Attributes {attributes} is not supported.")
+
+
+def _view(
+    index: ForeignKeyIndex,
+    entities: List[Entity],
+    positions: Set[int],
+    focused: List[Entity],
+    attributes: str,
+) -> EntityRelationDiagram:
+    """Create a diagram of entities and relationships in their original order."""
+    diagram = index.diagram
+    end = len(index.positions)
+    entities = sorted(entities, key=lambda e: index.positions.get(id(e), end))
+
+    copies: Dict[int, Entity] = {}
+    if attributes != "all":
+        kept = {id(entity) for entity in focused} if attributes == "focused" else set()
+        for entity in entities:
+            if entity.attributes and id(entity) not in kept:
+                copies[id(entity)] = Entity(entity.name)
+
+    def endpoint(entity: Entity) -> Entity:
+        return copies.get(id(entity), entity)
+
+    relationships: List[Relationship] = []
+    for position in sorted(positions):
+        relationship = diagram.relationships[position]
+        if id(relationship.entity1) in copies or id(relationship.entity2) in copies:
+            relationship = relationship.rewire(
+                endpoint(relationship.entity1), endpoint(relationship.entity2)
+            )
+        relationships.append(relationship)
+    return diagram.derive([endpoint(entity) for entity in entities], relationships)
@@ -1,12 +1,36 @@
-""" Module for building mermaid flowcharts. """
+"""Module for building mermaid flowcharts."""
+
+import itertools
+import re
+import weakref
 from enum import Enum
-from typing import List, Optional, Any, Union
+from pathlib import Path
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Dict,
+    Hashable,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Any,
+    Set,
+    SupportsIndex,
+    Tuple,
+    Union,
+)
 
+from barnacleboy import instrumentation
 from barnacleboy.mermaid.base import MermaidBase
-from barnacleboy.mermaid.utils import (
-    generate_internal_ids,
-    init_string,
-)
+from barnacleboy.mermaid.hashing import Hashed
+from barnacleboy.mermaid.utils import generate_compact_ids, generate_internal_ids
+
+if TYPE_CHECKING:
+    from barnacleboy.mermaid.queries import AdjacencyIndex
+    from barnacleboy.mermaid.mapped import MappedFlowchart
+    from barnacleboy.mermaid.reduction import ReductionReport
+    from barnacleboy.mermaid.sharding import ShardedFlowchart
 
 
 class Orientation(Enum):
@@ -51,19 +75,49 @@ class NodeShape(Enum):
     DOUBLE_CIRCLE: str = "((($1)))"
 
 
-class Node:
+def quote_label(text: str) -> str:
+    """Quote text so that mermaid does not interpret brackets or markup.
+
+    Args:
+        text: The text of a node or the title of a subgraph.
+
+    Returns:
+        The quoted text, to use as the name of a node or subgraph.
+
+    """
+    for character, entity in (("#", "#35;"), ('"', "#quot;"), ("<", "#lt;")):
+        text = text.replace(character, entity)
+    return f'"{text.replace(">", "#gt;")}"'
+
+
+class Node(Hashed):
     """A node in a flowchart."""
 
-    def __init__(self, name: str, shape: NodeShape = NodeShape.ROUNDED):
+    _hashed_fields = ("name", "shape", "link", "style", "class_name", "_internal_id")
+
+    def __init__(
+        self,
+        name: str,
+        shape: NodeShape = NodeShape.ROUNDED,
+        link: Optional[str] = None,
+        style: Optional[Dict[str, str]] = None,
+        class_name: Optional[str] = None,
+    ):
         """Initialize a node.
 
         Args:
             name: The name of the node.
             shape: The shape of the node.
+            link: A URL to open when the node is clicked.
+            style: CSS properties of the node, e.g. {"fill": "#f9f"}.
+            class_name: The name of a class defined with `Flowchart.define_class`.
 
         """
         self.name = name
         self.shape = shape
+        self.link = link
+        self.style = style
+        self.class_name = class_name
         self._internal_id: str = ""
 
     def __str__(self) -> str:
@@ -71,40 +125,174 @@ class Node:
         return self._internal_id + self.shape.value.replace("$1", self.name)
 
 
-class Subgraph:
+class _Members(list):
+    """The entities of a subgraph, which tell the subgraph when they change."""
+
+    def __init__(
+        self, subgraph: "Subgraph", items: Iterable[Union[Node, "Subgraph"]] = ()
+    ) -> None:
+        super().__init__(items)
+        self.subgraph = subgraph
+
+    def append(self, item: Any) -> None:
+        super().append(item)
+        self.subgraph._members_changed()
+
+    def extend(self, items: Iterable[Any]) -> None:
+        super().extend(items)
+        self.subgraph._members_changed()
+
+    def insert(self, index: SupportsIndex, item: Any) -> None:
+        super().insert(index, item)
+        self.subgraph._members_changed()
+
+    def pop(self, index: SupportsIndex = -1) -> Any:
+        item = super().pop(index)
+        self.subgraph._members_changed()
+        return item
+
+    def remove(self, item: Any) -> None:
+        super().remove(item)
+        self.subgraph._members_changed()
+
+    def clear(self) -> None:
+        super().clear()
+        self.subgraph._members_changed()
+
+    def __setitem__(self, index: Any, value: Any) -> None:
+        super().__setitem__(index, value)
+        self.subgraph._members_changed()
+
+    def __delitem__(self, index: Any) -> None:
+        super().__delitem__(index)
+        self.subgraph._members_changed()
+
+    def __imul__(self, n: SupportsIndex) -> "_Members":  # type: ignore
+        super().__imul__(n)
+        self.subgraph._members_changed()
+        return self
+
+
+class Subgraph(Hashed):
     """A subgraph in a flowchart.
 
+    The entities are kept in a list of the subgraph's own, which tells the
+    flowcharts that contain the subgraph when it changes. Change the members
+    through `entities`, not through the list that was passed.
+
     Args:
         name: The name of the subgraph.
         nodes: The entities in the subgraph.
 
     """
 
+    _hashed_fields = ("name", "entities", "direction", "_internal_id")
+    # Weak references to the flowcharts that indexed the members, by ID.
+    _flowcharts: Optional[Dict[int, "weakref.ref[Flowchart]"]] = None
+
     def __init__(self, name: str, nodes: List[Union[Node, "Subgraph"]]) -> None:
         self.name = name
         self.entities = nodes
         self._internal_id: str = ""
         self.direction: str = Orientation.TOP_BOTTOM.value
 
+    @property
+    def entities(self) -> List[Union[Node, "Subgraph"]]:
+        """The nodes and subgraphs in the subgraph."""
+        return self._entities
+
+    @entities.setter
+    def entities(self, entities: Iterable[Union[Node, "Subgraph"]]) -> None:
+        self._entities = _Members(self, entities)
+        self._members_changed()
+
+    def __getstate__(self) -> Dict[str, Any]:
+        state = super().__getstate__()
+        state.pop("_flowcharts", None)
+        state["_entities"] = list(self._entities)
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self.__dict__["_entities"] = _Members(self, state["_entities"])
+
+    def _watch_members(self, flowchart: "Flowchart") -> None:
+        watchers = self.__dict__.setdefault("_flowcharts", {})
+        watchers[id(flowchart)] = weakref.ref(flowchart)
+
+    def _members_changed(self) -> None:
+        if not self._flowcharts:
+            return
+        for flowchart_id, reference in list(self._flowcharts.items()):
+            flowchart = reference()
+            if flowchart is None:
+                del self._flowcharts[flowchart_id]
+            else:
+                flowchart._stale.add(self)
+
+    def children(self) -> List[Union[Node, "Subgraph"]]:
+        """Get the entities of the subgraph, nodes before subgraphs."""
+        nodes: List[Union[Node, Subgraph]] = []
+        subgraphs: List[Union[Node, Subgraph]] = []
+        for entity in self.entities:
+            (subgraphs if isinstance(entity, Subgraph) else nodes).append(entity)
+        return nodes + subgraphs
+
     def __str__(self) -> str:
-        output_string = f"subgraph {self._internal_id} [{self.name}]\n"
-        output_string += f"direction {self.direction}\n"
-        nodes = [entity for entity in self.entities if isinstance(entity, Node)]
-        subgraphs = [entity for entity in self.entities if isinstance(entity, Subgraph)]
+        return "\n".join(render_entities([self])) + "\n"
 
-        for node in nodes:
-            output_string += f"{node}\n"
 
-        for subgraph in subgraphs:
-            output_string += f"{subgraph}\n"
+def render_entities(
+    entities: Iterable[Union[Node, Subgraph]], default_direction: Optional[str] = None
+) -> List[str]:
+    """Render nodes and (nested) subgraphs to lines of a flowchart.
 
-        output_string += "end\n"
-        return output_string
+    Nested subgraphs are rendered iteratively, so the depth of the hierarchy is
+    not limited by the recursion limit. Entities reachable through more than one
+    subgraph are only rendered the first time they are encountered.
+
+    Args:
+        entities: The top-level entities to render.
+        default_direction: The orientation of the flowchart. If given, direction
+            lines are left out for subgraphs that have this direction and are
+            only nested in subgraphs that have it too.
 
+    Returns:
+        The lines of the rendered entities.
 
-class Relationship:
+    """
+    lines: List[str] = []
+    seen: Set[Union[Node, Subgraph]] = set()
+    stack: List[Iterator[Union[Node, Subgraph]]] = [iter(entities)]
+    inherited: List[Optional[str]] = [default_direction]
+    while stack:
+        for entity in stack[-1]:
+            if entity in seen:
+                continue
+            seen.add(entity)
+            if isinstance(entity, Subgraph):
+                lines.append(f"subgraph {entity._internal_id} [{entity.name}]")
+                if entity.direction != inherited[-1]:
+                    lines.append(f"direction {entity.direction}")
+                    inherited.append(None)
+                else:
+                    inherited.append(entity.direction)
+                stack.append(iter(entity.children()))
+                break
+            lines.append(str(entity))
+        else:
+            stack.pop()
+            inherited.pop()
+            if stack:
+                lines.append("end")
+    return lines
+
+
+class Relationship(Hashed):
     """A relationship between two entities."""
 
+    _hashed_fields = ("entities", "style", "input_arrow", "output_arrow", "label")
+
     def __init__(
         self,
         entities: List[Union[Node, Subgraph]],
@@ -132,10 +320,30 @@ class Relationship:
         if len(self.entities) != 2:
             raise ValueError("A relationship must have exactly two nodes.")
 
-    def __str__(self) -> str:
-        """Generate a relationship string."""
+    def rewire(
+        self, source: Union[Node, Subgraph], target: Union[Node, Subgraph]
+    ) -> "Relationship":
+        """Copy the relationship between two other entities.
+
+        Args:
+            source: The first entity of the copy.
+            target: The second entity of the copy.
+
+        Returns:
+            A relationship with the same style, arrows and label.
+
+        """
+        return Relationship(
+            [source, target],
+            style=self.style,
+            input_arrow=self.input_arrow,
+            output_arrow=self.output_arrow,
+            label=self.label,
+        )
+
+    def link(self) -> str:
+        """Generate the link between the entities, e.g. "--->|label|"."""
         output_string = ""
-        output_string += self.entities[0]._internal_id
         if self.input_arrow:
             output_string += self.input_arrow
         output_string += RelationshipStyles[self.style].value
@@ -143,14 +351,146 @@ class Relationship:
             output_string += self.output_arrow
         if self.label:
             output_string += f"|{self.label}|"
-        output_string += self.entities[1]._internal_id
-
         return output_string
 
+    def __str__(self) -> str:
+        """Generate a relationship string."""
+        return (
+            self.entities[0]._internal_id + self.link() + self.entities[1]._internal_id
+        )
+
+
+def render_styles(
+    nodes: Iterable[Node], class_defs: Optional[Dict[str, Dict[str, str]]] = None
+) -> List[str]:
+    """Render the classes and styles of nodes to lines of a flowchart.
+
+    Nodes that share a style dictionary, or have equal ones, share a generated
+    `classDef` that is assigned with one `class` line, so the style text is
+    rendered once per distinct style. A style of a single node is rendered as a
+    `style` line, which is shorter.
+
+    Args:
+        nodes: The nodes to render the classes and styles of.
+        class_defs: The CSS properties of named classes.
+
+    Returns:
+        The lines.
+
+    """
+    class_defs = class_defs or {}
+    members: Dict[str, List[str]] = {name: [] for name in class_defs}
+    styles: Dict[Tuple[Tuple[str, str], ...], List[Node]] = {}
+    keys: Dict[int, Tuple[Tuple[str, str], ...]] = {}
+    for node in nodes:
+        if node.class_name is not None:
+            if node.class_name not in members:
+                raise ValueError(f"Class {node.class_name} is not defined.")
+            members[node.class_name].append(node._internal_id)
+        if node.style:
+            # Bulk styled nodes share a dictionary, so only sort its items once.
+            key = keys.get(id(node.style))
+            if key is None:
+                key = keys[id(node.style)] = tuple(sorted(node.style.items()))
+            styles.setdefault(key, []).append(node)
+
+    def properties(style: Iterable[Tuple[str, str]]) -> str:
+        return ",".join(f"{key}:{value}" for key, value in style)
+
+    lines = [
+        f"classDef {name} {properties(style.items())}"
+        for name, style in class_defs.items()
+    ]
+    assignments = [
+        f"class {','.join(ids)} {name}" for name, ids in members.items() if ids
+    ]
+    generated = (f"s{i}" for i in itertools.count())
+    for key, styled in styles.items():
+        if len(styled) == 1:
+            assignments.append(f"style {styled[0]._internal_id} {properties(key)}")
+            continue
+        name = next(generated)
+        while name in class_defs:
+            name = next(generated)
+        lines.append(f"classDef {name} {properties(key)}")
+        assignments.append(f"class {','.join(n._internal_id for n in styled)} {name}")
+    return lines + assignments
+
+
+def compress_relationships(
+    relationships: Iterable[Relationship], compact: bool = False
+) -> List[str]:
+    """Render relationships to as few lines as possible.
+
+    Relationships with the same style, arrows and label are grouped. Sources
+    with exactly the same targets are merged into one `A & B--->C & D` line, and
+    lines where the targets of one are the sources of the next are chained into
+    `A--->B--->C`. Duplicate relationships are rendered on lines of their own.
+    Every step is a pass over hash tables, so the time is linear in the number
+    of relationships.
+
+    Args:
+        relationships: The relationships to render.
+        compact: Whether to leave out the spaces around "&".
+
+    Returns:
+        The lines.
+
+    """
+    separator = "&" if compact else " & "
+
+    # Targets of every source, per link.
+    links: Dict[str, Dict[Union[Node, Subgraph], Dict[Union[Node, Subgraph], None]]]
+    links = {}
+    duplicates: List[Relationship] = []
+    for relationship in relationships:
+        source, target = relationship.entities
+        targets = links.setdefault(relationship.link(), {}).setdefault(source, {})
+        if target in targets:
+            duplicates.append(relationship)
+        else:
+            targets[target] = None
+
+    lines = []
+    for link, targets_by_source in links.items():
+        # Sources with the same targets, keyed by their targets.
+        groups: Dict[Tuple[Union[Node, Subgraph], ...], List[Union[Node, Subgraph]]]
+        groups = {}
+        for source, targets in targets_by_source.items():
+            groups.setdefault(tuple(targets), []).append(source)
+        # Every source is in one group, so the sources identify a group.
+        by_sources = {tuple(sources): targets for targets, sources in groups.items()}
+
+        used: Set[Tuple[Union[Node, Subgraph], ...]] = set()
+        starts = [sources for sources in by_sources if sources not in groups]
+        for sources in starts + list(by_sources):
+            if sources in used:
+                continue
+            parts = [separator.join(entity._internal_id for entity in sources)]
+            while sources in by_sources and sources not in used:
+                used.add(sources)
+                sources = by_sources[sources]
+                parts.append(separator.join(entity._internal_id for entity in sources))
+            lines.append(link.join(parts))
+
+    lines += [str(relationship) for relationship in duplicates]
+    return lines
+
 
 class Flowchart(MermaidBase):
     """Base class for a flowchart."""
 
+    _hashed_fields = MermaidBase._hashed_fields + (
+        "nodes",
+        "relationships",
+        "subgraphs",
+        "orientation",
+        "title",
+        "compress_edges",
+        "canonical",
+        "class_defs",
+    )
+
     def __init__(
         self,
         nodes: Optional[List[Node]] = None,
@@ -158,25 +498,48 @@ class Flowchart(MermaidBase):
         subgraphs: Optional[List[Subgraph]] = None,
         orientation: str = Orientation.TB.value,
         title: Optional[str] = None,
+        compress_edges: bool = False,
+        canonical: bool = False,
         **kwargs: Any,
     ):
         """Initialize a flowchart.
 
+        The lists are used as they are, so changing them changes the flowchart.
+
         Args:
             nodes: A list of nodes in the flowchart.
             relationships: A list of relationships between entities in the flowchart.
             orientation: The orientation of the flowchart, defaults to "TB".
             title: The title of the flowchart.
+            compress_edges: Whether to merge relationships into "&" and chained
+                lines, see `compress_relationships`.
+            canonical: Whether to render entities and relationships in an order
+                that only depends on their content, with IDs derived from their
+                content, see `barnacleboy.mermaid.canonical`.
 
         """
         super(Flowchart, self).__init__(**kwargs)
-        self.nodes = nodes or []
-        self.relationships = relationships or []
-        self.subgraphs = subgraphs or []
+        self.nodes = nodes if nodes is not None else []
+        self.relationships = relationships if relationships is not None else []
+        self.subgraphs = subgraphs if subgraphs is not None else []
         self.orientation = orientation
         self.title = title
-        self.config = {}  # type: ignore
-
+        self.compress_edges = compress_edges
+        self.canonical = canonical
+        self.class_defs: Dict[str, Dict[str, str]] = {}
+        self._parents: Dict[Union[Node, Subgraph], Subgraph] = {}
+        # The members of every indexed subgraph at the time it was indexed.
+        self._children: Dict[Subgraph, List[Union[Node, Subgraph]]] = {}
+        # Indexed subgraphs whose members changed since, which tell the flowchart.
+        self._stale: Set[Subgraph] = set()
+        # The list of subgraphs that was indexed and its length.
+        self._indexed_subgraphs: Optional[List[Subgraph]] = None
+        self._n_indexed = 0
+        self._adjacency: Optional["AdjacencyIndex"] = None
+        # Derived flowcharts share entities, which must keep their IDs.
+        self._shares_entities = False
+
+        self._reindex()
         self.set_internal_ids()
 
     def create_node(self, *args: Any, **kwargs: Any) -> Node:
@@ -220,12 +583,6 @@ class Flowchart(MermaidBase):
 
         """
         subgraph = Subgraph(*args, **kwargs)
-        for existing_subgraph in self.subgraphs:
-            for entity in subgraph.entities:
-                if entity in existing_subgraph.entities:
-                    raise ValueError(
-                        "Cannot add a subgraph with entities that are already in another subgraph."
-                    )
         self.add_subgraphs([subgraph])
         return subgraph
 
@@ -237,7 +594,52 @@ class Flowchart(MermaidBase):
         """
         for node in nodes:
             self.nodes.append(node)
-        self.set_internal_ids()
+        self._assign_ids()
+
+    def define_class(self, name: str, style: Dict[str, str]) -> None:
+        """Define a class of nodes that share CSS properties.
+
+        Args:
+            name: The name of the class.
+            style: CSS properties of the class, e.g. {"fill": "#f9f"}.
+
+        Raises:
+            ValueError: If the name is not a valid class name.
+
+        """
+        if not re.fullmatch(r"[A-Za-z_][\w-]*", name):
+            raise ValueError(f"Invalid class name {name!r}.")
+        self.class_defs[name] = dict(style)
+
+    def assign_class(self, nodes: Iterable[Node], name: Optional[str]) -> None:
+        """Assign a class to many nodes.
+
+        Args:
+            nodes: The nodes to assign the class to.
+            name: The name of a defined class, or None to remove the class.
+
+        Raises:
+            ValueError: If the class is not defined.
+
+        """
+        if name is not None and name not in self.class_defs:
+            raise ValueError(f"Class {name} is not defined.")
+        for node in nodes:
+            node.class_name = name
+
+    def style_nodes(self, nodes: Iterable[Node], style: Dict[str, str]) -> None:
+        """Set the same CSS properties on many nodes.
+
+        The nodes share one copy of the style, which is rendered once as a class.
+
+        Args:
+            nodes: The nodes to style.
+            style: CSS properties of the nodes, e.g. {"fill": "#f9f"}.
+
+        """
+        shared = dict(style)
+        for node in nodes:
+            node.style = shared
 
     def add_relationships(self, relationships: List[Relationship]) -> None:
         """Add many relationships.
@@ -246,12 +648,13 @@ class Flowchart(MermaidBase):
             relationships: Relationships between the two entities.
 
         """
-        for relationship in relationships:
-            for node in relationship.entities:
-                if node not in self.nodes:
-                    raise ValueError(
-                        "Relationships must be between entities in the flowchart."
-                    )
+        with instrumentation.span("flowchart.validate_relationships"):
+            for relationship in relationships:
+                for node in relationship.entities:
+                    if node not in self.nodes:
+                        raise ValueError(
+                            "Relationships must be between entities in the flowchart."
+                        )
 
         self.relationships += relationships
 
@@ -261,39 +664,430 @@ class Flowchart(MermaidBase):
         Args:
             subgraphs: Subgraphs to add to the flowchart.
 
+        Raises:
+            ValueError: If an entity is already in another subgraph.
+
         """
+        self._parent_index()
+        self._index_subgraphs(subgraphs)
         self.subgraphs += subgraphs
-        self.set_internal_ids()
+        self._n_indexed = len(self.subgraphs)
+        self._assign_ids()
+
+    def parent(self, entity: Union[Node, Subgraph]) -> Optional[Subgraph]:
+        """Get the subgraph that directly contains an entity.
+
+        Args:
+            entity: A node or subgraph.
+
+        Returns:
+            The containing subgraph, or None for top-level entities.
+
+        """
+        return self._parent_index().get(entity)
+
+    def _parent_index(self) -> Dict[Union[Node, Subgraph], Subgraph]:
+        """Get the parents of entities, updated for subgraphs that changed.
+
+        Subgraphs tell the flowchart when their members change, and subgraphs
+        appended to `subgraphs` are noticed by its length, so only the changed
+        and added subgraphs are indexed again. Other changes to `subgraphs` index
+        all subgraphs again.
+        """
+        subgraphs = self.subgraphs
+        if subgraphs is not self._indexed_subgraphs or len(subgraphs) < self._n_indexed:
+            self._reindex()
+        elif self._stale or len(subgraphs) > self._n_indexed:
+            stale, self._stale = self._stale, set()
+            for subgraph in stale:
+                for entity in self._children.pop(subgraph, ()):
+                    if self._parents.get(entity) is subgraph:
+                        del self._parents[entity]
+            try:
+                self._index_subgraphs([*stale, *subgraphs[self._n_indexed :]])
+            except ValueError:
+                # Index them again on the next call, which raises again.
+                self._stale.update(stale)
+                raise
+            self._n_indexed = len(subgraphs)
+        return self._parents
+
+    def _reindex(self) -> None:
+        """Index the parents of entities in all subgraphs from scratch."""
+        self._parents = {}
+        self._children = {}
+        self._stale = set()
+        self._index_subgraphs(self.subgraphs)
+        self._indexed_subgraphs = self.subgraphs
+        self._n_indexed = len(self.subgraphs)
+
+    def _index_subgraphs(self, subgraphs: List[Subgraph]) -> None:
+        """Record the parent of every entity in (nested) subgraphs."""
+        parents: Dict[Union[Node, Subgraph], Subgraph] = {}
+        children: Dict[Subgraph, List[Union[Node, Subgraph]]] = {}
+        stack = [subgraph for subgraph in subgraphs if subgraph not in self._children]
+        while stack:
+            subgraph = stack.pop()
+            members = children[subgraph] = list(subgraph.entities)
+            for entity in members:
+                parent = parents.get(entity) or self._parents.get(entity)
+                if parent is subgraph:
+                    continue
+                if parent is not None:
+                    raise ValueError(
+                        "Cannot add a subgraph with entities that are already in another subgraph."
+                    )
+                parents[entity] = subgraph
+                if isinstance(entity, Subgraph) and not (
+                    entity in self._children or entity in children
+                ):
+                    stack.append(entity)
+        self._parents.update(parents)
+        self._children.update(children)
+        for subgraph in children:
+            subgraph._watch_members(self)
+
+    def derive(
+        self,
+        nodes: List[Node],
+        relationships: List[Relationship],
+        subgraphs: Optional[List[Subgraph]] = None,
+    ) -> "Flowchart":
+        """Create a flowchart that shares elements with this flowchart.
+
+        Unlike the constructor, this does not renumber the shared elements, so
+        both flowcharts keep rendering correctly. Only elements without an
+        internal ID are given one, also when elements are added to the new
+        flowchart later.
+
+        Args:
+            nodes: The nodes of the new flowchart.
+            relationships: The relationships of the new flowchart.
+            subgraphs: The subgraphs of the new flowchart.
+
+        Returns:
+            A flowchart with the same theme, orientation and title.
+
+        """
+        flowchart = Flowchart(
+            orientation=self.orientation,
+            title=self.title,
+            theme=self._theme,
+            compact=self.compact,
+            compress_edges=self.compress_edges,
+            canonical=self.canonical,
+        )
+        flowchart.config = dict(self.config)
+        flowchart.class_defs = dict(self.class_defs)
+        flowchart.nodes = list(nodes)
+        flowchart.relationships = list(relationships)
+        flowchart.subgraphs = list(subgraphs or [])
+        flowchart._reindex()
+        flowchart._shares_entities = True
+        flowchart.set_missing_internal_ids()
+        return flowchart
+
+    def reduce(self, **passes: Any) -> Tuple["Flowchart", "ReductionReport"]:
+        """Reduce the flowchart to keep it renderable.
+
+        Args:
+            **passes: The passes to apply, see `barnacleboy.mermaid.reduction.reduce`.
+
+        Returns:
+            The reduced flowchart and a report of what was collapsed.
+
+        """
+        from barnacleboy.mermaid.reduction import reduce
+
+        return reduce(self, **passes)
+
+    def adjacency(self) -> "AdjacencyIndex":
+        """Get the adjacency index of the flowchart, updated with new elements.
+
+        Returns:
+            The index, see `barnacleboy.mermaid.queries.AdjacencyIndex`.
+
+        """
+        from barnacleboy.mermaid.queries import AdjacencyIndex
+
+        if self._adjacency is None:
+            self._adjacency = AdjacencyIndex(self)
+        self._adjacency.update()
+        return self._adjacency
+
+    def neighbors(self, entity: Union[Node, Subgraph], depth: int = 1) -> "Flowchart":
+        """Get the entities connected to an entity in either direction.
+
+        Args:
+            entity: The entity at the center.
+            depth: The maximum number of relationships from the entity.
+
+        Returns:
+            A flowchart of the entities and the relationships between them.
+
+        """
+        from barnacleboy.mermaid.queries import induced_subchart, traverse
+
+        index = self.adjacency()
+        return induced_subchart(index, traverse(index, entity, "both", depth))
+
+    def ancestors(
+        self, entity: Union[Node, Subgraph], depth: Optional[int] = None
+    ) -> "Flowchart":
+        """Get the entities an entity can be reached from.
+
+        Args:
+            entity: The entity to start from.
+            depth: The maximum number of relationships, None for no limit.
+
+        Returns:
+            A flowchart of the entities and the relationships between them.
+
+        """
+        from barnacleboy.mermaid.queries import induced_subchart, traverse
+
+        index = self.adjacency()
+        return induced_subchart(index, traverse(index, entity, "in", depth))
+
+    def descendants(
+        self, entity: Union[Node, Subgraph], depth: Optional[int] = None
+    ) -> "Flowchart":
+        """Get the entities that can be reached from an entity.
+
+        Args:
+            entity: The entity to start from.
+            depth: The maximum number of relationships, None for no limit.
+
+        Returns:
+            A flowchart of the entities and the relationships between them.
+
+        """
+        from barnacleboy.mermaid.queries import induced_subchart, traverse
+
+        index = self.adjacency()
+        return induced_subchart(index, traverse(index, entity, "out", depth))
+
+    def shortest_path(
+        self,
+        source: Union[Node, Subgraph],
+        target: Union[Node, Subgraph],
+        directed: bool = True,
+    ) -> "Flowchart":
+        """Get a path with the fewest relationships between two entities.
+
+        Args:
+            source: The entity to start from.
+            target: The entity to reach.
+            directed: Whether relationships can only be followed forwards.
+
+        Returns:
+            A flowchart of the entities and relationships on the path.
+
+        Raises:
+            ValueError: If there is no path.
+
+        """
+        from barnacleboy.mermaid.queries import shortest_path
+
+        return shortest_path(self.adjacency(), source, target, directed)
+
+    def induced_subchart(
+        self, entities: Iterable[Union[Node, Subgraph]]
+    ) -> "Flowchart":
+        """Get some entities and all relationships between them.
+
+        Args:
+            entities: The entities to keep.
+
+        Returns:
+            A flowchart that shares the nodes and relationships of this one.
+
+        """
+        from barnacleboy.mermaid.queries import induced_subchart
+
+        return induced_subchart(self.adjacency(), entities)
+
+    def shard(
+        self,
+        max_nodes: int = 500,
+        max_chars: Optional[int] = None,
+        strategy: str = "components",
+    ) -> "ShardedFlowchart":
+        """Split the flowchart into linked pages.
+
+        Args:
+            max_nodes: The maximum number of nodes per page.
+            max_chars: The maximum size of the rendered text of a page.
+            strategy: "components", "subgraphs" or "edge_cut", see
+                `barnacleboy.mermaid.sharding.shard`.
+
+        Returns:
+            The pages, which can be saved together with an index page.
+
+        """
+        from barnacleboy.mermaid.sharding import shard
+
+        return shard(self, max_nodes, max_chars, strategy)
+
+    def save_drilldown(self, filename: Union[str, Path], depth: int = 0) -> None:
+        """Save the flowchart to an html page with collapsible subgraphs.
+
+        Args:
+            filename: The path to save the page to.
+            depth: The number of subgraph levels that are initially expanded,
+                see `barnacleboy.mermaid.drilldown`.
+
+        """
+        from barnacleboy.mermaid.drilldown import save_drilldown
+
+        save_drilldown(self, filename, depth)
+
+    @staticmethod
+    def merge(
+        *charts: "Flowchart", key: Optional[Callable[[Node], Hashable]] = None
+    ) -> "Flowchart":
+        """Merge flowcharts that were built separately.
+
+        Args:
+            *charts: The flowcharts to merge.
+            key: A function that gets the key nodes are unified by, defaults to
+                their name. See `barnacleboy.mermaid.merging.merge`.
+
+        Returns:
+            A flowchart of copies of the merged elements.
+
+        """
+        from barnacleboy.mermaid.merging import merge
+
+        return merge(charts, key)
+
+    @staticmethod
+    def from_mmap(
+        nodes_path: Union[str, Path],
+        edges_path: Union[str, Path],
+        **kwargs: Any,
+    ) -> "MappedFlowchart":
+        """Open a flowchart that is too large to hold in memory.
+
+        Args:
+            nodes_path: The path to a nodes file, see `barnacleboy.mermaid.mapped`.
+            edges_path: The path to an edges file.
+            **kwargs: Keyword arguments to pass to the MappedFlowchart constructor.
+
+        Returns:
+            A flowchart that renders straight from the memory-mapped files.
+
+        """
+        from barnacleboy.mermaid.mapped import MappedFlowchart
+
+        return MappedFlowchart(nodes_path, edges_path, **kwargs)
+
+    def to_bytes(self) -> bytes:
+        """Encode the flowchart compactly, see `barnacleboy.mermaid.serialization`.
+
+        Returns:
+            The encoded flowchart.
+
+        """
+        from barnacleboy.mermaid.serialization import to_bytes
+
+        return to_bytes(self)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "Flowchart":
+        """Decode a flowchart encoded with `to_bytes`.
+
+        Args:
+            data: The encoded flowchart, or any buffer containing it.
+
+        Returns:
+            The flowchart.
+
+        """
+        from barnacleboy.mermaid.serialization import from_bytes
+
+        return from_bytes(data, cls)
+
+    def __getstate__(self) -> Dict[str, Any]:
+        state = super().__getstate__()
+        # Subgraphs do not pickle the flowcharts they tell about changes.
+        state.update(_parents={}, _children={}, _stale=set(), _indexed_subgraphs=None)
+        return state
+
+    def _generate_ids(self, n_entities: int) -> Iterator[str]:
+        if self.compact:
+            return generate_compact_ids(n_entities)
+        return generate_internal_ids(n_entities)
+
+    def _assign_ids(self) -> None:
+        """Give added entities an ID, without renumbering shared entities."""
+        if self._shares_entities:
+            self.set_missing_internal_ids()
+        else:
+            self.set_internal_ids()
 
     def set_internal_ids(self) -> None:
         """Set the internal IDs of the entities."""
-        ids = generate_internal_ids(len(self.nodes) + len(self.subgraphs))
+        with instrumentation.span("flowchart.set_internal_ids"):
+            ids = self._generate_ids(len(self.nodes) + len(self.subgraphs))
+            entities = self.nodes + self.subgraphs
+            for entity, entity_id in zip(entities, ids):
+                entity._internal_id = entity_id
+
+    def set_missing_internal_ids(self) -> None:
+        """Set the internal IDs of entities that do not have one yet."""
         entities = self.nodes + self.subgraphs
-        for entity, entity_id in zip(entities, ids):
+        used = {entity._internal_id for entity in entities if entity._internal_id}
+        missing = [entity for entity in entities if not entity._internal_id]
+        ids = (
+            entity_id
+            for entity_id in self._generate_ids(len(used) + len(missing))
+            if entity_id not in used
+        )
+        for entity, entity_id in zip(missing, ids):
             entity._internal_id = entity_id
 
     def get_flowchart_string(self) -> str:
         """Generate a flowchart string."""
-        output_string = init_string(self.base_config, self.config)
+        if self.canonical:
+            from barnacleboy.mermaid.canonical import canonical_flowchart
+
+            return canonical_flowchart(self).get_flowchart_string()
+        output_string = self.get_init_string()
         if self.title:
             output_string += f"---\ntitle: {self.title}\n---\n"
         output_string += f"graph {self.orientation}\n"
 
-        # Remove nodes/subgraphs that are in subgraphs
-        entities = self.nodes + self.subgraphs
-        for subgraph in self.subgraphs:
-            for entity in subgraph.entities:
-                if entity in entities:
-                    entities.remove(entity)
-        for entity in entities:
-            output_string += f"    {entity}\n"
-
-        output_string += "\n"
-
-        for relationship in self.relationships:
-            output_string += f"    {relationship}\n"
-
+        parents = self._parent_index()
+        entities: List[Union[Node, Subgraph]] = [
+            entity for entity in self.nodes if entity not in parents
+        ]
+        entities += [subgraph for subgraph in self.subgraphs if subgraph not in parents]
+        indent = "" if self.compact else "    "
+        lines = render_entities(entities, self.orientation if self.compact else None)
+        output_string += "".join(f"{indent}{line}\n" for line in lines)
+        if not self.compact:
+            output_string += "\n"
+        if self.compress_edges:
+            links = compress_relationships(self.relationships, self.compact)
+        else:
+            links = [str(relationship) for relationship in self.relationships]
+        output_string += "".join(f"{indent}{link}\n" for link in links)
+        output_string += "".join(
+            f'{indent}click {node._internal_id} href "{node.link}"\n'
+            for node in self.nodes
+            if node.link
+        )
+        output_string += "".join(
+            f"{indent}{line}\n" for line in render_styles(self.nodes, self.class_defs)
+        )
+
+        instrumentation.count(
+            "elements_rendered",
+            len(self.nodes) + len(self.subgraphs) + len(self.relationships),
+        )
         return output_string
 
+    @instrumentation.traced("render.flowchart")
     def __str__(self) -> str:
         return self.get_flowchart_string()
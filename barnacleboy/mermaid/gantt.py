@@ -0,0 +1,466 @@
+"""Mermaid Gantt diagrams, including diagrams of timing traces."""
+
+import bisect
+import dataclasses
+import functools
+import heapq
+import json
+from pathlib import Path
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from barnacleboy import instrumentation
+from barnacleboy.mermaid.base import MermaidBase
+from barnacleboy.mermaid.hashing import Hashed
+from barnacleboy.mermaid.heavy_hitters import HeavyHitters
+
+ROOT_SECTION = "(root)"
+LONGEST_SECTION = "Longest spans"
+# The number of sections and tasks counted while streaming, per one that is shown.
+CAPACITY_FACTOR = 4
+MIN_CAPACITY = 256
+
+
+def capacity(limit: int) -> int:
+    """Get the number of sections or tasks to count to show a number of them."""
+    return max(CAPACITY_FACTOR * limit, MIN_CAPACITY)
+
+
+def _escape(text: str) -> str:
+    """Escape characters that end a task or section name."""
+    return text.replace("#", "#35;").replace(":", "#colon;").replace("\n", " ")
+
+
+@dataclasses.dataclass
+class GanttTask(Hashed):
+    """A task in a Gantt diagram.
+
+    Args:
+        name: The name of the task.
+        start: The start of the task in the date format of the diagram.
+        end: The end of the task in the date format of the diagram.
+        tags: Mermaid tags of the task, e.g. "crit", "active" or "done".
+
+    """
+
+    name: str
+    start: Union[int, str]
+    end: Union[int, str]
+    tags: List[str] = dataclasses.field(default_factory=list)
+
+    _hashed_fields = ("name", "start", "end", "tags")
+
+    def __str__(self) -> str:
+        """Get a string representation of the object."""
+        fields = self.tags + [str(self.start), str(self.end)]
+        return f"{_escape(self.name)} :{', '.join(fields)}"
+
+
+class GanttSection(Hashed):
+    """A section in a Gantt diagram."""
+
+    _hashed_fields = ("title", "tasks")
+
+    def __init__(self, title: str, tasks: Optional[List[GanttTask]] = None) -> None:
+        """Initialize a section.
+
+        Args:
+            title: The title of the section.
+            tasks: A list of tasks in the section.
+        """
+        self.title = title
+        self.tasks = tasks if tasks else []
+
+    def add_task(self, *args: Any, **kwargs: Any) -> GanttTask:
+        """Append a task to the section.
+
+        Args:
+            *args: Positional arguments to pass to the GanttTask constructor.
+            **kwargs: Keyword arguments to pass to the GanttTask constructor.
+
+        Returns:
+            The created task.
+        """
+        task = GanttTask(*args, **kwargs)
+        self.tasks.append(task)
+        return task
+
+    def get_section_string(self) -> str:
+        """Get a string representation of the object."""
+        output_string = f"section {_escape(self.title)}\n"
+        for task in self.tasks:
+            output_string += f"{task}\n"
+        return output_string
+
+    def __str__(self) -> str:
+        return self.get_section_string()
+
+
+class Gantt(MermaidBase):
+    """A Gantt diagram."""
+
+    _hashed_fields = MermaidBase._hashed_fields + (
+        "title",
+        "sections",
+        "date_format",
+        "axis_format",
+    )
+
+    def __init__(
+        self,
+        title: str,
+        sections: Optional[List[GanttSection]] = None,
+        date_format: str = "YYYY-MM-DD",
+        axis_format: Optional[str] = None,
+        **kwargs: Any,
+    ) -> None:
+        """Initialize a Gantt diagram.
+
+        Args:
+            title: The title of the diagram.
+            sections: A list of sections in the diagram.
+            date_format: The format of the start and end of tasks, e.g. "x" for
+                milliseconds since the epoch.
+            axis_format: The format of the dates on the axis, e.g. "%H:%M".
+            kwargs: Additional keyword arguments to be passed to the MermaidBase class.
+        """
+        super(Gantt, self).__init__(**kwargs)
+        self.title = title
+        self.sections = sections if sections else []
+        self.date_format = date_format
+        self.axis_format = axis_format
+
+    def add_section(
+        self, title: str, tasks: Optional[List[GanttTask]] = None
+    ) -> GanttSection:
+        """Add a section to the diagram.
+
+        Args:
+            title: The title of the section.
+            tasks: A list of tasks in the section.
+
+        Returns:
+            The created section.
+        """
+        section = GanttSection(title, tasks)
+        self.sections.append(section)
+        return section
+
+    @classmethod
+    def from_spans(
+        cls,
+        spans: Union[str, Path, Iterable[Union[str, bytes]]],
+        title: str = "Trace",
+        max_sections: int = 20,
+        max_tasks: int = 50,
+        top_n: int = 0,
+        merge_lanes: bool = False,
+        merge_gap: float = 0.0,
+        **kwargs: Any,
+    ) -> "Gantt":
+        """Build a Gantt diagram from a stream of timing spans.
+
+        Every line of the stream is a JSON object with a "name", a "start" and
+        either an "end" or a "duration", in seconds, and an optional "parent". The
+        spans are aggregated in a single pass in bounded memory: sections and
+        tasks are counted by duration with the Space-Saving algorithm, see
+        `barnacleboy.mermaid.heavy_hitters`, so only a multiple of `max_sections`
+        and `max_tasks` is kept while streaming. Sections and tasks with a large
+        share of the total duration are always kept.
+
+        Spans are grouped in a section per parent. Within a section, the spans of
+        a name are aggregated into one task from the first start to the last end.
+        Only the sections and tasks with the largest total duration are kept; the
+        rest of the tasks of a section are combined into an "other" task.
+
+        Args:
+            spans: The path to an NDJSON file, or an iterable of its lines.
+            title: The title of the diagram.
+            max_sections: The maximum number of sections.
+            max_tasks: The maximum number of tasks per section.
+            top_n: The number of longest individual spans to show in a separate
+                section.
+            merge_lanes: If True, the spans of a section are merged into tasks of
+                busy time regardless of their names.
+            merge_gap: With merge_lanes, the largest idle time in seconds between
+                spans that are merged into one task.
+            kwargs: Additional keyword arguments to be passed to the MermaidBase class.
+
+        Returns:
+            The Gantt diagram, with times in milliseconds since the first span.
+
+        Raises:
+            ValueError: If a line is not a valid span.
+
+        """
+        aggregator = _SpanAggregator(
+            top_n, merge_lanes, merge_gap, max_sections, max_tasks
+        )
+        with instrumentation.span("gantt.aggregate"):
+            if isinstance(spans, (str, Path)):
+                with open(spans, "rb") as file:
+                    aggregator.consume(file)
+            else:
+                aggregator.consume(spans)
+        instrumentation.count("gantt.spans", aggregator.n_spans)
+
+        gantt = cls(title, date_format="x", axis_format="%M:%S.%L", **kwargs)
+        with instrumentation.span("gantt.build"):
+            gantt.sections = aggregator.sections(max_sections, max_tasks)
+        return gantt
+
+    @instrumentation.traced("render.gantt")
+    def __str__(self) -> str:
+        """Get a string representation of the object."""
+        output_string = self.get_init_string()
+        output_string += "gantt\n"
+        output_string += f"title {self.title}\n"
+        output_string += f"dateFormat {self.date_format}\n"
+        if self.axis_format:
+            output_string += f"axisFormat {self.axis_format}\n"
+        for section in self.sections:
+            output_string += str(section)
+        instrumentation.count(
+            "elements_rendered", sum(len(section.tasks) for section in self.sections)
+        )
+        return output_string
+
+
+@dataclasses.dataclass
+class _Aggregate:
+    """The spans of one task."""
+
+    start: float
+    end: float
+    count: int = 0
+    total: float = 0.0
+
+    def add(self, start: float, end: float) -> None:
+        self.start = min(self.start, start)
+        self.end = max(self.end, end)
+        self.count += 1
+        self.total += end - start
+
+
+class _Lane:
+    """Busy intervals of a section, merged and coarsened to a bounded number."""
+
+    max_intervals = 256
+
+    def __init__(self, gap: float) -> None:
+        self.gap = gap
+        self.starts: List[float] = []
+        self.intervals: List[_Aggregate] = []
+        self.total = 0.0
+
+    def add(self, start: float, end: float) -> None:
+        self.total += end - start
+        index = bisect.bisect_right(self.starts, start)
+        previous = self.intervals[index - 1] if index else None
+        if previous is not None and start <= previous.end + self.gap:
+            previous.add(start, end)
+            self._merge_following(index - 1)
+            return
+        self.starts.insert(index, start)
+        self.intervals.insert(index, _Aggregate(start, end))
+        self.intervals[index].add(start, end)
+        self._merge_following(index)
+        if len(self.intervals) > self.max_intervals:
+            self._coarsen()
+
+    def _merge_following(self, index: int) -> None:
+        interval = self.intervals[index]
+        while (
+            index + 1 < len(self.intervals)
+            and self.intervals[index + 1].start <= interval.end + self.gap
+        ):
+            following = self.intervals.pop(index + 1)
+            self.starts.pop(index + 1)
+            interval.end = max(interval.end, following.end)
+            interval.count += following.count
+            interval.total += following.total
+
+    def _coarsen(self) -> None:
+        """Double the merge gap until the number of intervals halves."""
+        gaps = sorted(
+            later.start - earlier.end
+            for earlier, later in zip(self.intervals, self.intervals[1:])
+        )
+        self.gap = max(self.gap * 2, gaps[len(gaps) // 2])
+        intervals, self.intervals, self.starts = self.intervals, [], []
+        for interval in intervals:
+            if self.intervals and interval.start <= self.intervals[-1].end + self.gap:
+                last = self.intervals[-1]
+                last.end = max(last.end, interval.end)
+                last.count += interval.count
+                last.total += interval.total
+            else:
+                self.intervals.append(interval)
+                self.starts.append(interval.start)
+
+
+class _SpanAggregator:
+    """Aggregates spans in a single streaming pass, in bounded memory.
+
+    Sections and the tasks of every section are counted by duration with the
+    Space-Saving algorithm, so at most `capacity(max_sections)` sections with
+    `capacity(max_tasks)` tasks each are kept. The data of an evicted section is
+    dropped, and an evicted task is folded into an "other" task of its section.
+    Sections and tasks with a large share of the total duration are always kept,
+    but their aggregates miss the spans from before they were last admitted.
+    """
+
+    def __init__(
+        self,
+        top_n: int,
+        merge_lanes: bool,
+        merge_gap: float,
+        max_sections: int = 20,
+        max_tasks: int = 50,
+    ) -> None:
+        self.top_n = top_n
+        self.merge_lanes = merge_lanes
+        self.merge_gap = merge_gap
+        self.tasks: Dict[str, Dict[str, _Aggregate]] = {}
+        self.lanes: Dict[str, _Lane] = {}
+        self.folded: Dict[str, _Aggregate] = {}
+        self.section_counts: HeavyHitters[str] = HeavyHitters(
+            capacity(max_sections), self._drop_section
+        )
+        self.task_counts: Dict[str, HeavyHitters[str]] = {}
+        self.task_capacity = capacity(max_tasks)
+        self.longest: List[Tuple[float, int, str, float, float]] = []
+        self.origin = float("inf")
+        self.n_spans = 0
+
+    def _drop_section(self, section: str) -> None:
+        self.tasks.pop(section, None)
+        self.lanes.pop(section, None)
+        self.folded.pop(section, None)
+        self.task_counts.pop(section, None)
+
+    def _fold_task(self, section: str, name: str) -> None:
+        aggregate = self.tasks[section].pop(name)
+        folded = self.folded.get(section)
+        if folded is None:
+            self.folded[section] = aggregate
+            return
+        folded.start = min(folded.start, aggregate.start)
+        folded.end = max(folded.end, aggregate.end)
+        folded.count += aggregate.count
+        folded.total += aggregate.total
+
+    def consume(self, lines: Iterable[Union[str, bytes]]) -> None:
+        for line_number, line in enumerate(lines, 1):
+            if not line.strip():
+                continue
+            try:
+                span = json.loads(line)
+                name = str(span["name"])
+                start = float(span["start"])
+                end = (
+                    float(span["end"])
+                    if "end" in span
+                    else start + float(span["duration"])
+                )
+            except (ValueError, KeyError, TypeError) as error:
+                raise ValueError(f"Invalid span on line {line_number}: {error}")
+            parent = span.get("parent")
+            self.add(ROOT_SECTION if parent is None else str(parent), name, start, end)
+
+    def add(self, section: str, name: str, start: float, end: float) -> None:
+        self.n_spans += 1
+        self.origin = min(self.origin, start)
+        self.section_counts.add(section, end - start)
+        if self.merge_lanes:
+            if section not in self.lanes:
+                self.lanes[section] = _Lane(self.merge_gap)
+            self.lanes[section].add(start, end)
+        else:
+            if section not in self.tasks:
+                self.tasks[section] = {}
+                self.task_counts[section] = HeavyHitters(
+                    self.task_capacity, functools.partial(self._fold_task, section)
+                )
+            self.task_counts[section].add(name, end - start)
+            tasks = self.tasks[section]
+            if name not in tasks:
+                tasks[name] = _Aggregate(start, end)
+            tasks[name].add(start, end)
+        if self.top_n:
+            item = (end - start, -self.n_spans, name, start, end)
+            if len(self.longest) < self.top_n:
+                heapq.heappush(self.longest, item)
+            elif item > self.longest[0]:
+                heapq.heapreplace(self.longest, item)
+
+    def _ms(self, time: float) -> int:
+        return round((time - self.origin) * 1000)
+
+    def _task(self, name: str, aggregate: _Aggregate) -> GanttTask:
+        label = f"{name} ({aggregate.count}x, {aggregate.total:.3g}s)"
+        return GanttTask(label, self._ms(aggregate.start), self._ms(aggregate.end))
+
+    def _section_tasks(self, section: str) -> Iterator[Tuple[str, _Aggregate]]:
+        if self.merge_lanes:
+            for interval in self.lanes[section].intervals:
+                yield "busy", interval
+        else:
+            yield from self.tasks[section].items()
+
+    def _section_total(self, section: str) -> float:
+        if self.merge_lanes:
+            return self.lanes[section].total
+        folded = self.folded.get(section)
+        return sum(task.total for task in self.tasks[section].values()) + (
+            folded.total if folded else 0.0
+        )
+
+    def sections(self, max_sections: int, max_tasks: int) -> List[GanttSection]:
+        names = list(self.lanes if self.merge_lanes else self.tasks)
+        names = heapq.nlargest(max_sections, names, key=self._section_total)
+
+        sections = []
+        for name in names:
+            tasks = list(self._section_tasks(name))
+            folded = self.folded.get(name)
+            if len(tasks) > max_tasks or folded is not None:
+                tasks.sort(key=lambda task: -task[1].total)
+                kept, rest = tasks[: max_tasks - 1], tasks[max_tasks - 1 :]
+                rest_aggregates = [aggregate for _, aggregate in rest]
+                if folded is not None:
+                    rest_aggregates.append(folded)
+                other = _Aggregate(rest_aggregates[0].start, rest_aggregates[0].end)
+                for aggregate in rest_aggregates:
+                    other.start = min(other.start, aggregate.start)
+                    other.end = max(other.end, aggregate.end)
+                    other.count += aggregate.count
+                    other.total += aggregate.total
+                # The number of distinct folded tasks is not kept.
+                label = "other tasks" if folded else f"other {len(rest)} tasks"
+                tasks = kept + [(label, other)]
+            tasks.sort(key=lambda task: task[1].start)
+            section = GanttSection(name, [self._task(*task) for task in tasks])
+            sections.append((min(task[1].start for task in tasks), section))
+        sections.sort(key=lambda item: item[0])
+
+        result = [section for _, section in sections]
+        if self.longest:
+            longest = GanttSection(LONGEST_SECTION)
+            for duration, _, name, start, end in sorted(self.longest, reverse=True):
+                longest.add_task(
+                    f"{name} ({duration:.3g}s)",
+                    self._ms(start),
+                    self._ms(end),
+                    ["crit"],
+                )
+            result.append(longest)
+        return result
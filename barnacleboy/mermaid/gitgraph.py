@@ -1,21 +1,24 @@
 import dataclasses
-from typing import Optional, List, Union, Any
+from typing import Optional, List, Set, Union, Any, ClassVar, Tuple
 
+from barnacleboy import instrumentation
 from barnacleboy.mermaid.base import MermaidBase
-from barnacleboy.mermaid.utils import init_string
+from barnacleboy.mermaid.hashing import Hashed
 
 VALID_COMMIT_TYPES = {"NORMAL", "REVERSE", "HIGHLIGHT"}
 VALID_THEMES = {"base", "forest", "dark", "default", "neutral"}
 
 
 @dataclasses.dataclass
-class MergeCommit:
+class MergeCommit(Hashed):
     """Superclass for a merge or commit in a git graph."""
 
     id: Optional[str] = None
     type: Optional[str] = None
     tag: Optional[str] = None
 
+    _hashed_fields: ClassVar[Tuple[str, ...]] = ("id", "type", "tag")
+
     def __str__(self) -> str:
         """Get a string representation of the object."""
         output_string = type(self).__name__.lower()
@@ -29,6 +32,8 @@ class MergeCommit:
 class Merge(MergeCommit):
     """A merge commit in a git graph."""
 
+    _hashed_fields = ("id", "type", "tag", "branch_name")
+
     def __init__(
         self,
         branch_name: str,
@@ -60,7 +65,7 @@ class Commit(MergeCommit):
 
 
 @dataclasses.dataclass
-class Branch:
+class Branch(Hashed):
     """Dataclass for a branch in the git graph.
 
     Args:
@@ -69,14 +74,53 @@ class Branch:
 
     name: str
 
+    _hashed_fields = ("name",)
+
     def __str__(self) -> str:
         """Get a string representation of the object."""
         return f"branch {self.name}"
 
 
+class _Names:
+    """The names of the items of a list, following appends to the list.
+
+    Replacing or shrinking the list rebuilds the names.
+    """
+
+    def __init__(self, attribute: str) -> None:
+        self.attribute = attribute
+        self.names: Set[str] = set()
+        self._items: Optional[List[Any]] = None
+        self._indexed = 0
+
+    def of(self, items: List[Any]) -> Set[str]:
+        """Get the names of the items, indexing those appended since the last call."""
+        if items is not self._items or len(items) < self._indexed:
+            self.names.clear()
+            self._items = items
+            self._indexed = 0
+        for item in items[self._indexed :]:
+            name = getattr(item, self.attribute)
+            if name:
+                self.names.add(name)
+        self._indexed = len(items)
+        return self.names
+
+
 class GitGraph(MermaidBase):
     """A git graph model."""
 
+    _hashed_fields = MermaidBase._hashed_fields + (
+        "log",
+        "commits",
+        "branches",
+        "show_branches",
+        "show_commit_label",
+        "rotate_commit_label",
+        "main_branch_name",
+        "main_branch_order",
+    )
+
     def __init__(
         self,
         *,
@@ -101,12 +145,13 @@ class GitGraph(MermaidBase):
         self.log: List[Union[MergeCommit, Branch, str]] = []
         self.commits: List[Commit] = []
         self.branches = [Branch("main")]
+        self._commit_ids = _Names("id")
+        self._branch_names = _Names("name")
         self.show_branches = show_branches
         self.show_commit_label = show_commit_label
         self.rotate_commit_label = rotate_commit_label
         self.main_branch_name = main_branch_name
         self.main_branch_order = main_branch_order
-        self.config = {}  # type: ignore
 
     def commit(
         self,
@@ -125,9 +170,8 @@ class GitGraph(MermaidBase):
             raise ValueError(f"Invalid commit type: {commit_type}")
 
         if id:
-            for existing_commit in self.commits:
-                if existing_commit.id == id:
-                    raise ValueError(f"Commit {id} already exists")
+            if id in self._commit_ids.of(self.commits):
+                raise ValueError(f"Commit {id} already exists")
 
         commit = Commit(id, commit_type, tag)
         self.commits.append(commit)
@@ -142,9 +186,8 @@ class GitGraph(MermaidBase):
         Raises:
             ValueError: If the branch already exists.
         """
-        for existing_branch in self.branches:
-            if existing_branch.name == branch_name:
-                raise ValueError(f"Branch {branch_name} already exists")
+        if branch_name in self._branch_names.of(self.branches):
+            raise ValueError(f"Branch {branch_name} already exists")
 
         branch = Branch(branch_name)
         self.branches.append(branch)
@@ -159,11 +202,9 @@ class GitGraph(MermaidBase):
         Raises:
             ValueError: If the branch does not exist.
         """
-        for existing_branch in self.branches:
-            if existing_branch.name == branch_name:
-                self.log.append(f"checkout {branch_name}")
-                return
-        raise ValueError(f"Branch {branch_name} does not exist")
+        if branch_name not in self._branch_names.of(self.branches):
+            raise ValueError(f"Branch {branch_name} does not exist")
+        self.log.append(f"checkout {branch_name}")
 
     def merge(
         self,
@@ -186,12 +227,9 @@ class GitGraph(MermaidBase):
         if commit_type and commit_type not in VALID_COMMIT_TYPES:
             raise ValueError(f"Invalid commit type: {commit_type}")
 
-        merge = Merge(branch_name, id, commit_type, tag)
-        for branch in self.branches:
-            if branch.name == branch_name:
-                self.log.append(str(merge))
-                return
-        raise ValueError(f"Branch {branch_name} does not exist")
+        if branch_name not in self._branch_names.of(self.branches):
+            raise ValueError(f"Branch {branch_name} does not exist")
+        self.log.append(str(Merge(branch_name, id, commit_type, tag)))
 
     def cherry_pick(self, commit_id: str) -> None:
         """Cherry-pick a commit.
@@ -202,17 +240,16 @@ class GitGraph(MermaidBase):
         Raises:
             ValueError: If the commit does not exist.
         """
+        if commit_id not in self._commit_ids.of(self.commits):
+            raise ValueError(f"Commit {commit_id} does not exist")
+        self.log.append(f'cherry-pick id:"{commit_id}"')
 
-        for commit in self.commits:
-            if commit.id == commit_id:
-                self.log.append(f'cherry-pick id:"{commit_id}"')
-                return
-        raise ValueError(f"Commit {commit_id} does not exist")
-
+    @instrumentation.traced("render.gitgraph")
     def __str__(self) -> str:
         """Get a string representation of the object."""
-        output_string = init_string(self.base_config, self.config)
+        output_string = self.get_init_string()
         output_string += "gitGraph\n"
         for line in self.log:
             output_string += f"{line}\n"
+        instrumentation.count("elements_rendered", len(self.log))
         return output_string
@@ -0,0 +1,111 @@
+"""Structural fingerprints of diagrams.
+
+Every diagram element names the attributes that determine how it renders in
+`_hashed_fields`. Its fingerprint is a digest of those attributes, to which
+elements and lists of elements contribute their own fingerprints, Merkle style.
+
+Fingerprints are computed when they are asked for, so building and editing
+diagrams costs nothing extra, and lists and dictionaries can be changed in place,
+also through the lists that were passed to a diagram. Every element keeps the
+values it was last hashed with and only hashes them again when they changed, so
+fingerprinting a diagram after an edit compares the attributes of every element,
+but only hashes the elements on the path from the edit to the diagram. Elements
+that are reachable in several ways, such as the nodes of relationships, are
+only looked at once per fingerprint.
+"""
+
+import hashlib
+from typing import Any, ClassVar, Dict, List, Optional, Tuple, Union
+
+DIGEST_SIZE = 16
+
+# Fingerprints of the elements looked at so far, by ID.
+Memo = Dict[int, bytes]
+
+
+def digest(*parts: Union[bytes, memoryview]) -> bytes:
+    """Hash a sequence of byte strings, each prefixed with its length."""
+    hasher = hashlib.blake2b(digest_size=DIGEST_SIZE)
+    for part in parts:
+        hasher.update(len(part).to_bytes(8, "little"))
+        hasher.update(part)
+    return hasher.digest()
+
+
+def fingerprint_of(value: Any, memo: Optional[Memo] = None) -> bytes:
+    """Get the fingerprint of a value.
+
+    Args:
+        value: A hashed element, a list, or any value with a stable repr.
+        memo: The fingerprints of elements that were already looked at.
+
+    Returns:
+        The digest of the value.
+
+    """
+    if memo is None:
+        memo = {}
+    if isinstance(value, Hashed):
+        return value._fingerprint(memo)
+    if isinstance(value, list):
+        # Fingerprints have a fixed size, so they need no length prefix.
+        return digest(
+            len(value).to_bytes(8, "little"),
+            b"".join([fingerprint_of(item, memo) for item in value]),
+        )
+    return digest(repr(value).encode("utf-8"))
+
+
+class Hashed:
+    """An object that fingerprints the attributes listed in `_hashed_fields`."""
+
+    _hashed_fields: ClassVar[Tuple[str, ...]] = ()
+
+    # The values the object was last hashed with, and the digest of them.
+    _fingerprint_key: Optional[Tuple[Any, ...]] = None
+    _fingerprint_cache: bytes = b""
+
+    def __getstate__(self) -> Dict[str, Any]:
+        state = self.__dict__.copy()
+        state.pop("_fingerprint_key", None)
+        state.pop("_fingerprint_cache", None)
+        return state
+
+    def _fingerprint(self, memo: Optional[Memo] = None) -> bytes:
+        if memo is None:
+            memo = {}
+        result = memo.get(id(self))
+        if result is not None:
+            return result
+        # Elements and lists contribute their fixed size fingerprints, and
+        # dictionaries their repr, since they may have changed in place.
+        values: List[Any] = []
+        for name in self._hashed_fields:
+            value = getattr(self, name)
+            if isinstance(value, (Hashed, list)):
+                value = fingerprint_of(value, memo)
+            elif isinstance(value, dict):
+                value = repr(value)
+            values.append(value)
+        key = tuple(values)
+        if key != self._fingerprint_key:
+            content = repr([type(self).__qualname__, *values]).encode("utf-8")
+            # Bypass instance attributes of subclasses, this is called a lot.
+            self.__dict__["_fingerprint_cache"] = digest(content)
+            self.__dict__["_fingerprint_key"] = key
+        result = memo[id(self)] = self._fingerprint_cache
+        return result
+
+    def fingerprint(self) -> str:
+        """Get a structural fingerprint, equal for objects that render the same.
+
+        Returns:
+            A hex digest.
+
+        """
+        return self._fingerprint().hex()
+
+
+def structural_hash(value: Hashed) -> int:
+    """Get a Python hash from the fingerprint of a value."""
+    return int.from_bytes(value._fingerprint()[:8], "little", signed=True)
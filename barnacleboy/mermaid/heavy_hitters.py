@@ -0,0 +1,135 @@
+"""Approximate counts of the most frequent items of an unbounded stream.
+
+Items are counted with the Space-Saving algorithm, which keeps at most a fixed
+number of counters. An item that is not counted yet takes over the counter of
+the item with the lowest count, and inherits that count as its error. Every item
+with more than `total / capacity` of the total weight is guaranteed to be
+counted, and counts overestimate the true count by at most their error.
+
+Evictions find the lowest count with a heap whose entries are only brought up to
+date when they reach the top, so adding to an item that is already counted is a
+dictionary update. Weights may be fractional, e.g. durations.
+"""
+
+import heapq
+import itertools
+from collections import Counter
+from typing import (
+    Callable,
+    Dict,
+    Generic,
+    Hashable,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+)
+
+Key = TypeVar("Key", bound=Hashable)
+
+
+class HeavyHitters(Generic[Key]):
+    """Approximate counts of the most frequent items of a stream.
+
+    Args:
+        capacity: The maximum number of items that are counted.
+        on_evict: A function that is called with every item that is no longer
+            counted, e.g. to drop data kept about it.
+
+    """
+
+    def __init__(
+        self, capacity: int, on_evict: Optional[Callable[[Key], None]] = None
+    ) -> None:
+        if capacity < 1:
+            raise ValueError("The capacity must be at least 1.")
+        self.capacity = capacity
+        self.on_evict = on_evict
+        self.total: float = 0
+        self.counts: Dict[Key, float] = {}
+        self.errors: Dict[Key, float] = {}
+        # Entries are (count, sequence, item); counts may be lower than the
+        # current count, the sequence keeps items from being compared.
+        self._heap: List[Tuple[float, int, Key]] = []
+        self._sequence = itertools.count()
+
+    def add(self, item: Key, weight: float = 1) -> None:
+        """Count an item.
+
+        Args:
+            item: The item.
+            weight: The number of times the item occurred.
+
+        """
+        self.total += weight
+        counts = self.counts
+        if item in counts:
+            counts[item] += weight
+            return
+        if len(counts) < self.capacity:
+            counts[item] = weight
+            self.errors[item] = 0
+            heapq.heappush(self._heap, (weight, next(self._sequence), item))
+            return
+        minimum = self._evict()
+        counts[item] = minimum + weight
+        self.errors[item] = minimum
+        heapq.heappush(self._heap, (minimum + weight, next(self._sequence), item))
+
+    def _evict(self) -> float:
+        """Stop counting the item with the lowest count.
+
+        Returns:
+            The count of the evicted item.
+
+        """
+        heap, counts = self._heap, self.counts
+        while True:
+            count, _, item = heap[0]
+            current = counts[item]
+            if current == count:
+                heapq.heappop(heap)
+                del counts[item]
+                del self.errors[item]
+                if self.on_evict is not None:
+                    self.on_evict(item)
+                return count
+            heapq.heapreplace(heap, (current, next(self._sequence), item))
+
+    def update(self, items: Iterable[Key]) -> None:
+        """Count a batch of items.
+
+        Args:
+            items: The items, an item occurring once for every time it occurred.
+
+        """
+        self.merge(Counter(items))
+
+    def merge(self, weights: Dict[Key, int]) -> None:
+        """Count a batch of items that was already tallied.
+
+        Every distinct item is added once with its weight, which keeps the
+        guarantees of the algorithm.
+
+        Args:
+            weights: The number of times every item occurred.
+
+        """
+        add = self.add
+        for item, weight in weights.items():
+            add(item, weight)
+
+    def top(self, k: int) -> List[Tuple[Key, float, float]]:
+        """Get the items with the highest counts.
+
+        Args:
+            k: The maximum number of items.
+
+        Returns:
+            The items with their count and error, highest count first. The true
+            count of an item is between its count minus its error and its count.
+
+        """
+        items = heapq.nlargest(k, self.counts.items(), key=lambda item: item[1])
+        return [(item, count, self.errors[item]) for item, count in items]
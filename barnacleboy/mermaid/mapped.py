@@ -0,0 +1,445 @@
+"""Out-of-core flowcharts backed by memory-mapped node and edge files.
+
+Graphs that are too large to hold as `Node` and `Relationship` objects can be
+written to two binary files and rendered straight from memory maps:
+
+- The nodes file holds a header (magic "BBND", version, node count and the
+  position of the offsets), the UTF-8 encoded names one after another, and then
+  count + 1 little-endian uint64 offsets of the names.
+- The edges file holds a header (magic "BBED", version, edge count) followed by
+  little-endian uint32 (source, target) pairs of node indices.
+
+Filters select nodes with masks over these arrays and return new views of the
+same files; the rendered text is streamed line by line, with names quoted so that
+brackets in them are text. The maps stay open until the flowchart is closed, e.g.
+by using it as a context manager.
+"""
+
+import mmap
+import re
+import struct
+import sys
+from array import array
+from collections import deque
+from pathlib import Path
+from typing import (
+    IO,
+    Any,
+    Iterable,
+    Iterator,
+    List,
+    Literal,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+from barnacleboy import instrumentation
+from barnacleboy.mermaid.base import MermaidBase
+from barnacleboy.mermaid.flowchart import Orientation, quote_label
+from barnacleboy.mermaid.hashing import Memo, digest
+
+NODES_MAGIC = b"BBND"
+EDGES_MAGIC = b"BBED"
+VERSION = 1
+NODES_HEADER = struct.Struct("<4sIQQ")
+EDGES_HEADER = struct.Struct("<4sIQ")
+BATCH_SIZE = 10_000
+
+
+def write_mapped(
+    nodes_path: Union[str, Path],
+    edges_path: Union[str, Path],
+    names: Iterable[str],
+    edges: Iterable[Tuple[int, int]],
+) -> Tuple[int, int]:
+    """Write the node and edge files of a mapped flowchart.
+
+    Both iterables are consumed once and nothing but the name offsets is kept in
+    memory, so they can be generators over data that does not fit in memory.
+
+    Args:
+        nodes_path: The path to write the node names to.
+        edges_path: The path to write the edges to.
+        names: The name of every node; nodes are referred to by position.
+        edges: (source, target) pairs of node positions.
+
+    Returns:
+        The number of nodes and edges written.
+
+    Raises:
+        ValueError: If an edge refers to a node that does not exist.
+
+    """
+    offsets = array("Q", [0])
+    with open(nodes_path, "wb") as file:
+        file.write(NODES_HEADER.pack(NODES_MAGIC, VERSION, 0, 0))
+        position = 0
+        for name in names:
+            data = name.encode("utf-8")
+            file.write(data)
+            position += len(data)
+            offsets.append(position)
+        if sys.byteorder != "little":
+            offsets.byteswap()
+        offsets_position = NODES_HEADER.size + position
+        offsets.tofile(file)
+        n_nodes = len(offsets) - 1
+        file.seek(0)
+        file.write(NODES_HEADER.pack(NODES_MAGIC, VERSION, n_nodes, offsets_position))
+
+    n_edges = 0
+    with open(edges_path, "wb") as file:
+        file.write(EDGES_HEADER.pack(EDGES_MAGIC, VERSION, 0))
+        batch = array("I")
+        for source, target in edges:
+            if not (0 <= source < n_nodes and 0 <= target < n_nodes):
+                raise ValueError(f"Edge ({source}, {target}) refers to a missing node.")
+            batch.append(source)
+            batch.append(target)
+            if len(batch) >= 2 * BATCH_SIZE:
+                n_edges += _write_batch(file, batch)
+                batch = array("I")
+        n_edges += _write_batch(file, batch)
+        file.seek(0)
+        file.write(EDGES_HEADER.pack(EDGES_MAGIC, VERSION, n_edges))
+    return n_nodes, n_edges
+
+
+def _write_batch(file: IO[bytes], batch: array) -> int:
+    if sys.byteorder != "little":
+        batch.byteswap()
+    batch.tofile(file)
+    return len(batch) // 2
+
+
+def _cast(view: memoryview, typecode: Literal["I", "Q"]) -> Sequence[int]:
+    """Interpret little-endian bytes as integers, without copying if possible."""
+    if sys.byteorder == "little":
+        return view.cast(typecode)
+    values = array(typecode, view)
+    values.byteswap()
+    return values
+
+
+class _MappedFile:
+    """A read-only memory map of a file."""
+
+    def __init__(self, path: Union[str, Path]) -> None:
+        with open(path, "rb") as file:
+            self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.map)
+        self._digest: Optional[bytes] = None
+
+    def digest(self) -> bytes:
+        """Get a digest of the contents of the file, computed once."""
+        if self._digest is None:
+            self._digest = digest(self.view)
+        return self._digest
+
+    def close(self) -> None:
+        """Unmap the file, after every view of it was released."""
+        self.view.release()
+        self.map.close()
+
+
+class MappedFlowchart(MermaidBase):
+    """A flowchart that reads its nodes and edges from memory-mapped files.
+
+    No `Node` or `Relationship` objects are created. Filters return new mapped
+    flowcharts that share the files and select nodes with a mask; an edge is
+    kept when both of its nodes are. Closing a flowchart closes the files of all
+    those views.
+    """
+
+    def __init__(
+        self,
+        nodes_path: Union[str, Path],
+        edges_path: Union[str, Path],
+        orientation: str = Orientation.TB.value,
+        title: Optional[str] = None,
+        output_arrow: Optional[str] = ">",
+        **kwargs: Any,
+    ) -> None:
+        """Open a mapped flowchart.
+
+        Args:
+            nodes_path: The path to the nodes file.
+            edges_path: The path to the edges file.
+            orientation: The orientation of the flowchart, defaults to "TB".
+            title: The title of the flowchart.
+            output_arrow: The arrow of every edge, None for lines.
+            **kwargs: Keyword arguments to pass to the MermaidBase constructor.
+
+        Raises:
+            ValueError: If a file is not in the mapped flowchart format.
+
+        """
+        super(MappedFlowchart, self).__init__(**kwargs)
+        self.orientation = orientation
+        self.title = title
+        self.output_arrow = output_arrow
+        self.mask: Optional[bytearray] = None
+
+        nodes = _MappedFile(nodes_path)
+        magic, version, n_nodes, offsets_position = NODES_HEADER.unpack_from(nodes.view)
+        if magic != NODES_MAGIC or version != VERSION:
+            nodes.close()
+            raise ValueError(f"{nodes_path} is not a mapped flowchart nodes file.")
+        edges = _MappedFile(edges_path)
+        magic, version, n_edges = EDGES_HEADER.unpack_from(edges.view)
+        if magic != EDGES_MAGIC or version != VERSION:
+            nodes.close()
+            edges.close()
+            raise ValueError(f"{edges_path} is not a mapped flowchart edges file.")
+
+        self._files = (nodes, edges)
+        self.n_nodes = n_nodes
+        self.n_edges = n_edges
+        self._names = nodes.view[NODES_HEADER.size : offsets_position]
+        self._offsets = _cast(
+            nodes.view[offsets_position : offsets_position + 8 * (n_nodes + 1)], "Q"
+        )
+        pairs = _cast(
+            edges.view[EDGES_HEADER.size : EDGES_HEADER.size + 8 * n_edges], "I"
+        )
+        self._sources = pairs[0::2]
+        self._targets = pairs[1::2]
+
+    def close(self) -> None:
+        """Close the memory maps of the files.
+
+        The flowchart and the views that share its files cannot be read after
+        this. Closing twice is fine.
+        """
+        for values in (self._names, self._offsets, self._sources, self._targets):
+            if isinstance(values, memoryview):
+                values.release()
+        for file in self._files:
+            file.close()
+
+    def __enter__(self) -> "MappedFlowchart":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def _derive(self, mask: bytearray) -> "MappedFlowchart":
+        """Create a view of the same files with another node mask."""
+        view = object.__new__(MappedFlowchart)
+        view.__dict__.update(self.__dict__)
+        view.mask = mask
+        return view
+
+    def _fingerprint(self, memo: Optional[Memo] = None) -> bytes:
+        """Hash the contents of the files, the mask and the settings.
+
+        The files are hashed once per mapping, but the mask is hashed on every
+        call, so this takes time linear in the number of nodes.
+        """
+        nodes, edges = self._files
+        settings = (
+            self.orientation,
+            self.title,
+            self.output_arrow,
+            self.compact,
+            self._theme,
+            self.config,
+        )
+        return digest(
+            b"MappedFlowchart",
+            nodes.digest(),
+            edges.digest(),
+            bytes(self.mask if self.mask is not None else b""),
+            repr(settings).encode("utf-8"),
+        )
+
+    def name(self, index: int) -> str:
+        """Get the name of a node.
+
+        Args:
+            index: The position of the node.
+
+        Returns:
+            The name of the node.
+
+        """
+        start, end = self._offsets[index], self._offsets[index + 1]
+        return str(self._names[start:end], "utf-8")
+
+    def nodes(self) -> Iterator[int]:
+        """Iterate over the positions of the selected nodes."""
+        if self.mask is None:
+            return iter(range(self.n_nodes))
+        return (index for index, keep in enumerate(self.mask) if keep)
+
+    def edges(self) -> Iterator[Tuple[int, int]]:
+        """Iterate over the edges between selected nodes."""
+        if self._files[1].map.closed:
+            # Iterating over released views raises SystemError instead.
+            raise ValueError("The mapped flowchart is closed.")
+        pairs = zip(self._sources, self._targets)
+        if self.mask is None:
+            return pairs
+        mask = self.mask
+        return ((s, t) for s, t in pairs if mask[s] and mask[t])
+
+    def degrees(self) -> array:
+        """Get the number of selected edges of every node."""
+        degrees = array("I", bytes(4 * self.n_nodes))
+        for source, target in self.edges():
+            degrees[source] += 1
+            degrees[target] += 1
+        return degrees
+
+    def _mask(self) -> bytearray:
+        if self.mask is None:
+            return bytearray(b"\x01" * self.n_nodes)
+        return bytearray(self.mask)
+
+    def filter(
+        self,
+        pattern: Optional[str] = None,
+        min_degree: int = 0,
+        max_degree: Optional[int] = None,
+    ) -> "MappedFlowchart":
+        """Select the nodes that match a pattern and have a degree in a range.
+
+        Args:
+            pattern: A regular expression that names must contain a match for.
+            min_degree: The minimum number of selected edges of a node.
+            max_degree: The maximum number of selected edges of a node.
+
+        Returns:
+            A view with the selected nodes.
+
+        """
+        with instrumentation.span("mapped.filter"):
+            mask = self._mask()
+            if pattern is not None:
+                search = re.compile(pattern).search
+                for index in self.nodes():
+                    if not search(self.name(index)):
+                        mask[index] = 0
+            if min_degree > 0 or max_degree is not None:
+                for index, degree in enumerate(self.degrees()):
+                    if degree < min_degree or (
+                        max_degree is not None and degree > max_degree
+                    ):
+                        mask[index] = 0
+        return self._derive(mask)
+
+    def top_degree(self, n: int) -> "MappedFlowchart":
+        """Select the n nodes with the most selected edges.
+
+        Args:
+            n: The number of nodes to keep.
+
+        Returns:
+            A view with the selected nodes.
+
+        """
+        degrees = self.degrees()
+        ranked = sorted(self.nodes(), key=degrees.__getitem__, reverse=True)
+        mask = bytearray(self.n_nodes)
+        for index in ranked[:n]:
+            mask[index] = 1
+        return self._derive(mask)
+
+    def neighborhood(
+        self, roots: Iterable[Union[int, str]], depth: int = 1
+    ) -> "MappedFlowchart":
+        """Select the nodes within a number of edges of some root nodes.
+
+        Args:
+            roots: The positions or names of the root nodes.
+            depth: The maximum number of edges, in either direction, to a root.
+
+        Returns:
+            A view with the selected nodes.
+
+        """
+        with instrumentation.span("mapped.neighborhood"):
+            root_list = list(roots)
+            names = {root for root in root_list if isinstance(root, str)}
+            starts = [
+                root
+                for root in root_list
+                if isinstance(root, int) and (self.mask is None or self.mask[root])
+            ]
+            if names:
+                starts += [i for i in self.nodes() if self.name(i) in names]
+
+            # Compressed sparse rows of the undirected selected graph.
+            row_starts = array("Q", bytes(8 * (self.n_nodes + 1)))
+            for source, target in self.edges():
+                row_starts[source + 1] += 1
+                row_starts[target + 1] += 1
+            for index in range(self.n_nodes):
+                row_starts[index + 1] += row_starts[index]
+            fill = array("Q", row_starts)
+            neighbors = array("I", bytes(4 * row_starts[-1]))
+            for source, target in self.edges():
+                neighbors[fill[source]] = target
+                fill[source] += 1
+                neighbors[fill[target]] = source
+                fill[target] += 1
+
+            mask = bytearray(self.n_nodes)
+            queue = deque((start, 0) for start in starts)
+            for start in starts:
+                mask[start] = 1
+            while queue:
+                node, distance = queue.popleft()
+                if distance == depth:
+                    continue
+                for i in range(row_starts[node], row_starts[node + 1]):
+                    neighbor = neighbors[i]
+                    if not mask[neighbor]:
+                        mask[neighbor] = 1
+                        queue.append((neighbor, distance + 1))
+        return self._derive(mask)
+
+    def iter_lines(self) -> Iterator[str]:
+        """Stream the lines of the flowchart, each ending with a newline."""
+        yield self.get_init_string()
+        if self.title:
+            yield f"---\ntitle: {self.title}\n---\n"
+        yield f"graph {self.orientation}\n"
+        n_rendered = 0
+        indent = "" if self.compact else "    "
+        for index in self.nodes():
+            n_rendered += 1
+            yield f"{indent}N{index}({quote_label(self.name(index))})\n"
+        if not self.compact:
+            yield "\n"
+        link = f"---{self.output_arrow or ''}"
+        for source, target in self.edges():
+            n_rendered += 1
+            yield f"{indent}N{source}{link}N{target}\n"
+        instrumentation.count("elements_rendered", n_rendered)
+
+    def write(self, file: Union[str, Path, IO[str]]) -> None:
+        """Stream the flowchart to a file.
+
+        Args:
+            file: The path to write to, or a text file object.
+
+        """
+        if isinstance(file, (str, Path)):
+            with open(file, "w", encoding="utf-8") as output:
+                return self.write(output)
+        with instrumentation.span("mapped.write"):
+            batch: List[str] = []
+            for line in self.iter_lines():
+                batch.append(line)
+                if len(batch) >= BATCH_SIZE:
+                    file.write("".join(batch))
+                    batch.clear()
+            file.write("".join(batch))
+        return None
+
+    @instrumentation.traced("render.mapped_flowchart")
+    def __str__(self) -> str:
+        return "".join(self.iter_lines())
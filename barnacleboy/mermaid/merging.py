@@ -0,0 +1,163 @@
+"""Merge flowcharts that were built separately, e.g. in worker processes.
+
+Nodes of different flowcharts are distinct objects, so they are unified by a key
+such as their name. The merged flowchart is made of copies of the elements of
+its inputs with new internal IDs, so the inputs are left untouched.
+"""
+
+from typing import Callable, Dict, Hashable, Optional, Sequence, Tuple, Union
+
+from barnacleboy import instrumentation
+from barnacleboy.mermaid.flowchart import Flowchart, Node, Relationship, Subgraph
+
+Entity = Union[Node, Subgraph]
+
+
+def node_name(node: Node) -> Hashable:
+    """Get the default merge key of a node, its name."""
+    return node.name
+
+
+def merge(
+    charts: Sequence[Flowchart], key: Optional[Callable[[Node], Hashable]] = None
+) -> Flowchart:
+    """Merge flowcharts into one.
+
+    - Nodes with the same key are merged into one node with the shape of the
+      first, and the link, style and class of the first node that has one.
+    - Classes with the same name and style are merged. A class with the name of
+      a class with another style is renamed with a suffix, e.g. "hot_2".
+    - Subgraphs with the same name are merged. An entity belongs to the first
+      subgraph it is a member of; later conflicting memberships are ignored.
+    - Relationships between the same entities with the same style, arrows and
+      label are only kept once.
+
+    Every element is looked up in a dictionary once, so the time is linear in the
+    total size of the flowcharts.
+
+    Args:
+        charts: The flowcharts to merge. Settings such as the orientation, title
+            and theme are taken from the first.
+        key: A function that gets the merge key of a node, defaults to its name.
+
+    Returns:
+        The merged flowchart, with elements in the order they are first seen.
+
+    Raises:
+        ValueError: If there are no flowcharts.
+
+    """
+    if not charts:
+        raise ValueError("At least one flowchart is required.")
+    key = key or node_name
+
+    with instrumentation.span("flowchart.merge", charts=len(charts)):
+        nodes: Dict[Hashable, Node] = {}
+        subgraphs: Dict[str, Subgraph] = {}
+        parents: Dict[Entity, Subgraph] = {}
+        relationships: Dict[Tuple[Hashable, ...], Relationship] = {}
+        class_defs: Dict[str, Dict[str, str]] = {}
+
+        for chart in charts:
+            classes = _merge_classes(class_defs, chart.class_defs)
+            merged: Dict[Entity, Entity] = {}
+            for node in chart.nodes:
+                merged[node] = _merge_node(nodes, key(node), node, classes)
+            for subgraph in chart.subgraphs:
+                if subgraph.name not in subgraphs:
+                    copy = Subgraph(subgraph.name, [])
+                    copy.direction = subgraph.direction
+                    subgraphs[subgraph.name] = copy
+                merged[subgraph] = subgraphs[subgraph.name]
+
+            for subgraph in chart.subgraphs:
+                parent = subgraphs[subgraph.name]
+                for entity in subgraph.entities:
+                    member = merged.get(entity)
+                    if member is None:
+                        raise ValueError(
+                            f"Subgraph {subgraph.name} contains {entity.name}, "
+                            "which is not in the flowchart."
+                        )
+                    if member in parents or (
+                        isinstance(member, Subgraph)
+                        and _contains(parents, member, parent)
+                    ):
+                        continue
+                    parents[member] = parent
+                    parent.entities.append(member)
+
+            for relationship in chart.relationships:
+                source, target = relationship.entities
+                if source not in merged or target not in merged:
+                    raise ValueError(
+                        "Relationships must be between entities in the flowchart."
+                    )
+                endpoints = (merged[source], merged[target])
+                # Entities are unique after merging, so they are compared by identity.
+                relationship_key = (
+                    id(endpoints[0]),
+                    id(endpoints[1]),
+                    relationship.style,
+                    relationship.input_arrow,
+                    relationship.output_arrow,
+                    relationship.label,
+                )
+                if relationship_key not in relationships:
+                    relationships[relationship_key] = relationship.rewire(*endpoints)
+
+        flowchart = charts[0].derive(
+            list(nodes.values()),
+            list(relationships.values()),
+            list(subgraphs.values()),
+        )
+        flowchart.class_defs = class_defs
+    return flowchart
+
+
+def _merge_classes(
+    class_defs: Dict[str, Dict[str, str]], chart_class_defs: Dict[str, Dict[str, str]]
+) -> Dict[str, str]:
+    """Add the classes of a flowchart, renaming those that clash with another style.
+
+    Returns:
+        The merged name of every class of the flowchart.
+
+    """
+    names: Dict[str, str] = {}
+    for name, style in chart_class_defs.items():
+        merged_name, suffix = name, 1
+        while class_defs.get(merged_name, style) != style:
+            suffix += 1
+            merged_name = f"{name}_{suffix}"
+        class_defs.setdefault(merged_name, style)
+        names[name] = merged_name
+    return names
+
+
+def _merge_node(
+    nodes: Dict[Hashable, Node], node_key: Hashable, node: Node, classes: Dict[str, str]
+) -> Node:
+    """Get the merged node of a key, filling in attributes it does not have."""
+    merged = nodes.get(node_key)
+    if merged is None:
+        merged = nodes[node_key] = Node(node.name, node.shape)
+    if merged.link is None:
+        merged.link = node.link
+    if merged.style is None:
+        merged.style = node.style
+    if merged.class_name is None and node.class_name is not None:
+        merged.class_name = classes.get(node.class_name, node.class_name)
+    return merged
+
+
+def _contains(
+    parents: Dict[Entity, Subgraph], entity: Entity, subgraph: Subgraph
+) -> bool:
+    """Check whether an entity is the subgraph or one of its ancestors."""
+    ancestor: Optional[Subgraph] = subgraph
+    while ancestor is not None:
+        if ancestor is entity:
+            return True
+        ancestor = parents.get(ancestor)
+    return False
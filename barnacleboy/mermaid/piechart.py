@@ -1,10 +1,12 @@
 from typing import Any, Dict
 
+from barnacleboy import instrumentation
 from barnacleboy.mermaid.base import MermaidBase
-from barnacleboy.mermaid.utils import init_string
 
 
 class Piechart(MermaidBase):
+    _hashed_fields = MermaidBase._hashed_fields + ("title", "data")
+
     def __init__(self, title: str, data: Dict[str, int], **kwargs: Any) -> None:
         """Initialize a piechart.
 
@@ -16,15 +18,16 @@ class Piechart(MermaidBase):
         super(Piechart, self).__init__(**kwargs)
         self.title = title
         self.data = data
-        self.config = {}  # type: ignore
 
     def get_piechart_string(self) -> str:
         """Get a string representation of the object."""
-        output_string = init_string(self.base_config, self.config)
+        output_string = self.get_init_string()
         output_string += f"pie title {self.title}\n"
         for key, value in self.data.items():
             output_string += f'"{key}": {value}\n'
+        instrumentation.count("elements_rendered", len(self.data))
         return output_string
 
+    @instrumentation.traced("render.piechart")
     def __str__(self) -> str:
         return self.get_piechart_string()
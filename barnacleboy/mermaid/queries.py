@@ -0,0 +1,251 @@
+"""Neighborhood and path queries on flowcharts.
+
+An `AdjacencyIndex` maps every entity of a flowchart to the positions of its
+relationships. It is built once and then kept up to date by indexing elements
+appended to the flowchart, so queries only touch the entities and relationships
+they return rather than the whole graph.
+
+Query results are flowcharts that share nodes and relationships with the
+original. Subgraphs are copied with only the selected members, since a subgraph
+renders all of its entities.
+"""
+
+from collections import deque
+from typing import Deque, Dict, Iterable, List, Optional, Sequence, Set, Tuple, Union
+
+from barnacleboy import instrumentation
+from barnacleboy.mermaid.flowchart import Flowchart, Node, Relationship, Subgraph
+
+Entity = Union[Node, Subgraph]
+
+
+class AdjacencyIndex:
+    """The relationships of every entity of a flowchart.
+
+    The index assumes that nodes, subgraphs and relationships are only appended
+    to the lists of the flowchart. Replacing or shrinking a list rebuilds it.
+    """
+
+    def __init__(self, flowchart: Flowchart) -> None:
+        self.flowchart = flowchart
+        self.positions: Dict[Entity, int] = {}
+        self.successors: Dict[Entity, List[int]] = {}
+        self.predecessors: Dict[Entity, List[int]] = {}
+        self._indexed: Tuple[int, ...] = (0, 0, 0)
+        self._identities: Tuple[int, ...] = ()
+
+    def update(self) -> None:
+        """Index the elements appended since the last update."""
+        flowchart = self.flowchart
+        lists = (flowchart.nodes, flowchart.subgraphs, flowchart.relationships)
+        counts = (len(lists[0]), len(lists[1]), len(lists[2]))
+        identities = (id(lists[0]), id(lists[1]), id(lists[2]))
+        if identities != self._identities or any(
+            count < n for count, n in zip(counts, self._indexed)
+        ):
+            self.positions.clear()
+            self.successors.clear()
+            self.predecessors.clear()
+            self._identities = identities
+            self._indexed = (0, 0, 0)
+        n_nodes, n_subgraphs, n_relationships = self._indexed
+        if self._indexed == counts:
+            return
+
+        with instrumentation.span("queries.index"):
+            for position in range(n_nodes, len(flowchart.nodes)):
+                self.positions[flowchart.nodes[position]] = position
+            for position in range(n_subgraphs, len(flowchart.subgraphs)):
+                self.positions[flowchart.subgraphs[position]] = position
+            for position in range(n_relationships, len(flowchart.relationships)):
+                source, target = flowchart.relationships[position].entities
+                self.successors.setdefault(source, []).append(position)
+                self.predecessors.setdefault(target, []).append(position)
+        self._indexed = counts
+
+    def check(self, entity: Entity) -> None:
+        """Raise a ValueError if an entity is not in the flowchart."""
+        if entity not in self.positions:
+            raise ValueError(f"Entity {entity.name} is not in the flowchart.")
+
+    def edges(self, entity: Entity, direction: str) -> Iterable[Tuple[int, Entity]]:
+        """Iterate over the relationships of an entity and the entities they reach.
+
+        Args:
+            entity: The entity to start from.
+            direction: "out" to follow relationships, "in" to follow them backwards
+                or "both".
+
+        Yields:
+            The position of every relationship and the entity at its other end.
+
+        """
+        relationships = self.flowchart.relationships
+        if direction in ("out", "both"):
+            for position in self.successors.get(entity, ()):
+                yield position, relationships[position].entities[1]
+        if direction in ("in", "both"):
+            for position in self.predecessors.get(entity, ()):
+                yield position, relationships[position].entities[0]
+
+
+def traverse(
+    index: AdjacencyIndex, start: Entity, direction: str, depth: Optional[int]
+) -> List[Entity]:
+    """Find the entities within a number of relationships of an entity.
+
+    Args:
+        index: The adjacency index of the flowchart.
+        start: The entity to start from, which is included in the result.
+        direction: "out", "in" or "both", see `AdjacencyIndex.edges`.
+        depth: The maximum number of relationships, None for no limit.
+
+    Returns:
+        The entities in breadth-first order.
+
+    """
+    index.check(start)
+    seen = {start: 0}
+    queue: Deque[Entity] = deque([start])
+    while queue:
+        entity = queue.popleft()
+        distance = seen[entity]
+        if depth is not None and distance >= depth:
+            continue
+        for _, neighbor in index.edges(entity, direction):
+            if neighbor not in seen:
+                seen[neighbor] = distance + 1
+                queue.append(neighbor)
+    return list(seen)
+
+
+def shortest_path(
+    index: AdjacencyIndex, source: Entity, target: Entity, directed: bool = True
+) -> Flowchart:
+    """Find a path with the fewest relationships between two entities.
+
+    Args:
+        index: The adjacency index of the flowchart.
+        source: The entity to start from.
+        target: The entity to reach.
+        directed: Whether relationships can only be followed forwards.
+
+    Returns:
+        A flowchart of the entities and relationships on the path.
+
+    Raises:
+        ValueError: If an entity is not in the flowchart or there is no path.
+
+    """
+    index.check(source)
+    index.check(target)
+    direction = "out" if directed else "both"
+    # The relationship each entity was reached through.
+    reached: Dict[Entity, Optional[int]] = {source: None}
+    queue: Deque[Entity] = deque([source])
+    while queue and target not in reached:
+        entity = queue.popleft()
+        for position, neighbor in index.edges(entity, direction):
+            if neighbor not in reached:
+                reached[neighbor] = position
+                queue.append(neighbor)
+    if target not in reached:
+        raise ValueError(f"There is no path from {source.name} to {target.name}.")
+
+    positions = []
+    entities = [target]
+    entity = target
+    while entity is not source:
+        via = reached[entity]
+        assert via is not None
+        positions.append(via)
+        first, second = index.flowchart.relationships[via].entities
+        entity = first if second is entity else second
+        entities.append(entity)
+    return induced_subchart(index, entities, positions)
+
+
+def induced_subchart(
+    index: AdjacencyIndex,
+    entities: Iterable[Entity],
+    positions: Optional[Sequence[int]] = None,
+) -> Flowchart:
+    """Create a flowchart of some entities and the relationships between them.
+
+    Args:
+        index: The adjacency index of the flowchart.
+        entities: The entities to keep. Members of a kept subgraph are only kept
+            if they are selected too.
+        positions: The positions of the relationships to keep, all relationships
+            between kept entities if None.
+
+    Returns:
+        A flowchart with the elements in their original order.
+
+    Raises:
+        ValueError: If an entity is not in the flowchart.
+
+    """
+    flowchart = index.flowchart
+    selected: Dict[Entity, None] = {}
+    for entity in entities:
+        index.check(entity)
+        selected[entity] = None
+
+    if positions is None:
+        positions = [
+            position
+            for entity in selected
+            for position in index.successors.get(entity, ())
+            if flowchart.relationships[position].entities[1] in selected
+        ]
+    nodes = sorted(
+        (entity for entity in selected if isinstance(entity, Node)),
+        key=index.positions.__getitem__,
+    )
+    subgraphs = sorted(
+        (entity for entity in selected if isinstance(entity, Subgraph)),
+        key=index.positions.__getitem__,
+    )
+
+    # Copy the subgraphs around selected entities with only selected members.
+    # Members are collected in plain lists and given to each copy once.
+    copies: Dict[Subgraph, Subgraph] = {}
+    member_lists: Dict[Subgraph, List[Entity]] = {}
+    members: Set[Tuple[Subgraph, Entity]] = set()
+
+    def copy(subgraph: Subgraph) -> Subgraph:
+        if subgraph not in copies:
+            copies[subgraph] = Subgraph(subgraph.name, [])
+            copies[subgraph]._internal_id = subgraph._internal_id
+            copies[subgraph].direction = subgraph.direction
+            member_lists[subgraph] = []
+        return copies[subgraph]
+
+    kept: List[Entity] = [*nodes, *subgraphs]
+    for entity in kept:
+        parent = flowchart.parent(entity)
+        while parent is not None and (parent, entity) not in members:
+            members.add((parent, entity))
+            member = copy(entity) if isinstance(entity, Subgraph) else entity
+            copy(parent)
+            member_lists[parent].append(member)
+            entity, parent = parent, flowchart.parent(parent)
+    for subgraph in subgraphs:
+        copy(subgraph)
+    for subgraph, subgraph_copy in copies.items():
+        subgraph_copy.entities = member_lists[subgraph]
+
+    def endpoint(entity: Entity) -> Entity:
+        return copies[entity] if isinstance(entity, Subgraph) else entity
+
+    relationships: List[Relationship] = []
+    for position in sorted(positions):
+        relationship = flowchart.relationships[position]
+        source, target = relationship.entities
+        if isinstance(source, Subgraph) or isinstance(target, Subgraph):
+            relationship = relationship.rewire(endpoint(source), endpoint(target))
+        relationships.append(relationship)
+
+    ordered = sorted(copies, key=lambda s: index.positions.get(s, len(index.positions)))
+    return flowchart.derive(nodes, relationships, [copies[s] for s in ordered])
@@ -0,0 +1,520 @@
+"""Reduction passes that keep large flowcharts renderable.
+
+Every pass takes a flowchart and returns a new flowchart together with a report
+of what was collapsed. The input flowchart is left untouched; nodes,
+relationships and subgraphs that a pass does not change are shared with its
+output.
+
+Passes only rewrite relationships between two nodes. Nodes inside a subgraph, or
+connected to one, are never collapsed.
+"""
+
+import dataclasses
+from collections import Counter, defaultdict
+from typing import (
+    Callable,
+    DefaultDict,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+    cast,
+)
+
+from barnacleboy import instrumentation
+from barnacleboy.mermaid.flowchart import (
+    Flowchart,
+    Node,
+    NodeShape,
+    Relationship,
+    Subgraph,
+    quote_label,
+)
+
+
+@dataclasses.dataclass
+class Collapse:
+    """A group of nodes replaced by a node, or folded into a subgraph.
+
+    Args:
+        kind: The pass that collapsed the nodes.
+        members: The collapsed nodes.
+        replacement: The node or subgraph that replaces them.
+
+    """
+
+    kind: str
+    members: List[Node]
+    replacement: Union[Node, Subgraph]
+
+
+@dataclasses.dataclass
+class ReductionReport:
+    """What the reduction passes collapsed and removed."""
+
+    collapses: List[Collapse] = dataclasses.field(default_factory=list)
+    removed_relationships: List[Relationship] = dataclasses.field(default_factory=list)
+
+    def extend(self, other: "ReductionReport") -> None:
+        """Add the contents of another report to this one."""
+        self.collapses += other.collapses
+        self.removed_relationships += other.removed_relationships
+
+    def summary(self) -> Dict[str, int]:
+        """Get the number of collapsed nodes per pass and of removed relationships."""
+        summary: Counter = Counter()
+        for collapse in self.collapses:
+            summary[collapse.kind] += len(collapse.members)
+        summary["removed_relationships"] = len(self.removed_relationships)
+        return dict(summary)
+
+    def __str__(self) -> str:
+        return "\n".join(f"{key}: {value}" for key, value in self.summary().items())
+
+
+def _source(relationship: Relationship) -> Node:
+    return cast(Node, relationship.entities[0])
+
+
+def _target(relationship: Relationship) -> Node:
+    return cast(Node, relationship.entities[1])
+
+
+class _Graph:
+    """Adjacency of the relationships between nodes of a flowchart."""
+
+    def __init__(self, flowchart: Flowchart) -> None:
+        self.flowchart = flowchart
+        self.successors: DefaultDict[Node, List[Relationship]] = defaultdict(list)
+        self.predecessors: DefaultDict[Node, List[Relationship]] = defaultdict(list)
+        self.fixed: Set[Node] = {
+            node for node in flowchart.nodes if flowchart.parent(node) is not None
+        }
+        for relationship in flowchart.relationships:
+            source, target = relationship.entities
+            if isinstance(source, Node) and isinstance(target, Node):
+                self.successors[source].append(relationship)
+                self.predecessors[target].append(relationship)
+            else:
+                self.fixed.update(
+                    entity for entity in (source, target) if isinstance(entity, Node)
+                )
+
+    def degree(self, node: Node) -> int:
+        return len(self.successors[node]) + len(self.predecessors[node])
+
+    def free_nodes(self) -> List[Node]:
+        return [node for node in self.flowchart.nodes if node not in self.fixed]
+
+    def strongly_connected_components(self) -> List[List[Node]]:
+        """Tarjan's algorithm with an explicit stack."""
+        index: Dict[Node, int] = {}
+        lowlink: Dict[Node, int] = {}
+        on_stack: Set[Node] = set()
+        stack: List[Node] = []
+        components: List[List[Node]] = []
+
+        for root in self.flowchart.nodes:
+            if root in index:
+                continue
+            work = [(root, iter(self.successors[root]))]
+            index[root] = lowlink[root] = len(index)
+            stack.append(root)
+            on_stack.add(root)
+            while work:
+                node, relationships = work[-1]
+                for relationship in relationships:
+                    target = _target(relationship)
+                    if target not in index:
+                        index[target] = lowlink[target] = len(index)
+                        stack.append(target)
+                        on_stack.add(target)
+                        work.append((target, iter(self.successors[target])))
+                        break
+                    if target in on_stack:
+                        lowlink[node] = min(lowlink[node], index[target])
+                else:
+                    work.pop()
+                    if work:
+                        parent = work[-1][0]
+                        lowlink[parent] = min(lowlink[parent], lowlink[node])
+                    if lowlink[node] == index[node]:
+                        component = []
+                        while True:
+                            member = stack.pop()
+                            on_stack.discard(member)
+                            component.append(member)
+                            if member is node:
+                                break
+                        components.append(component[::-1])
+        return components
+
+
+def _link_key(relationship: Relationship) -> Tuple[Optional[str], ...]:
+    return (
+        relationship.style,
+        relationship.input_arrow,
+        relationship.output_arrow,
+        relationship.label,
+    )
+
+
+def _apply(
+    flowchart: Flowchart,
+    removed_nodes: Iterable[Node] = (),
+    removed_relationships: Iterable[Relationship] = (),
+    new_nodes: Iterable[Node] = (),
+    new_relationships: Iterable[Relationship] = (),
+    new_subgraphs: Iterable[Subgraph] = (),
+) -> Flowchart:
+    """Derive a flowchart with elements removed and added."""
+    removed_node_set = set(removed_nodes)
+    removed_relationship_set = set(removed_relationships)
+    return flowchart.derive(
+        [node for node in flowchart.nodes if node not in removed_node_set]
+        + list(new_nodes),
+        [
+            relationship
+            for relationship in flowchart.relationships
+            if relationship not in removed_relationship_set
+        ]
+        + list(new_relationships),
+        flowchart.subgraphs + list(new_subgraphs),
+    )
+
+
+def transitive_reduction(
+    flowchart: Flowchart, max_depth: Optional[int] = 2
+) -> Tuple[Flowchart, ReductionReport]:
+    """Remove relationships implied by a longer path.
+
+    A relationship from A to B is removed when B can also be reached from A through
+    other nodes. Relationships on cycles are kept, so reachability is preserved.
+
+    Args:
+        flowchart: The flowchart to reduce.
+        max_depth: The maximum length of the alternative paths to search. The
+            default keeps the pass near-linear; None computes the exact transitive
+            reduction, at a cost of O(N * E).
+
+    Returns:
+        The reduced flowchart and a report of the removed relationships.
+
+    """
+    graph = _Graph(flowchart)
+    # A node with a relationship to itself is a cycle of its own.
+    self_loops = {
+        relationship.entities[0]
+        for relationship in flowchart.relationships
+        if relationship.entities[0] is relationship.entities[1]
+    }
+    acyclic = {
+        component[0]
+        for component in graph.strongly_connected_components()
+        if len(component) == 1 and component[0] not in self_loops
+    }
+    removed: List[Relationship] = []
+    for source in flowchart.nodes:
+        if source not in acyclic:
+            continue
+        direct = [
+            relationship
+            for relationship in graph.successors[source]
+            if _target(relationship) in acyclic
+        ]
+        if not direct:
+            continue
+
+        frontier = {_target(r) for r in graph.successors[source]} - {source}
+        expanded = set(frontier)
+        indirect: Set[Node] = set()
+        depth = 1
+        while frontier and (max_depth is None or depth < max_depth):
+            reached = {
+                _target(relationship)
+                for node in frontier
+                for relationship in graph.successors[node]
+            }
+            indirect |= reached
+            frontier = reached - expanded
+            expanded |= frontier
+            depth += 1
+
+        removed += [
+            relationship for relationship in direct if _target(relationship) in indirect
+        ]
+
+    instrumentation.count("reduction.transitive", len(removed))
+    return _apply(flowchart, removed_relationships=removed), ReductionReport(
+        removed_relationships=removed
+    )
+
+
+def collapse_chains(
+    flowchart: Flowchart, min_length: int = 2
+) -> Tuple[Flowchart, ReductionReport]:
+    """Collapse linear chains of nodes into single nodes.
+
+    A chain consists of nodes with exactly one incoming and one outgoing
+    relationship.
+
+    Args:
+        flowchart: The flowchart to reduce.
+        min_length: The minimum number of nodes in a chain to collapse.
+
+    Returns:
+        The reduced flowchart and a report of the collapsed chains.
+
+    """
+    graph = _Graph(flowchart)
+
+    def in_chain(node: Node) -> bool:
+        return (
+            node not in graph.fixed
+            and len(graph.predecessors[node]) == 1
+            and len(graph.successors[node]) == 1
+            and _target(graph.successors[node][0]) is not node
+        )
+
+    report = ReductionReport()
+    removed_nodes: List[Node] = []
+    removed_relationships: List[Relationship] = []
+    new_nodes: List[Node] = []
+    new_relationships: List[Relationship] = []
+    for node in flowchart.nodes:
+        if not in_chain(node) or in_chain(_source(graph.predecessors[node][0])):
+            continue
+        chain = [node]
+        members = {node}
+        while True:
+            successor = _target(graph.successors[chain[-1]][0])
+            if successor in members or not in_chain(successor):
+                break
+            chain.append(successor)
+            members.add(successor)
+        if len(chain) < min_length:
+            continue
+
+        incoming = graph.predecessors[chain[0]][0]
+        outgoing = graph.successors[chain[-1]][0]
+        replacement = Node(
+            quote_label(f"{chain[0].name} ... {chain[-1].name} ({len(chain)} nodes)"),
+            NodeShape.SUBROUTINE,
+        )
+        removed_nodes += chain
+        removed_relationships += [graph.predecessors[member][0] for member in chain]
+        removed_relationships.append(outgoing)
+        new_nodes.append(replacement)
+        new_relationships.append(incoming.rewire(_source(incoming), replacement))
+        new_relationships.append(outgoing.rewire(replacement, _target(outgoing)))
+        report.collapses.append(Collapse("chain", chain, replacement))
+
+    instrumentation.count("reduction.chain", len(removed_nodes))
+    reduced = _apply(
+        flowchart, removed_nodes, removed_relationships, new_nodes, new_relationships
+    )
+    return reduced, report
+
+
+def collapse_hubs(
+    flowchart: Flowchart, max_degree: int = 20, min_group: int = 2
+) -> Tuple[Flowchart, ReductionReport]:
+    """Collapse the leaves of high fan-out nodes into summary nodes.
+
+    Leaves of a hub that are connected to it in the same direction and with the
+    same kind of relationship are replaced by a single node.
+
+    Args:
+        flowchart: The flowchart to reduce.
+        max_degree: Nodes with more relationships than this are hubs.
+        min_group: The minimum number of leaves to collapse.
+
+    Returns:
+        The reduced flowchart and a report of the collapsed leaves.
+
+    """
+    graph = _Graph(flowchart)
+    report = ReductionReport()
+    removed_nodes: List[Node] = []
+    removed_relationships: List[Relationship] = []
+    new_nodes: List[Node] = []
+    new_relationships: List[Relationship] = []
+
+    for hub in flowchart.nodes:
+        if graph.degree(hub) <= max_degree:
+            continue
+        for relationships, leaf_position in (
+            (graph.successors[hub], 1),
+            (graph.predecessors[hub], 0),
+        ):
+            groups: DefaultDict[tuple, List[Relationship]] = defaultdict(list)
+            for relationship in relationships:
+                leaf = cast(Node, relationship.entities[leaf_position])
+                if (
+                    leaf is not hub
+                    and leaf not in graph.fixed
+                    and graph.degree(leaf) == 1
+                ):
+                    groups[_link_key(relationship)].append(relationship)
+
+            for group in groups.values():
+                if len(group) < min_group:
+                    continue
+                leaves = [cast(Node, r.entities[leaf_position]) for r in group]
+                replacement = Node(f"{len(leaves)} nodes", NodeShape.SUBROUTINE)
+                if leaf_position:
+                    new_relationships.append(group[0].rewire(hub, replacement))
+                else:
+                    new_relationships.append(group[0].rewire(replacement, hub))
+                removed_nodes += leaves
+                removed_relationships += group
+                new_nodes.append(replacement)
+                report.collapses.append(Collapse("hub", leaves, replacement))
+
+    instrumentation.count("reduction.hub", len(removed_nodes))
+    reduced = _apply(
+        flowchart, removed_nodes, removed_relationships, new_nodes, new_relationships
+    )
+    return reduced, report
+
+
+def _fold(
+    flowchart: Flowchart, kind: str, groups: List[Tuple[str, List[Node]]]
+) -> Tuple[Flowchart, ReductionReport]:
+    """Fold groups of nodes into new subgraphs."""
+    report = ReductionReport()
+    subgraphs: List[Subgraph] = []
+    for name, members in groups:
+        subgraphs.append(Subgraph(name, list(members)))
+        report.collapses.append(Collapse(kind, members, subgraphs[-1]))
+    instrumentation.count(f"reduction.{kind}", sum(len(m) for _, m in groups))
+    return _apply(flowchart, new_subgraphs=subgraphs), report
+
+
+def fold_components(
+    flowchart: Flowchart, min_size: int = 2
+) -> Tuple[Flowchart, ReductionReport]:
+    """Fold strongly connected components into subgraphs.
+
+    Args:
+        flowchart: The flowchart to reduce.
+        min_size: The minimum number of nodes in a component to fold.
+
+    Returns:
+        The reduced flowchart and a report of the folded components.
+
+    """
+    graph = _Graph(flowchart)
+    groups = [
+        (quote_label(f"Cycle: {component[0].name} ({len(component)} nodes)"), component)
+        for component in graph.strongly_connected_components()
+        if len(component) >= min_size
+        and not any(member in graph.fixed for member in component)
+    ]
+    return _fold(flowchart, "component", groups)
+
+
+def fold_communities(
+    flowchart: Flowchart, min_size: int = 3, max_iterations: int = 20
+) -> Tuple[Flowchart, ReductionReport]:
+    """Fold densely connected groups of nodes into subgraphs.
+
+    Communities are detected with label propagation, which takes linear time per
+    iteration. Nodes keep their label on ties and otherwise adopt the largest of
+    the most frequent labels, so equal flowcharts fold equally.
+
+    Args:
+        flowchart: The flowchart to reduce.
+        min_size: The minimum number of nodes in a community to fold.
+        max_iterations: The maximum number of label propagation rounds.
+
+    Returns:
+        The reduced flowchart and a report of the folded communities.
+
+    """
+    graph = _Graph(flowchart)
+    nodes = graph.free_nodes()
+    labels = {node: idx for idx, node in enumerate(nodes)}
+    neighbors: Dict[Node, List[Node]] = {
+        node: [
+            neighbor
+            for neighbor in [_target(r) for r in graph.successors[node]]
+            + [_source(r) for r in graph.predecessors[node]]
+            if neighbor in labels and neighbor is not node
+        ]
+        for node in nodes
+    }
+
+    for _ in range(max_iterations):
+        changed = False
+        for node in nodes:
+            if not neighbors[node]:
+                continue
+            counts = Counter(labels[neighbor] for neighbor in neighbors[node])
+            best = max(counts.values())
+            if counts[labels[node]] == best:
+                continue
+            label = max(key for key, value in counts.items() if value == best)
+            if label != labels[node]:
+                labels[node] = label
+                changed = True
+        if not changed:
+            break
+
+    communities: Dict[int, List[Node]] = defaultdict(list)
+    for node in nodes:
+        communities[labels[node]].append(node)
+    groups = [
+        (quote_label(f"Community: {members[0].name} ({len(members)} nodes)"), members)
+        for members in communities.values()
+        if min_size <= len(members) < len(nodes)
+    ]
+    return _fold(flowchart, "community", groups)
+
+
+def reduce(
+    flowchart: Flowchart,
+    *,
+    transitive: bool = False,
+    chains: bool = False,
+    hubs: Optional[int] = None,
+    components: bool = False,
+    communities: bool = False,
+) -> Tuple[Flowchart, ReductionReport]:
+    """Apply the selected reduction passes in order.
+
+    Args:
+        flowchart: The flowchart to reduce.
+        transitive: Whether to remove relationships implied by longer paths.
+        chains: Whether to collapse linear chains.
+        hubs: If set, collapse the leaves of nodes with more relationships.
+        components: Whether to fold strongly connected components.
+        communities: Whether to fold detected communities.
+
+    Returns:
+        The reduced flowchart and a report of everything that was collapsed.
+
+    """
+    passes: List[Tuple[str, Callable[[Flowchart], Tuple[Flowchart, ReductionReport]]]]
+    passes = []
+    if transitive:
+        passes.append(("transitive", transitive_reduction))
+    if chains:
+        passes.append(("chains", collapse_chains))
+    if hubs is not None:
+        max_degree = hubs
+        passes.append(("hubs", lambda chart: collapse_hubs(chart, max_degree)))
+    if components:
+        passes.append(("components", fold_components))
+    if communities:
+        passes.append(("communities", fold_communities))
+
+    report = ReductionReport()
+    for name, reduction_pass in passes:
+        with instrumentation.span(f"reduction.{name}"):
+            flowchart, pass_report = reduction_pass(flowchart)
+        report.extend(pass_report)
+    return flowchart, report
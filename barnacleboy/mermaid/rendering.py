@@ -0,0 +1,516 @@
+"""Rendering of diagrams to images with pluggable backends.
+
+Every backend is a `Renderer`:
+
+- `RenderSupervisor` runs mermaid-cli. mermaid-cli drives a headless browser,
+  which can hang or exhaust memory on pathological diagrams, so every render
+  runs in its own process group with a timeout and an optional memory limit,
+  the whole group is killed when the timeout expires, and failed renders are
+  retried with exponential backoff.
+- `WorkerPoolRenderer` renders with another backend in a pool of worker
+  processes that are started once and reused, so many diagrams can be rendered
+  concurrently.
+- `HttpRenderer` posts diagrams to a Kroki-compatible HTTP service. It keeps a
+  pool of keep-alive connections that concurrent renders share.
+
+`get_renderer` returns the backend selected by `Settings.RENDERER`. Failures
+raise a `RenderError` with the reason and the details of the last attempt.
+"""
+
+import http.client
+import os
+import queue
+import shutil
+import signal
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+import urllib.parse
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple, Union
+
+from barnacleboy import instrumentation
+from barnacleboy.config import get_settings
+
+# Reasons of render failures.
+NOT_FOUND = "not_found"
+TIMEOUT = "timeout"
+MEMORY = "memory"
+SIGNAL = "signal"
+EXIT = "exit"
+NO_OUTPUT = "no_output"
+HTTP = "http"
+
+RENDERERS = ("mmdc", "workers", "http")
+HTTP_FORMATS = ("svg", "png", "pdf")
+
+# socket.timeout is only an alias of TimeoutError from Python 3.10.
+TIMEOUT_ERRORS = (socket.timeout, TimeoutError)
+MEMORY_MESSAGES = ("MemoryError", "out of memory", "Out of memory", "ENOMEM")
+
+
+class RenderError(RuntimeError):
+    """A render that failed, after all retries.
+
+    Args:
+        reason: Why the last attempt failed, e.g. "timeout" or "exit".
+        message: A description of the failure.
+        returncode: The exit code of the last attempt, negative for a signal.
+        stderr: The captured standard error of the last attempt.
+        attempts: The number of attempts.
+
+    """
+
+    def __init__(
+        self,
+        reason: str,
+        message: str,
+        returncode: Optional[int] = None,
+        stderr: str = "",
+        attempts: int = 1,
+    ) -> None:
+        super().__init__(message)
+        self.reason = reason
+        self.returncode = returncode
+        self.stderr = stderr
+        self.attempts = attempts
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+        # Keep the details when the error is sent from a worker process.
+        arguments = (self.reason, self.args[0], self.returncode, self.stderr)
+        return RenderError, arguments + (self.attempts,)
+
+    def __str__(self) -> str:
+        message = super().__str__()
+        if self.stderr:
+            message += "\n" + self.stderr[-2000:]
+        return message
+
+
+class Renderer:
+    """A backend that renders mermaid text to images."""
+
+    def render_bytes(self, text: str, suffix: str) -> bytes:
+        """Render a diagram.
+
+        Args:
+            text: The mermaid text of the diagram.
+            suffix: The file type of the image, e.g. ".svg".
+
+        Returns:
+            The contents of the image.
+
+        Raises:
+            RenderError: If rendering failed.
+
+        """
+        raise NotImplementedError
+
+    def render(self, text: str, filename: Union[str, Path]) -> None:
+        """Render a diagram to a file.
+
+        Args:
+            text: The mermaid text of the diagram.
+            filename: The image file to write, its suffix selects the format.
+
+        Raises:
+            RenderError: If rendering failed.
+
+        """
+        data = self.render_bytes(text, Path(filename).suffix)
+        Path(filename).write_bytes(data)
+
+    def close(self) -> None:
+        """Release the processes or connections of the backend."""
+
+
+class RenderSupervisor(Renderer):
+    """Runs mermaid-cli with a timeout, a memory limit and retries."""
+
+    def __init__(
+        self,
+        command: Optional[str] = None,
+        timeout: Optional[float] = None,
+        memory_limit: Optional[int] = None,
+        retries: Optional[int] = None,
+        backoff: Optional[float] = None,
+        retry_on: Sequence[str] = (TIMEOUT, MEMORY, SIGNAL),
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        """Initialize a supervisor, with defaults from the settings.
+
+        Args:
+            command: The mermaid-cli executable.
+            timeout: The maximum number of seconds of an attempt, None for none.
+            memory_limit: The maximum address space of an attempt in bytes, None
+                for none. Only supported on POSIX systems.
+            retries: The number of attempts after the first.
+            backoff: The seconds to wait before the first retry, doubled before
+                every next one.
+            retry_on: The failure reasons to retry. Other exits are not retried by
+                default, since syntax errors and bad output paths fail every time.
+            sleep: The function used to wait between attempts.
+
+        """
+        settings = get_settings()
+        self.command = command or settings.MERMAID_CLI
+        self.timeout = timeout if timeout is not None else settings.RENDER_TIMEOUT
+        self.memory_limit = (
+            memory_limit if memory_limit is not None else settings.RENDER_MEMORY_LIMIT
+        )
+        self.retries = retries if retries is not None else settings.RENDER_RETRIES
+        self.backoff = backoff if backoff is not None else settings.RENDER_BACKOFF
+        self.retry_on = tuple(retry_on)
+        self.sleep = sleep
+
+    def render(self, text: str, filename: Union[str, Path]) -> None:
+        """Render a diagram to a file.
+
+        Args:
+            text: The mermaid text of the diagram.
+            filename: The image file to write, its suffix selects the format.
+
+        Raises:
+            RenderError: If mermaid-cli is not installed or every attempt failed.
+
+        """
+        executable = shutil.which(self.command)
+        if executable is None:
+            raise RenderError(
+                NOT_FOUND, "Saving images requires mermaid-cli to be installed."
+            )
+
+        with tempfile.TemporaryDirectory() as directory:
+            input_file = Path(directory) / "diagram.mmd"
+            input_file.write_text(text, encoding="utf-8")
+            arguments = [executable, "-i", str(input_file), "-o", str(filename)]
+
+            delay = self.backoff
+            for attempt in range(1, self.retries + 2):
+                with instrumentation.span("render.subprocess", attempt=attempt):
+                    start = time.perf_counter()
+                    error = self._attempt(arguments, Path(filename))
+                    instrumentation.count(
+                        "subprocess_seconds", time.perf_counter() - start
+                    )
+                if error is None:
+                    return
+                error.attempts = attempt
+                if attempt > self.retries or error.reason not in self.retry_on:
+                    raise error
+                instrumentation.count("render.retries")
+                self.sleep(delay)
+                delay *= 2
+
+    def render_bytes(self, text: str, suffix: str) -> bytes:
+        with tempfile.TemporaryDirectory() as directory:
+            filename = Path(directory) / f"diagram{suffix}"
+            self.render(text, filename)
+            return filename.read_bytes()
+
+    def _attempt(
+        self, arguments: Sequence[str], filename: Path
+    ) -> Optional[RenderError]:
+        """Run mermaid-cli once, returning the failure if there is one."""
+        if filename.exists():
+            filename.unlink()
+        posix = os.name == "posix"
+        process = subprocess.Popen(
+            arguments,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            start_new_session=posix,
+            preexec_fn=self._limit_memory if posix and self.memory_limit else None,
+        )
+        try:
+            _, stderr_bytes = process.communicate(timeout=self.timeout or None)
+        except subprocess.TimeoutExpired:
+            _kill(process, posix)
+            _, stderr_bytes = process.communicate()
+            return RenderError(
+                TIMEOUT,
+                f"Rendering took longer than {self.timeout} seconds.",
+                process.returncode,
+                stderr_bytes.decode("utf-8", "replace"),
+            )
+        # Helpers such as the browser may outlive mermaid-cli.
+        _kill(process, posix)
+
+        stderr = stderr_bytes.decode("utf-8", "replace")
+        returncode = process.returncode
+        reason, message = self._classify(returncode, stderr)
+        if reason is None and not filename.exists():
+            reason, message = NO_OUTPUT, "mermaid-cli did not write an image."
+        if reason is None:
+            return None
+        return RenderError(reason, message, returncode, stderr)
+
+    def _classify(self, returncode: int, stderr: str) -> Tuple[Optional[str], str]:
+        """Get the reason and description of an exit code."""
+        if returncode == 0:
+            return None, ""
+        if self.memory_limit and any(text in stderr for text in MEMORY_MESSAGES):
+            return MEMORY, f"Rendering exceeded {self.memory_limit} bytes of memory."
+        if returncode < 0:
+            name = signal.Signals(-returncode).name
+            return SIGNAL, f"mermaid-cli was killed by {name}."
+        return EXIT, f"mermaid-cli exited with code {returncode}."
+
+    def _limit_memory(self) -> None:
+        """Limit the address space of the child process, run before exec."""
+        import resource
+
+        assert self.memory_limit is not None
+        resource.setrlimit(resource.RLIMIT_AS, (self.memory_limit, self.memory_limit))
+
+
+def _kill(process: "subprocess.Popen[bytes]", posix: bool) -> None:
+    """Kill a process and, on POSIX, every process in its group."""
+    if posix:
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+    elif process.poll() is None:
+        process.kill()
+
+
+# The backend of the current worker process of a WorkerPoolRenderer.
+_worker_backend: Optional[Renderer] = None
+
+
+def _start_worker(backend: Renderer) -> None:
+    global _worker_backend
+    _worker_backend = backend
+
+
+def _render_in_worker(text: str, filename: str) -> None:
+    assert _worker_backend is not None
+    _worker_backend.render(text, filename)
+
+
+def _render_bytes_in_worker(text: str, suffix: str) -> bytes:
+    assert _worker_backend is not None
+    return _worker_backend.render_bytes(text, suffix)
+
+
+class WorkerPoolRenderer(Renderer):
+    """Renders with another backend in a pool of long-lived worker processes.
+
+    The workers are started by the first render and reused until `close`. Each
+    worker gets its own copy of the backend, so a `HttpRenderer` keeps its
+    connections open between the renders of a worker.
+    """
+
+    def __init__(
+        self, backend: Optional[Renderer] = None, workers: Optional[int] = None
+    ) -> None:
+        """Initialize a pool, with defaults from the settings.
+
+        Args:
+            backend: The backend the workers render with, defaults to mermaid-cli.
+            workers: The number of worker processes, defaults to the number of
+                processors.
+
+        """
+        self.backend = backend or RenderSupervisor()
+        self.workers = workers or get_settings().RENDER_WORKERS or os.cpu_count()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    self.workers, initializer=_start_worker, initargs=(self.backend,)
+                )
+            return self._executor
+
+    def submit(self, text: str, filename: Union[str, Path]) -> "Future[None]":
+        """Render a diagram to a file in the background.
+
+        Args:
+            text: The mermaid text of the diagram.
+            filename: The image file to write, its suffix selects the format.
+
+        Returns:
+            A future that is done when the file is written, or raises a
+            `RenderError`.
+
+        """
+        return self._pool().submit(_render_in_worker, text, str(filename))
+
+    def render(self, text: str, filename: Union[str, Path]) -> None:
+        self.submit(text, filename).result()
+
+    def render_bytes(self, text: str, suffix: str) -> bytes:
+        return self._pool().submit(_render_bytes_in_worker, text, suffix).result()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+    def __getstate__(self) -> Dict[str, Any]:
+        return {"backend": self.backend, "workers": self.workers}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__init__(**state)  # type: ignore
+
+
+class HttpRenderer(Renderer):
+    """Renders with a Kroki-compatible HTTP service.
+
+    Diagrams are posted to `<url>/mermaid/<format>`. Connections are kept alive
+    and reused; at most `pool_size` requests are sent at the same time, and other
+    renders wait for a free connection. A request on a reused connection that the
+    server has closed in the meantime is retried once on a new connection.
+    """
+
+    def __init__(
+        self,
+        url: Optional[str] = None,
+        pool_size: Optional[int] = None,
+        timeout: Optional[float] = None,
+    ) -> None:
+        """Initialize an HTTP backend, with defaults from the settings.
+
+        Args:
+            url: The base URL of the service.
+            pool_size: The maximum number of connections.
+            timeout: The maximum number of seconds to wait for a response.
+
+        Raises:
+            ValueError: If the URL is not an http or https URL.
+
+        """
+        settings = get_settings()
+        self.url = url or settings.RENDER_URL
+        self.pool_size = pool_size or settings.RENDER_POOL_SIZE
+        self.timeout = timeout if timeout is not None else settings.RENDER_TIMEOUT
+        parts = urllib.parse.urlsplit(self.url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise ValueError(f"{self.url} is not an http or https URL.")
+        self._https = parts.scheme == "https"
+        self._host = parts.hostname
+        self._port = parts.port
+        self._path = parts.path.rstrip("/")
+        self._idle: "queue.LifoQueue[http.client.HTTPConnection]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.pool_size)
+
+    def _connect(self) -> http.client.HTTPConnection:
+        instrumentation.count("render.http_connections")
+        if self._https:
+            return http.client.HTTPSConnection(
+                self._host, self._port, timeout=self.timeout
+            )
+        return http.client.HTTPConnection(self._host, self._port, timeout=self.timeout)
+
+    def render_bytes(self, text: str, suffix: str) -> bytes:
+        output_format = suffix.lstrip(".")
+        if output_format not in HTTP_FORMATS:
+            raise ValueError(f"The HTTP renderer does not support {suffix} files.")
+        path = f"{self._path}/mermaid/{output_format}"
+        body = text.encode("utf-8")
+
+        with self._slots, instrumentation.span("render.http", format=output_format):
+            try:
+                connection, reused = self._idle.get_nowait(), True
+            except queue.Empty:
+                connection, reused = self._connect(), False
+            while True:
+                try:
+                    response = self._request(connection, path, body)
+                    data = response.read()
+                    break
+                except (http.client.HTTPException, OSError) as error:
+                    connection.close()
+                    timed_out = isinstance(error, TIMEOUT_ERRORS)
+                    if reused and not timed_out:
+                        # The server closed the idle connection, try a new one.
+                        connection, reused = self._connect(), False
+                        continue
+                    raise RenderError(
+                        TIMEOUT if timed_out else HTTP,
+                        f"Request to {self.url} failed: {error}",
+                    ) from error
+                except BaseException:
+                    # The connection may be halfway through a response.
+                    connection.close()
+                    raise
+            if response.will_close:
+                connection.close()
+            else:
+                self._idle.put(connection)
+
+        if response.status != 200:
+            raise RenderError(
+                HTTP,
+                f"{self.url} responded with status {response.status}.",
+                response.status,
+                data.decode("utf-8", "replace"),
+            )
+        instrumentation.count("bytes_rendered", len(data))
+        return data
+
+    @staticmethod
+    def _request(
+        connection: http.client.HTTPConnection, path: str, body: bytes
+    ) -> http.client.HTTPResponse:
+        connection.request(
+            "POST",
+            path,
+            body,
+            {"Content-Type": "text/plain; charset=utf-8", "Accept": "*/*"},
+        )
+        return connection.getresponse()
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # Connections cannot be shared with other processes.
+        return {"url": self.url, "pool_size": self.pool_size, "timeout": self.timeout}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__init__(**state)  # type: ignore
+
+
+_renderers: Dict[str, Renderer] = {}
+_renderers_lock = threading.Lock()
+
+
+def get_renderer(name: Optional[str] = None) -> Renderer:
+    """Get a shared backend, so connections and workers are reused.
+
+    Args:
+        name: "mmdc", "workers" or "http", defaults to `Settings.RENDERER`.
+
+    Returns:
+        The backend, configured by the settings.
+
+    Raises:
+        ValueError: If the backend is not supported.
+
+    """
+    name = name or get_settings().RENDERER
+    if name not in RENDERERS:
+        raise ValueError(f"Renderer {name} is not supported.")
+    with _renderers_lock:
+        if name not in _renderers:
+            if name == "http":
+                _renderers[name] = HttpRenderer()
+            elif name == "workers":
+                _renderers[name] = WorkerPoolRenderer()
+            else:
+                _renderers[name] = RenderSupervisor()
+        return _renderers[name]
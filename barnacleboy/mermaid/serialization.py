@@ -0,0 +1,368 @@
+"""Compact binary serialization of flowcharts.
+
+A flowchart is encoded as flat tables: every string is stored once in a string
+table, and nodes, subgraphs and relationships are columns of integers that refer
+to strings and to each other by position. Every column uses the narrowest integer
+type that fits its values, and a column with a single repeated value, such as the
+arrows of most flowcharts, is stored as that value. The columns are buffers, so
+wrapped in `pickle.PickleBuffer` they can be sent out-of-band with pickle protocol
+5 without copying.
+
+Pickling a flowchart does not use the tables, so that the nodes of a flowchart
+pickled along with the flowchart stay the same objects.
+
+The layout of `to_bytes` is a header (magic, version, flags and the length of a
+JSON metadata block), the metadata block, and then every column prefixed
+with its length in bytes.
+"""
+
+import json
+import struct
+import sys
+from array import array
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Type, TypeVar, Union
+
+from barnacleboy import instrumentation
+from barnacleboy.mermaid.base import get_theme
+from barnacleboy.mermaid.flowchart import (
+    Flowchart,
+    Node,
+    NodeShape,
+    Relationship,
+    Subgraph,
+)
+
+MAGIC = b"BBFC"
+VERSION = 2
+HEADER = struct.Struct("<4sBBI")
+LENGTH = struct.Struct("<I")
+
+COLUMNS = (
+    "string_offsets",
+    "node_name",
+    "node_id",
+    "node_shape",
+    "node_link",
+    "node_style_offsets",
+    "node_style",
+    "node_class",
+    "subgraph_name",
+    "subgraph_id",
+    "subgraph_direction",
+    "subgraph_member_offsets",
+    "subgraph_members",
+    "relationship_source",
+    "relationship_target",
+    "relationship_style",
+    "relationship_input",
+    "relationship_output",
+    "relationship_label",
+)
+
+TYPECODES = ("b", "h", "i", "q")
+# Strings that are interned first, so columns of them fit in single bytes.
+COMMON_STRINGS = ("", "SOLID", "DOTTED", "THICK", "<", ">", "o", "x", "TB", "LR")
+
+SHAPES = list(NodeShape)
+SHAPE_INDEX = {shape: index for index, shape in enumerate(SHAPES)}
+
+Buffer = Union[bytes, bytearray, memoryview, Any]
+F = TypeVar("F", bound=Flowchart)
+
+
+class _StringTable:
+    """Assigns an index to every distinct string."""
+
+    def __init__(self) -> None:
+        self.index: Dict[str, int] = {}
+        self.strings: List[str] = []
+        for string in COMMON_STRINGS:
+            self(string)
+
+    def __call__(self, string: Optional[str]) -> int:
+        if string is None:
+            return -1
+        index = self.index.get(string)
+        if index is None:
+            index = self.index[string] = len(self.strings)
+            self.strings.append(string)
+        return index
+
+    def offsets(self) -> array:
+        offsets = array("i", [0])
+        position = 0
+        for string in self.strings:
+            position += len(string)
+            offsets.append(position)
+        return offsets
+
+
+def to_buffers(flowchart: Flowchart) -> Tuple[bytes, List[Buffer]]:
+    """Encode a flowchart as metadata and flat columns.
+
+    Args:
+        flowchart: The flowchart to encode.
+
+    Returns:
+        The JSON metadata and the buffers: the UTF-8 string blob followed by the
+        integer columns in the order of `COLUMNS`.
+
+    Raises:
+        ValueError: If a subgraph or relationship refers to an entity that is not
+            in the flowchart.
+
+    """
+    with instrumentation.span("serialize.encode", nodes=len(flowchart.nodes)):
+        strings = _StringTable()
+        columns = {name: array("i") for name in COLUMNS}
+        refs: Dict[Union[Node, Subgraph], int] = {}
+
+        for node in flowchart.nodes:
+            refs[node] = len(refs)
+        for subgraph in flowchart.subgraphs:
+            refs[subgraph] = len(refs)
+
+        def ref(entity: Union[Node, Subgraph]) -> int:
+            try:
+                return refs[entity]
+            except KeyError:
+                raise ValueError(
+                    f"Entity {entity.name} is not in the flowchart."
+                ) from None
+
+        nodes = flowchart.nodes
+        columns["node_name"] = array("i", [strings(node.name) for node in nodes])
+        columns["node_id"] = array("i", [strings(node._internal_id) for node in nodes])
+        columns["node_shape"] = array("i", [SHAPE_INDEX[node.shape] for node in nodes])
+        columns["node_link"] = array("i", [strings(node.link) for node in nodes])
+        columns["node_class"] = array("i", [strings(node.class_name) for node in nodes])
+        columns["node_style_offsets"].append(0)
+        for node in nodes:
+            if node.style:
+                for key, value in node.style.items():
+                    columns["node_style"].extend((strings(key), strings(value)))
+            columns["node_style_offsets"].append(len(columns["node_style"]))
+
+        columns["subgraph_member_offsets"].append(0)
+        for subgraph in flowchart.subgraphs:
+            columns["subgraph_name"].append(strings(subgraph.name))
+            columns["subgraph_id"].append(strings(subgraph._internal_id))
+            columns["subgraph_direction"].append(strings(subgraph.direction))
+            columns["subgraph_members"].extend(ref(e) for e in subgraph.entities)
+            columns["subgraph_member_offsets"].append(len(columns["subgraph_members"]))
+
+        relationships = flowchart.relationships
+        for column, values in (
+            ("relationship_source", [ref(r.entities[0]) for r in relationships]),
+            ("relationship_target", [ref(r.entities[1]) for r in relationships]),
+            ("relationship_style", [strings(r.style) for r in relationships]),
+            ("relationship_input", [strings(r.input_arrow) for r in relationships]),
+            ("relationship_output", [strings(r.output_arrow) for r in relationships]),
+            ("relationship_label", [strings(r.label) for r in relationships]),
+        ):
+            columns[column] = array("i", values)
+
+        columns["string_offsets"] = strings.offsets()
+        meta: Dict[str, Any] = {
+            "orientation": flowchart.orientation,
+            "title": flowchart.title,
+            "theme": flowchart.theme,
+            "theme_variables": flowchart.theme_variables.dict(exclude_none=True),
+            "config": flowchart.config,
+            "class_defs": flowchart.class_defs,
+            "compact": flowchart.compact,
+            "compress_edges": flowchart.compress_edges,
+            "canonical": flowchart.canonical,
+            "byteorder": sys.byteorder,
+        }
+        blob = "".join(strings.strings).encode("utf-8")
+
+        buffers: List[Buffer] = [blob]
+        layout = []
+        for name in COLUMNS:
+            packed = _pack(columns[name])
+            layout.append((packed.typecode, len(columns[name])))
+            buffers.append(packed)
+        meta["columns"] = layout
+
+    return json.dumps(meta).encode("utf-8"), buffers
+
+
+def _pack(column: array) -> array:
+    """Narrow a column to the smallest integer type, or one value if constant."""
+    if not column:
+        return array("b")
+    low, high = min(column), max(column)
+    if low == high:
+        column = array("i", [low])
+    for typecode in TYPECODES:
+        bits = array(typecode).itemsize * 8
+        if -(2 ** (bits - 1)) <= low and high < 2 ** (bits - 1):
+            return array(typecode, column)
+    raise ValueError("Flowchart is too large to encode.")
+
+
+def from_buffers(
+    meta: Buffer, *buffers: Buffer, cls: Type[F] = Flowchart  # type: ignore
+) -> F:
+    """Decode a flowchart from the output of `to_buffers`.
+
+    Args:
+        meta: The JSON metadata.
+        *buffers: The string blob and the integer columns.
+        cls: The flowchart class to create.
+
+    Returns:
+        The flowchart. Internal IDs are preserved.
+
+    """
+    with instrumentation.span("serialize.decode"):
+        info = json.loads(bytes(meta))
+        if len(buffers) != len(COLUMNS) + 1:
+            raise ValueError("Invalid number of flowchart buffers.")
+        text = bytes(memoryview(buffers[0])).decode("utf-8")
+        columns: Dict[str, Sequence[int]] = {}
+        for column_name, (typecode, length), buffer in zip(
+            COLUMNS, info["columns"], buffers[1:]
+        ):
+            column = array(typecode)
+            column.frombytes(memoryview(buffer).cast("B"))
+            if info["byteorder"] != sys.byteorder:
+                column.byteswap()
+            if len(column) != length:
+                column *= length
+            columns[column_name] = column
+
+        offsets = columns["string_offsets"]
+        strings = [text[start:end] for start, end in zip(offsets, offsets[1:])]
+
+        def string(index: int) -> Optional[str]:
+            return None if index < 0 else strings[index]
+
+        nodes = []
+        style_offsets = columns["node_style_offsets"]
+        style = columns["node_style"]
+        for index, (name, node_id, shape, link, class_name) in enumerate(
+            zip(
+                columns["node_name"],
+                columns["node_id"],
+                columns["node_shape"],
+                columns["node_link"],
+                columns["node_class"],
+            )
+        ):
+            node = Node(strings[name], SHAPES[shape], string(link))
+            node.class_name = string(class_name)
+            node._internal_id = strings[node_id]
+            start, end = style_offsets[index], style_offsets[index + 1]
+            if start != end:
+                node.style = {
+                    strings[style[i]]: strings[style[i + 1]]
+                    for i in range(start, end, 2)
+                }
+            nodes.append(node)
+
+        subgraphs = []
+        for name, subgraph_id, direction in zip(
+            columns["subgraph_name"],
+            columns["subgraph_id"],
+            columns["subgraph_direction"],
+        ):
+            subgraph = Subgraph(strings[name], [])
+            subgraph._internal_id = strings[subgraph_id]
+            subgraph.direction = strings[direction]
+            subgraphs.append(subgraph)
+
+        entities: List[Union[Node, Subgraph]] = [*nodes, *subgraphs]
+        member_offsets = columns["subgraph_member_offsets"]
+        members = columns["subgraph_members"]
+        for index, subgraph in enumerate(subgraphs):
+            subgraph.entities = [
+                entities[ref]
+                for ref in members[member_offsets[index] : member_offsets[index + 1]]
+            ]
+
+        relationships = [
+            Relationship(
+                [entities[source], entities[target]],
+                style=strings[style_index],
+                input_arrow=string(input_arrow),
+                output_arrow=string(output_arrow),
+                label=string(label),
+            )
+            for source, target, style_index, input_arrow, output_arrow, label in zip(
+                columns["relationship_source"],
+                columns["relationship_target"],
+                columns["relationship_style"],
+                columns["relationship_input"],
+                columns["relationship_output"],
+                columns["relationship_label"],
+            )
+        ]
+
+        flowchart = cls(
+            orientation=info["orientation"],
+            title=info["title"],
+            theme=get_theme(info["theme"], **info["theme_variables"]),
+            compact=info.get("compact", False),
+            compress_edges=info.get("compress_edges", False),
+            canonical=info.get("canonical", False),
+        )
+        flowchart.config = info["config"]
+        flowchart.class_defs = info["class_defs"]
+        flowchart.nodes = nodes
+        flowchart.subgraphs = subgraphs
+        flowchart.relationships = relationships
+        flowchart._reindex()
+    return flowchart
+
+
+def to_bytes(flowchart: Flowchart) -> bytes:
+    """Encode a flowchart as bytes.
+
+    Args:
+        flowchart: The flowchart to encode.
+
+    Returns:
+        The encoded flowchart.
+
+    """
+    meta, buffers = to_buffers(flowchart)
+    parts: List[Buffer] = [HEADER.pack(MAGIC, VERSION, 0, len(meta)), meta]
+    for buffer in buffers:
+        data = memoryview(buffer).cast("B")
+        parts += [LENGTH.pack(len(data)), data]
+    return b"".join(parts)
+
+
+def from_bytes(data: Buffer, cls: Type[F] = Flowchart) -> F:  # type: ignore
+    """Decode a flowchart encoded with `to_bytes`.
+
+    Args:
+        data: The encoded flowchart.
+        cls: The flowchart class to create.
+
+    Returns:
+        The flowchart.
+
+    Raises:
+        ValueError: If the data is not an encoded flowchart.
+
+    """
+    view = memoryview(data).cast("B")
+    if len(view) < HEADER.size:
+        raise ValueError("Data is too short to be an encoded flowchart.")
+    magic, version, _, meta_length = HEADER.unpack_from(view)
+    if magic != MAGIC:
+        raise ValueError("Data is not an encoded flowchart.")
+    if version != VERSION:
+        raise ValueError(f"Unsupported flowchart encoding version {version}.")
+    position = HEADER.size + meta_length
+    meta = view[HEADER.size : position]
+    buffers = []
+    for _ in range(len(COLUMNS) + 1):
+        (length,) = LENGTH.unpack_from(view, position)
+        position += LENGTH.size
+        buffers.append(view[position : position + length])
+        position += length
+    return from_buffers(meta, *buffers, cls=cls)
@@ -0,0 +1,370 @@
+"""Split flowcharts that are too large to render into linked pages.
+
+A flowchart is partitioned into units: top-level nodes and top-level subgraphs
+together with everything nested in them. Units are grouped into shards, and every
+relationship between two shards is replaced by a relationship to a stub node on
+both sides that links to the other page.
+"""
+
+import dataclasses
+import html
+import math
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import (
+    Callable,
+    DefaultDict,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+from barnacleboy import instrumentation
+from barnacleboy.mermaid.base import TEMPLATE_DIR
+from barnacleboy.mermaid.flowchart import (
+    Flowchart,
+    Node,
+    NodeShape,
+    Relationship,
+    Subgraph,
+    quote_label,
+)
+
+STRATEGIES = ("components", "subgraphs", "edge_cut")
+
+Entity = Union[Node, Subgraph]
+
+
+@dataclasses.dataclass
+class Shard:
+    """A page of a sharded flowchart.
+
+    Args:
+        index: The position of the shard.
+        flowchart: The flowchart of the shard, including stub nodes.
+        stubs: The stub nodes of the shard and the shard they link to.
+
+    """
+
+    index: int
+    flowchart: Flowchart
+    stubs: Dict[Node, int] = dataclasses.field(default_factory=dict)
+
+    def filename(self, suffix: str = ".html") -> str:
+        """Get the filename of the shard."""
+        return f"shard_{self.index}{suffix}"
+
+    def describe(self) -> str:
+        """Get a short description of the shard for the index."""
+        names = [subgraph.name for subgraph in self.flowchart.subgraphs]
+        names += [node.name for node in self.flowchart.nodes if node not in self.stubs]
+        n_nodes = len(self.flowchart.nodes) - len(self.stubs)
+        description = ", ".join(names[:3]) + (", ..." if len(names) > 3 else "")
+        return f"{description} ({n_nodes} nodes)"
+
+
+class ShardedFlowchart:
+    """The shards of a flowchart."""
+
+    def __init__(self, shards: List[Shard], title: Optional[str] = None) -> None:
+        """Initialize a sharded flowchart.
+
+        Args:
+            shards: The shards.
+            title: The title of the index page.
+
+        """
+        self.shards = shards
+        self.title = title or "Flowchart"
+
+    def __len__(self) -> int:
+        return len(self.shards)
+
+    def __iter__(self) -> Iterator[Shard]:
+        return iter(self.shards)
+
+    def __getitem__(self, index: int) -> Shard:
+        return self.shards[index]
+
+    def save(
+        self,
+        directory: Union[str, Path],
+        suffix: str = ".html",
+        max_workers: Optional[int] = None,
+    ) -> Path:
+        """Save all shards in parallel, together with an index page.
+
+        Args:
+            directory: The directory to save the shards to.
+            suffix: The file type of the shards, ".html" or any type supported by
+                mermaid-cli.
+            max_workers: The maximum number of shards to save at the same time.
+
+        Returns:
+            The path to the index page.
+
+        """
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+
+        def save_shard(shard: Shard) -> None:
+            for stub, target in shard.stubs.items():
+                stub.link = self.shards[target].filename(suffix)
+            filename = directory / shard.filename(suffix)
+            if suffix == ".html":
+                shard.flowchart.save_html(filename, template="mermaid_shard.html")
+            else:
+                shard.flowchart.save(filename)
+
+        with instrumentation.span("shard.save", shards=len(self.shards)):
+            with ThreadPoolExecutor(max_workers) as executor:
+                list(executor.map(save_shard, self.shards))
+
+        with open(TEMPLATE_DIR / "shard_index.html", "r") as file:
+            index = file.read()
+        items = "\n".join(
+            f'<li><a href="{shard.filename(suffix)}">Page {shard.index + 1}</a>: '
+            f"{html.escape(shard.describe())}</li>"
+            for shard in self.shards
+        )
+        index = index.replace("{{TITLE}}", html.escape(self.title))
+        index = index.replace("{{SHARDS}}", items)
+        index_file = directory / "index.html"
+        with open(index_file, "w") as file:
+            file.write(index)
+        return index_file
+
+
+class _Units:
+    """The top-level entities of a flowchart and the connections between them."""
+
+    def __init__(self, flowchart: Flowchart) -> None:
+        self.flowchart = flowchart
+        self.roots: Dict[Entity, Entity] = {}
+        self.units: List[Entity] = [
+            node for node in flowchart.nodes if flowchart.parent(node) is None
+        ]
+        self.units += [
+            subgraph
+            for subgraph in flowchart.subgraphs
+            if flowchart.parent(subgraph) is None
+        ]
+        self.n_nodes: DefaultDict[Entity, int] = defaultdict(int)
+        self.n_chars: DefaultDict[Entity, int] = defaultdict(int)
+        self.neighbors: DefaultDict[Entity, List[Entity]] = defaultdict(list)
+
+        for node in flowchart.nodes:
+            root = self.root(node)
+            self.n_nodes[root] += 1
+            self.n_chars[root] += len(str(node)) + 5
+        for subgraph in flowchart.subgraphs:
+            self.n_chars[self.root(subgraph)] += len(subgraph.name) + 40
+        for relationship in flowchart.relationships:
+            source, target = (self.root(entity) for entity in relationship.entities)
+            self.n_chars[source] += len(str(relationship)) + 5
+            if source is not target:
+                self.neighbors[source].append(target)
+                self.neighbors[target].append(source)
+
+    def root(self, entity: Entity) -> Entity:
+        """Get the top-level entity containing an entity."""
+        path = []
+        while entity not in self.roots:
+            parent = self.flowchart.parent(entity)
+            if parent is None:
+                self.roots[entity] = entity
+                break
+            path.append(entity)
+            entity = parent
+        root = self.roots[entity]
+        for member in path:
+            self.roots[member] = root
+        return root
+
+    def components(self, units: Sequence[Entity]) -> List[List[Entity]]:
+        """Get the connected components of units, in breadth-first order."""
+        allowed = set(units)
+        seen = set()
+        components = []
+        for start in units:
+            if start in seen:
+                continue
+            seen.add(start)
+            component = []
+            queue = deque([start])
+            while queue:
+                unit = queue.popleft()
+                component.append(unit)
+                for neighbor in self.neighbors[unit]:
+                    if neighbor in allowed and neighbor not in seen:
+                        seen.add(neighbor)
+                        queue.append(neighbor)
+            components.append(component)
+        return components
+
+
+def _balanced_cut(
+    units: List[Entity], weight: Callable[[Entity], int], limit: int
+) -> List[List[Entity]]:
+    """Cut units in breadth-first order into balanced consecutive groups.
+
+    Groups never exceed the limit, unless they consist of a single unit that does.
+    """
+    total = sum(weight(unit) for unit in units)
+    n_groups = max(math.ceil(total / limit), 1)
+    target = total / n_groups
+    groups: List[List[Entity]] = [[]]
+    accumulated = group_load = 0
+    for unit in units:
+        unit_weight = weight(unit)
+        if groups[-1] and (
+            accumulated + unit_weight > target * len(groups)
+            or group_load + unit_weight > limit
+        ):
+            groups.append([])
+            group_load = 0
+        groups[-1].append(unit)
+        accumulated += unit_weight
+        group_load += unit_weight
+    return groups
+
+
+def _pack(
+    groups: List[List[Entity]], weight: Callable[[Entity], int], limit: int
+) -> List[List[Entity]]:
+    """Combine small groups, largest first, as long as they fit in the limit."""
+    packed: List[List[Entity]] = []
+    loads: List[int] = []
+    for group in sorted(groups, key=lambda g: -sum(weight(unit) for unit in g)):
+        load = sum(weight(unit) for unit in group)
+        if packed and loads[-1] + load <= limit:
+            packed[-1] += group
+            loads[-1] += load
+        else:
+            packed.append(list(group))
+            loads.append(load)
+    return packed
+
+
+def _partition(units: _Units, max_nodes: int, strategy: str) -> List[List[Entity]]:
+    """Group units into shards of at most max_nodes nodes where possible."""
+
+    def n_nodes(unit: Entity) -> int:
+        return max(units.n_nodes[unit], 1)
+
+    def split(component: List[Entity]) -> List[List[Entity]]:
+        if sum(n_nodes(unit) for unit in component) <= max_nodes:
+            return [component]
+        return _balanced_cut(component, n_nodes, max_nodes)
+
+    if strategy == "edge_cut":
+        ordered = [unit for c in units.components(units.units) for unit in c]
+        return _balanced_cut(ordered, n_nodes, max_nodes)
+
+    if strategy == "subgraphs":
+        subgraphs: List[List[Entity]] = [
+            [unit] for unit in units.units if isinstance(unit, Subgraph)
+        ]
+        nodes = [unit for unit in units.units if isinstance(unit, Node)]
+        groups = [g for c in units.components(nodes) for g in split(c)]
+        return subgraphs + _pack(groups, n_nodes, max_nodes)
+
+    groups = [g for c in units.components(units.units) for g in split(c)]
+    return _pack(groups, n_nodes, max_nodes)
+
+
+def shard(
+    flowchart: Flowchart,
+    max_nodes: int = 500,
+    max_chars: Optional[int] = None,
+    strategy: str = "components",
+) -> ShardedFlowchart:
+    """Split a flowchart into linked shards.
+
+    Args:
+        flowchart: The flowchart to split.
+        max_nodes: The maximum number of nodes per shard.
+        max_chars: The maximum size of the rendered text of a shard, e.g. mermaid's
+            maxTextSize. This is an estimate; stub nodes are not included.
+        strategy: How to partition the flowchart. "components" keeps connected
+            components together, "subgraphs" gives each top-level subgraph its own
+            shard and "edge_cut" cuts the flowchart into balanced groups of
+            neighboring nodes. Top-level subgraphs are never split.
+
+    Returns:
+        The shards.
+
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Strategy {strategy} is not supported.")
+
+    with instrumentation.span("shard.partition", strategy=strategy):
+        units = _Units(flowchart)
+        groups = _partition(units, max_nodes, strategy)
+        if max_chars is not None:
+
+            def n_chars(unit: Entity) -> int:
+                return units.n_chars[unit]
+
+            groups = [
+                subgroup
+                for group in groups
+                for subgroup in (
+                    _balanced_cut(group, n_chars, max_chars)
+                    if sum(n_chars(unit) for unit in group) > max_chars
+                    else [group]
+                )
+            ]
+
+    with instrumentation.span("shard.build", shards=len(groups)):
+        shard_of = {unit: idx for idx, group in enumerate(groups) for unit in group}
+        nodes: List[List[Node]] = [[] for _ in groups]
+        subgraphs: List[List[Subgraph]] = [[] for _ in groups]
+        relationships: List[List[Relationship]] = [[] for _ in groups]
+        stubs: List[Dict[Node, int]] = [{} for _ in groups]
+        stub_nodes: Dict[Tuple[int, Entity], Node] = {}
+
+        def stub(index: int, entity: Entity, target: int) -> Node:
+            key = (index, entity)
+            if key not in stub_nodes:
+                stub_nodes[key] = Node(
+                    quote_label(f"{entity.name} (page {target + 1})"),
+                    NodeShape.ASYMMETRIC,
+                )
+                stubs[index][stub_nodes[key]] = target
+                nodes[index].append(stub_nodes[key])
+            return stub_nodes[key]
+
+        for node in flowchart.nodes:
+            nodes[shard_of[units.root(node)]].append(node)
+        for subgraph in flowchart.subgraphs:
+            subgraphs[shard_of[units.root(subgraph)]].append(subgraph)
+        for relationship in flowchart.relationships:
+            source, target = relationship.entities
+            source_shard = shard_of[units.root(source)]
+            target_shard = shard_of[units.root(target)]
+            if source_shard == target_shard:
+                relationships[source_shard].append(relationship)
+                continue
+            relationships[source_shard].append(
+                relationship.rewire(source, stub(source_shard, target, target_shard))
+            )
+            relationships[target_shard].append(
+                relationship.rewire(stub(target_shard, source, source_shard), target)
+            )
+
+        shards = []
+        for idx in range(len(groups)):
+            shard_flowchart = flowchart.derive(
+                nodes[idx], relationships[idx], subgraphs[idx]
+            )
+            if flowchart.title:
+                shard_flowchart.title = f"{flowchart.title} ({idx + 1}/{len(groups)})"
+            shards.append(Shard(idx, shard_flowchart, stubs[idx]))
+
+    return ShardedFlowchart(shards, flowchart.title)
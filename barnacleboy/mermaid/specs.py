@@ -0,0 +1,713 @@
+"""Build diagrams from JSON or newline delimited JSON specs.
+
+A spec consists of a header with the diagram type and its options, followed by a
+stream of elements. As NDJSON, the first line is the header and every following
+line is an element:
+
+    {"type": "flowchart", "orientation": "LR"}
+    {"kind": "node", "id": "vader", "name": "Darth Vader"}
+    {"kind": "node", "id": "luke", "name": "Luke Skywalker"}
+    {"kind": "edge", "source": "vader", "target": "luke", "label": "Father of"}
+
+As JSON, the header fields and an "elements" array are the keys of one object;
+the header fields must come before the elements. Both formats are read
+incrementally, so memory use does not depend on the size of the file beyond
+the diagram itself. Elements are validated as they are read, with plain type
+checks rather than pydantic models, and may only refer to elements before them.
+"""
+
+import json
+from pathlib import Path
+from typing import (
+    IO,
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Type,
+    Union,
+    cast,
+)
+
+from barnacleboy import instrumentation
+from barnacleboy.mermaid.base import MermaidBase, get_theme
+from barnacleboy.mermaid.er_diagram import (
+    Entity,
+    EntityRelationDiagram,
+    Field,
+    Relationship as ErRelationship,
+    RelationshipType,
+)
+from barnacleboy.mermaid.flowchart import (
+    Flowchart,
+    Node,
+    NodeShape,
+    Orientation,
+    Relationship,
+    RelationshipStyles,
+    Subgraph,
+)
+from barnacleboy.mermaid.gitgraph import VALID_COMMIT_TYPES, GitGraph
+from barnacleboy.mermaid.piechart import Piechart
+from barnacleboy.mermaid.user_journey import Section, Task, UserJourney
+
+CHUNK_SIZE = 1 << 16
+# Errors this close to the end of the buffer may be caused by a value that was cut
+# off, such as "-Infinity" or a "\\uXXXX" escape.
+_TRUNCATED = len("-Infinity")
+
+STR = (str,)
+OPTIONAL_STR = (str, type(None))
+INT = (int,)
+NUMBER = (int, float)
+BOOL = (bool,)
+LIST = (list,)
+DICT = (dict,)
+
+# A schema maps every allowed field to its allowed types and whether it is required.
+Schema = Dict[str, Tuple[Tuple[type, ...], bool]]
+
+HEADER: Schema = {
+    "type": (STR, True),
+    "theme": (STR, False),
+    "theme_variables": (DICT, False),
+    "config": (DICT, False),
+}
+
+
+class SpecError(ValueError):
+    """An invalid spec, with the location of the problem."""
+
+    def __init__(
+        self, message: str, line: Optional[int] = None, field: Optional[str] = None
+    ) -> None:
+        """Initialize a spec error.
+
+        Args:
+            message: A description of the problem.
+            line: The line of the spec the problem is on.
+            field: The field of the element with the problem.
+
+        """
+        location = []
+        if line is not None:
+            location.append(f"line {line}")
+        if field is not None:
+            location.append(f"field '{field}'")
+        super().__init__(f"{', '.join(location)}: {message}" if location else message)
+        self.message = message
+        self.line = line
+        self.field = field
+
+
+def _check(element: Any, schema: Schema, line: int) -> Dict[str, Any]:
+    """Validate the fields of an element against a schema."""
+    if not isinstance(element, dict):
+        raise SpecError("Expected a JSON object.", line)
+    for key, value in element.items():
+        if key not in schema:
+            raise SpecError("Unknown field.", line, key)
+        types = schema[key][0]
+        if not isinstance(value, types) or (
+            isinstance(value, bool) and bool not in types
+        ):
+            names = " or ".join(t.__name__ for t in types)
+            raise SpecError(f"Expected {names}, got {type(value).__name__}.", line, key)
+    for key, (_, required) in schema.items():
+        if required and key not in element:
+            raise SpecError("Missing required field.", line, key)
+    return element
+
+
+def _choice(element: Dict[str, Any], key: str, choices: Any, line: int) -> Any:
+    """Check that a field is one of a set of names."""
+    value = element[key]
+    if value not in choices:
+        raise SpecError(f"Invalid value {value!r}.", line, key)
+    return value
+
+
+class _Builder:
+    """Collects validated elements of one diagram type."""
+
+    header: Schema = {}
+    elements: Dict[str, Schema] = {}
+
+    def __init__(self, options: Dict[str, Any], line: int) -> None:
+        self.options = options
+        self.line = line
+
+    def add(self, kind: str, element: Dict[str, Any], line: int) -> None:
+        getattr(self, f"add_{kind}")(element, line)
+
+    def build(self, **kwargs: Any) -> MermaidBase:
+        raise NotImplementedError
+
+
+class _FlowchartBuilder(_Builder):
+    header: Schema = {"orientation": (STR, False), "title": (OPTIONAL_STR, False)}
+    elements: Dict[str, Schema] = {
+        "node": {
+            "kind": (STR, True),
+            "id": (STR, True),
+            "name": (STR, False),
+            "shape": (STR, False),
+            "link": (OPTIONAL_STR, False),
+            "style": (DICT, False),
+        },
+        "edge": {
+            "kind": (STR, True),
+            "source": (STR, True),
+            "target": (STR, True),
+            "style": (STR, False),
+            "input_arrow": (OPTIONAL_STR, False),
+            "output_arrow": (OPTIONAL_STR, False),
+            "label": (OPTIONAL_STR, False),
+        },
+        "subgraph": {
+            "kind": (STR, True),
+            "id": (STR, True),
+            "name": (STR, False),
+            "members": (LIST, True),
+            "direction": (STR, False),
+        },
+    }
+    orientations = {orientation.value for orientation in Orientation}
+    arrows = {"input_arrow": {"<", "o", "x"}, "output_arrow": {">", "o", "x"}}
+
+    def __init__(self, options: Dict[str, Any], line: int) -> None:
+        super().__init__(options, line)
+        if "orientation" in options:
+            _choice(options, "orientation", self.orientations, line)
+        self.entities: Dict[str, Union[Node, Subgraph]] = {}
+        self.nodes: List[Node] = []
+        self.subgraphs: List[Subgraph] = []
+        self.relationships: List[Relationship] = []
+        self.contained: Set[str] = set()
+
+    def _new_id(self, element: Dict[str, Any], line: int) -> str:
+        if element["id"] in self.entities:
+            raise SpecError(f"Duplicate id {element['id']!r}.", line, "id")
+        return element["id"]
+
+    def _entity(self, element: Dict[str, Any], key: str, line: int) -> Any:
+        try:
+            return self.entities[element[key]]
+        except KeyError:
+            raise SpecError(f"Unknown id {element[key]!r}.", line, key) from None
+
+    def add_node(self, element: Dict[str, Any], line: int) -> None:
+        node_id = self._new_id(element, line)
+        shape = NodeShape.ROUNDED
+        if "shape" in element:
+            shape = NodeShape[_choice(element, "shape", NodeShape.__members__, line)]
+        style = element.get("style")
+        if style is not None and not all(
+            isinstance(value, str) for value in style.values()
+        ):
+            raise SpecError("Style values must be strings.", line, "style")
+        node = Node(element.get("name", node_id), shape, element.get("link"), style)
+        self.entities[node_id] = node
+        self.nodes.append(node)
+
+    def add_edge(self, element: Dict[str, Any], line: int) -> None:
+        source = self._entity(element, "source", line)
+        target = self._entity(element, "target", line)
+        if "style" in element:
+            _choice(element, "style", RelationshipStyles.__members__, line)
+        for key, arrows in self.arrows.items():
+            if element.get(key) is not None:
+                _choice(element, key, arrows, line)
+        self.relationships.append(
+            Relationship(
+                [source, target],
+                style=element.get("style", "SOLID"),
+                input_arrow=element.get("input_arrow"),
+                output_arrow=element.get("output_arrow"),
+                label=element.get("label"),
+            )
+        )
+
+    def add_subgraph(self, element: Dict[str, Any], line: int) -> None:
+        subgraph_id = self._new_id(element, line)
+        members = []
+        for member in element["members"]:
+            if not isinstance(member, str) or member not in self.entities:
+                raise SpecError(f"Unknown id {member!r}.", line, "members")
+            if member in self.contained:
+                raise SpecError(
+                    f"{member!r} is already in another subgraph.", line, "members"
+                )
+            self.contained.add(member)
+            members.append(self.entities[member])
+        subgraph = Subgraph(element.get("name", subgraph_id), members)
+        if "direction" in element:
+            subgraph.direction = _choice(element, "direction", self.orientations, line)
+        self.entities[subgraph_id] = subgraph
+        self.subgraphs.append(subgraph)
+
+    def build(self, **kwargs: Any) -> MermaidBase:
+        return Flowchart(
+            nodes=self.nodes,
+            relationships=self.relationships,
+            subgraphs=self.subgraphs,
+            orientation=self.options.get("orientation", Orientation.TB.value),
+            title=self.options.get("title"),
+            **kwargs,
+        )
+
+
+class _ErDiagramBuilder(_Builder):
+    attribute: Schema = {
+        "type": (STR, True),
+        "name": (STR, True),
+        "description": (OPTIONAL_STR, False),
+        "primary_key": (BOOL, False),
+        "foreign_key": (BOOL, False),
+    }
+    elements: Dict[str, Schema] = {
+        "entity": {
+            "kind": (STR, True),
+            "name": (STR, True),
+            "attributes": (LIST, False),
+        },
+        "relationship": {
+            "kind": (STR, True),
+            "source": (STR, True),
+            "target": (STR, True),
+            "source_cardinality": (STR, True),
+            "target_cardinality": (STR, True),
+            "label": (STR, True),
+        },
+    }
+
+    def __init__(self, options: Dict[str, Any], line: int) -> None:
+        super().__init__(options, line)
+        self.entities: Dict[str, Entity] = {}
+        self.relationships: List[ErRelationship] = []
+
+    def add_entity(self, element: Dict[str, Any], line: int) -> None:
+        name = element["name"]
+        if name in self.entities:
+            raise SpecError(f"Duplicate entity {name!r}.", line, "name")
+        fields = []
+        for attribute in element.get("attributes", []):
+            _check(attribute, self.attribute, line)
+            try:
+                fields.append(
+                    Field(
+                        attribute["type"],
+                        attribute["name"],
+                        attribute.get("description"),
+                        attribute.get("primary_key", False),
+                        attribute.get("foreign_key", False),
+                    )
+                )
+            except ValueError as error:
+                raise SpecError(str(error), line, "attributes") from None
+        self.entities[name] = Entity(name, fields or None)
+
+    def add_relationship(self, element: Dict[str, Any], line: int) -> None:
+        entities = []
+        for key in ("source", "target"):
+            if element[key] not in self.entities:
+                raise SpecError(f"Unknown entity {element[key]!r}.", line, key)
+            entities.append(self.entities[element[key]])
+        cardinalities = [
+            RelationshipType[_choice(element, key, RelationshipType.__members__, line)]
+            for key in ("source_cardinality", "target_cardinality")
+        ]
+        self.relationships.append(
+            ErRelationship(
+                entities[0],
+                entities[1],
+                cardinalities[0],
+                cardinalities[1],
+                element["label"],
+            )
+        )
+
+    def build(self, **kwargs: Any) -> MermaidBase:
+        return EntityRelationDiagram(
+            list(self.entities.values()), self.relationships, **kwargs
+        )
+
+
+class _GitGraphBuilder(_Builder):
+    header: Schema = {
+        "show_branches": (BOOL, False),
+        "show_commit_label": (BOOL, False),
+        "rotate_commit_label": (BOOL, False),
+        "main_branch_name": (STR, False),
+        "main_branch_order": (INT, False),
+    }
+    commit: Schema = {
+        "kind": (STR, True),
+        "id": (OPTIONAL_STR, False),
+        "type": (OPTIONAL_STR, False),
+        "tag": (OPTIONAL_STR, False),
+    }
+    elements: Dict[str, Schema] = {
+        "commit": commit,
+        "branch": {"kind": (STR, True), "name": (STR, True)},
+        "checkout": {"kind": (STR, True), "branch": (STR, True)},
+        "merge": {**commit, "branch": (STR, True)},
+        "cherry_pick": {"kind": (STR, True), "id": (STR, True)},
+    }
+
+    def __init__(self, options: Dict[str, Any], line: int) -> None:
+        super().__init__(options, line)
+        self.git: Optional[GitGraph] = None
+
+    def add(self, kind: str, element: Dict[str, Any], line: int) -> None:
+        if self.git is None:
+            raise SpecError("The git graph has not been created.", line)
+        if element.get("type") is not None:
+            _choice(element, "type", VALID_COMMIT_TYPES, line)
+        try:
+            if kind == "commit":
+                self.git.commit(
+                    element.get("id"), element.get("type"), element.get("tag")
+                )
+            elif kind == "branch":
+                self.git.branch(element["name"])
+            elif kind == "checkout":
+                self.git.checkout(element["branch"])
+            elif kind == "merge":
+                self.git.merge(
+                    element["branch"],
+                    element.get("id"),
+                    element.get("type"),
+                    element.get("tag"),
+                )
+            else:
+                self.git.cherry_pick(element["id"])
+        except ValueError as error:
+            raise SpecError(str(error), line) from None
+
+    def start(self, **kwargs: Any) -> None:
+        options = {key: self.options[key] for key in self.header if key in self.options}
+        self.git = GitGraph(**options, **kwargs)
+
+    def build(self, **kwargs: Any) -> MermaidBase:
+        assert self.git is not None
+        return self.git
+
+
+class _PiechartBuilder(_Builder):
+    header: Schema = {"title": (STR, True)}
+    elements: Dict[str, Schema] = {
+        "slice": {"kind": (STR, True), "label": (STR, True), "value": (NUMBER, True)}
+    }
+
+    def __init__(self, options: Dict[str, Any], line: int) -> None:
+        super().__init__(options, line)
+        self.data: Dict[str, Any] = {}
+
+    def add_slice(self, element: Dict[str, Any], line: int) -> None:
+        if element["label"] in self.data:
+            raise SpecError(f"Duplicate label {element['label']!r}.", line, "label")
+        if element["value"] < 0:
+            raise SpecError("Values cannot be negative.", line, "value")
+        self.data[element["label"]] = element["value"]
+
+    def build(self, **kwargs: Any) -> MermaidBase:
+        return Piechart(self.options["title"], self.data, **kwargs)
+
+
+class _UserJourneyBuilder(_Builder):
+    header: Schema = {"title": (STR, True)}
+    elements: Dict[str, Schema] = {
+        "section": {"kind": (STR, True), "title": (STR, True)},
+        "task": {
+            "kind": (STR, True),
+            "description": (STR, True),
+            "rating": (INT, True),
+            "people": (LIST, False),
+        },
+    }
+
+    def __init__(self, options: Dict[str, Any], line: int) -> None:
+        super().__init__(options, line)
+        self.sections: List[Section] = []
+
+    def add_section(self, element: Dict[str, Any], line: int) -> None:
+        self.sections.append(Section(element["title"]))
+
+    def add_task(self, element: Dict[str, Any], line: int) -> None:
+        if not self.sections:
+            raise SpecError("A task must follow a section.", line)
+        people = element.get("people", [])
+        if not all(isinstance(person, str) for person in people):
+            raise SpecError("People must be strings.", line, "people")
+        if not 1 <= element["rating"] <= 5:
+            raise SpecError("Ratings must be between 1 and 5.", line, "rating")
+        self.sections[-1].tasks.append(
+            Task(element["description"], element["rating"], people)
+        )
+
+    def build(self, **kwargs: Any) -> MermaidBase:
+        return UserJourney(self.options["title"], self.sections, **kwargs)
+
+
+BUILDERS: Dict[str, Type[_Builder]] = {
+    "flowchart": _FlowchartBuilder,
+    "er_diagram": _ErDiagramBuilder,
+    "gitgraph": _GitGraphBuilder,
+    "piechart": _PiechartBuilder,
+    "user_journey": _UserJourneyBuilder,
+}
+
+
+def _iter_ndjson(lines: Iterable[Union[str, bytes]]) -> Iterator[Tuple[int, Any]]:
+    """Parse the non-empty lines of an NDJSON stream."""
+    for line_number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except ValueError as error:
+            raise SpecError(f"Invalid JSON: {error}", line_number) from None
+
+
+class _JsonStream:
+    """Reads the header fields and elements of a JSON spec incrementally."""
+
+    def __init__(self, file: IO[str]) -> None:
+        self.file = file
+        self.buffer = ""
+        self.position = 0
+        self.lines_before = 0
+        self.counted = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _count_lines(self) -> None:
+        """Count the newlines up to the current position that were not counted."""
+        self.lines_before += self.buffer.count("\n", self.counted, self.position)
+        self.counted = self.position
+
+    @property
+    def line(self) -> int:
+        """The line of the current position."""
+        self._count_lines()
+        return self.lines_before + 1
+
+    def _fill(self) -> bool:
+        """Read the next chunk, discarding the parsed part of the buffer.
+
+        At least as much is read as is left unparsed, so a value that spans many
+        chunks is copied and decoded a logarithmic number of times, not once per
+        chunk.
+        """
+        if self.eof:
+            return False
+        data = self.file.read(max(CHUNK_SIZE, len(self.buffer) - self.position))
+        if self.position:
+            self._count_lines()
+            self.buffer = self.buffer[self.position :] + data
+            self.position = self.counted = 0
+        else:
+            self.buffer += data
+        self.eof = not data
+        return not self.eof
+
+    def _skip_whitespace(self) -> None:
+        while True:
+            while (
+                self.position < len(self.buffer)
+                and self.buffer[self.position] in " \t\r\n"
+            ):
+                self.position += 1
+            if self.position < len(self.buffer) or not self._fill():
+                return
+
+    def _expect(self, characters: str) -> str:
+        self._skip_whitespace()
+        if self.position >= len(self.buffer) or self.buffer[self.position] not in (
+            characters
+        ):
+            raise SpecError(f"Expected one of {characters!r}.", self.line)
+        self.position += 1
+        return self.buffer[self.position - 1]
+
+    def _value(self) -> Tuple[int, Any]:
+        self._skip_whitespace()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.position)
+                # A value that ends the buffer may continue, e.g. a number.
+                if end < len(self.buffer) or self.eof:
+                    line = self.line
+                    self.position = end
+                    return line, value
+            except json.JSONDecodeError as error:
+                # A chunk may end inside a value, e.g. halfway through "null" or
+                # a string. Any other error is final, more input cannot fix it.
+                if self.eof or not (
+                    error.msg.startswith("Unterminated string")
+                    or len(self.buffer) - error.pos <= _TRUNCATED
+                ):
+                    raise SpecError(f"Invalid JSON: {error.msg}", self.line) from None
+            self._fill()
+
+    def __iter__(self) -> Iterator[Tuple[int, Any]]:
+        """Yield the header, then every element, with their line numbers."""
+        self._expect("{")
+        header: Dict[str, Any] = {}
+        header_line = self.line
+        if self._expect('"}') == "}":
+            yield header_line, header
+            return
+        self.position -= 1
+        elements_read = False
+        while True:
+            line, key = self._value()
+            if not isinstance(key, str):
+                raise SpecError("Expected a field name.", line)
+            if elements_read or (key == "elements" and "type" not in header):
+                raise SpecError("Header fields must precede the elements.", line)
+            self._expect(":")
+            if key != "elements":
+                header[key] = self._value()[1]
+            else:
+                elements_read = True
+                yield header_line, header
+                self._expect("[")
+                self._skip_whitespace()
+                if self.buffer[self.position : self.position + 1] == "]":
+                    self.position += 1
+                else:
+                    while True:
+                        yield self._value()
+                        if self._expect(",]") == "]":
+                            break
+            if self._expect(",}") == "}":
+                break
+        if not elements_read:
+            yield header_line, header
+
+
+def _build(records: Iterator[Tuple[int, Any]]) -> MermaidBase:
+    """Build a diagram from a header and element records."""
+    try:
+        line, options = next(records)
+    except StopIteration:
+        raise SpecError("The spec is empty.") from None
+
+    if not isinstance(options, dict) or "type" not in options:
+        raise SpecError("The spec must start with a header with a type.", line)
+    builder_class = BUILDERS.get(options["type"])
+    if builder_class is None:
+        raise SpecError(f"Unsupported diagram type {options['type']!r}.", line, "type")
+    _check(options, {**HEADER, **builder_class.header}, line)
+
+    try:
+        theme = get_theme(
+            options.get("theme", "base"), **options.get("theme_variables", {})
+        )
+    except ValueError as error:
+        raise SpecError(str(error), line, "theme_variables") from None
+    builder = builder_class(options, line)
+    if isinstance(builder, _GitGraphBuilder):
+        builder.start(theme=theme)
+
+    schemas = builder.elements
+    n_elements = 0
+    with instrumentation.span("spec.elements", type=options["type"]):
+        for line, element in records:
+            kind = element.get("kind") if isinstance(element, dict) else None
+            if kind not in schemas:
+                raise SpecError(f"Unknown element kind {kind!r}.", line, "kind")
+            builder.add(kind, _check(element, schemas[kind], line), line)
+            n_elements += 1
+    instrumentation.count("spec.elements", n_elements)
+
+    with instrumentation.span("spec.build"):
+        diagram = builder.build(theme=theme)
+    diagram.config = options.get("config", {})
+    return diagram
+
+
+def load(
+    source: Union[str, Path, IO[str]], format: Optional[str] = None
+) -> MermaidBase:
+    """Load a diagram from a JSON or NDJSON spec.
+
+    Args:
+        source: The path to the spec, or a text file object.
+        format: "json" or "ndjson". By default, files ending with ".ndjson" or
+            ".jsonl" are read as NDJSON and all other sources as JSON.
+
+    Returns:
+        The diagram.
+
+    Raises:
+        SpecError: If the spec is invalid, with the line and field of the problem.
+
+    """
+    if isinstance(source, (str, Path)):
+        path = Path(source)
+        if format is None:
+            format = "ndjson" if path.suffix in (".ndjson", ".jsonl") else "json"
+        with open(path, "r", encoding="utf-8") as file:
+            return load(file, format)
+
+    if format not in (None, "json", "ndjson"):
+        raise ValueError(f"Format {format} is not supported.")
+    with instrumentation.span("spec.load", format=format or "json"):
+        if format == "ndjson":
+            return _build(_iter_ndjson(source))
+        return _build(iter(_JsonStream(source)))
+
+
+def loads(text: str) -> MermaidBase:
+    """Load a diagram from a JSON spec in a string.
+
+    Args:
+        text: The JSON spec.
+
+    Returns:
+        The diagram.
+
+    """
+    return load_lines([text], format="json")
+
+
+def load_lines(
+    lines: Iterable[Union[str, bytes]], format: str = "ndjson"
+) -> MermaidBase:
+    """Load a diagram from lines of a spec, e.g. a socket or a pipe.
+
+    Args:
+        lines: The lines of the spec.
+        format: "json" or "ndjson".
+
+    Returns:
+        The diagram.
+
+    """
+    if format == "ndjson":
+        return _build(_iter_ndjson(lines))
+    return load(cast(IO[str], _LineReader(lines)), format)
+
+
+class _LineReader:
+    """A minimal text file object over an iterable of lines."""
+
+    def __init__(self, lines: Iterable[Union[str, bytes]]) -> None:
+        self.lines = iter(lines)
+        self.pending = ""
+
+    def read(self, size: int) -> str:
+        while len(self.pending) < size:
+            line = next(self.lines, None)
+            if line is None:
+                break
+            self.pending += line.decode("utf-8") if isinstance(line, bytes) else line
+        data, self.pending = self.pending[:size], self.pending[size:]
+        return data
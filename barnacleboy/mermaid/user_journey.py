@@ -1,27 +1,33 @@
-""" Mermaid diagrams for User Journeys. """
+"""Mermaid diagrams for User Journeys."""
+
 import dataclasses
 from typing import Any, Optional, List
 
+from barnacleboy import instrumentation
 from barnacleboy.mermaid.base import MermaidBase
-from barnacleboy.mermaid.utils import init_string
+from barnacleboy.mermaid.hashing import Hashed
 
 
 @dataclasses.dataclass
-class Task:
+class Task(Hashed):
     """A task in a user journey."""
 
     description: str
     rating: int
     people: List[str]
 
+    _hashed_fields = ("description", "rating", "people")
+
     def __str__(self) -> str:
         """Get a string representation of the object."""
         return f"{self.description}: {self.rating}: {', '.join(self.people)}"
 
 
-class Section:
+class Section(Hashed):
     """A section in a user journey."""
 
+    _hashed_fields = ("title", "tasks")
+
     def __init__(self, title: str, tasks: Optional[List[Task]] = None) -> None:
         """Initialize a section.
 
@@ -56,6 +62,8 @@ class Section:
 class UserJourney(MermaidBase):
     """A user journey model."""
 
+    _hashed_fields = MermaidBase._hashed_fields + ("title", "sections")
+
     def __init__(
         self, title: str, sections: Optional[List[Section]] = None, **kwargs: Any
     ) -> None:
@@ -69,7 +77,6 @@ class UserJourney(MermaidBase):
         super(UserJourney, self).__init__(**kwargs)
         self.title = title
         self.sections = sections if sections else []
-        self.config = {}  # type: ignore
 
     def add_section(self, title: str, tasks: Optional[List[Task]] = None) -> None:
         """Add a section to the user journey.
@@ -80,11 +87,13 @@ class UserJourney(MermaidBase):
         """
         self.sections.append(Section(title, tasks))
 
+    @instrumentation.traced("render.user_journey")
     def __str__(self) -> str:
         """Get a string representation of the object."""
-        output_string = init_string(self.base_config, self.config)
+        output_string = self.get_init_string()
         output_string += "journey\n"
         output_string += f"title {self.title}\n"
         for section in self.sections:
             output_string += str(section)
+        instrumentation.count("elements_rendered", len(self.sections))
         return output_string
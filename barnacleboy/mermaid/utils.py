@@ -1,8 +1,15 @@
 import itertools
+import json
 import math
-from string import ascii_uppercase
+from string import ascii_letters, ascii_uppercase, digits
 from typing import Generator, Union
 
+# Compact IDs never start with "o" or "x", which would be read as the arrow of a
+# preceding link, and never spell a keyword.
+COMPACT_FIRST_CHARACTERS = "".join(c for c in ascii_letters if c not in "ox")
+COMPACT_CHARACTERS = digits + ascii_letters
+RESERVED_IDS = {"end", "graph", "style", "class", "click", "subgraph", "direction"}
+
 
 def next_power(target: Union[int, float], base: Union[int, float] = 2) -> int:
     """Return the next power of base that is greater than or equal to target.
@@ -49,12 +56,42 @@ def generate_internal_ids(n_nodes: int) -> Generator[str, None, None]:
         yield "".join(characters)
 
 
-def init_string(base_config: dict, object_config: dict) -> str:
+def generate_compact_ids(n_nodes: int) -> Generator[str, None, None]:
+    """Generate short node ids using letters and digits, shortest first.
+
+    Args:
+        n_nodes: The number of entities to generate ids for.
+
+    Returns:
+        A generator of node ids.
+
+    Examples:
+        >>> list(generate_compact_ids(3))
+        ['a', 'b', 'c']
+        >>> list(generate_compact_ids(52))[-3:]
+        ['Z', 'a0', 'a1']
+
+    """
+    n_generated = 0
+    for length in itertools.count(1):
+        for first in COMPACT_FIRST_CHARACTERS:
+            for rest in itertools.product(COMPACT_CHARACTERS, repeat=length - 1):
+                if n_generated >= n_nodes:
+                    return
+                node_id = first + "".join(rest)
+                if node_id.lower() in RESERVED_IDS:
+                    continue
+                n_generated += 1
+                yield node_id
+
+
+def init_string(base_config: dict, object_config: dict, compact: bool = False) -> str:
     """Generate the mermaid init.
 
     Args:
         base_config: The configuration of MermaidBase.
         object_config: The configuration for the object.
+        compact: Whether to leave out optional whitespace.
 
     Returns:
         A string representation of the object.
@@ -62,5 +99,10 @@ def init_string(base_config: dict, object_config: dict) -> str:
     """
     config = base_config.copy()
     config.update(object_config)
-    config_string = f"%%{str(config)}%%\n"
-    return config_string.replace("'init'", "init")
+    separators = (",", ":") if compact else (", ", ": ")
+    items = (
+        f"{key if key == 'init' else json.dumps(key)}{separators[1]}"
+        f"{json.dumps(value, separators=separators)}"
+        for key, value in config.items()
+    )
+    return "%%{" + separators[0].join(items) + "}%%\n"
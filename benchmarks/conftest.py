@@ -0,0 +1,28 @@
+import os
+import stat
+import sys
+from pathlib import Path
+from typing import Iterator
+
+import pytest
+
+STUB_MMDC = """#!{python}
+import sys
+from pathlib import Path
+
+output = Path(sys.argv[sys.argv.index("-o") + 1])
+source = Path(sys.argv[sys.argv.index("-i") + 1]).read_bytes()
+output.write_bytes(source)
+"""
+
+
+@pytest.fixture
+def stub_mmdc(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Iterator[Path]:
+    """An mmdc stand-in that copies its input to its output."""
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    mmdc = bin_dir / "mmdc"
+    mmdc.write_text(STUB_MMDC.format(python=sys.executable))
+    mmdc.chmod(mmdc.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    yield mmdc
@@ -0,0 +1,121 @@
+"""Builders for synthetic diagrams of a given number of elements."""
+
+import os
+import tracemalloc
+from typing import Callable, Dict, List
+
+from barnacleboy.mermaid.base import MermaidBase
+from barnacleboy.mermaid.er_diagram import (
+    Entity,
+    EntityRelationDiagram,
+    Field,
+    Relationship as ErRelationship,
+    RelationshipType,
+)
+from barnacleboy.mermaid.flowchart import Flowchart, Node, Relationship
+from barnacleboy.mermaid.gantt import Gantt, GanttSection, GanttTask
+from barnacleboy.mermaid.gitgraph import GitGraph
+from barnacleboy.mermaid.piechart import Piechart
+from barnacleboy.mermaid.user_journey import Section, Task, UserJourney
+
+DEFAULT_SIZES = "10,100,1000"
+
+
+def benchmark_sizes() -> List[int]:
+    """Sizes to benchmark, set BARNACLEBOY_BENCHMARK_SIZES to override."""
+    sizes = os.environ.get("BARNACLEBOY_BENCHMARK_SIZES", DEFAULT_SIZES)
+    return [int(size) for size in sizes.split(",")]
+
+
+def peak_memory(function: Callable[[], object]) -> int:
+    """Peak memory in bytes allocated while running a function."""
+    tracemalloc.start()
+    try:
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def build_flowchart(n_elements: int) -> Flowchart:
+    """A flowchart with a chain of nodes."""
+    nodes = [Node(f"node {idx}") for idx in range(n_elements)]
+    relationships = [
+        Relationship([source, target], output_arrow=">")
+        for source, target in zip(nodes, nodes[1:])
+    ]
+    return Flowchart(nodes=nodes, relationships=relationships)
+
+
+def build_gitgraph(n_elements: int) -> GitGraph:
+    """A git graph alternating commits between two branches."""
+    git = GitGraph()
+    git.branch("develop")
+    for idx in range(n_elements):
+        git.checkout("develop" if idx % 2 else "main")
+        git.commit(tag=f"v{idx}" if idx % 100 == 0 else None)
+    return git
+
+
+def build_er_diagram(n_elements: int) -> EntityRelationDiagram:
+    """An entity relation diagram with a chain of foreign keys."""
+    entities = [
+        Entity(
+            f"Table{idx}",
+            [Field("int", "id", primary_key=True), Field("int", "parent_id")],
+        )
+        for idx in range(n_elements)
+    ]
+    relationships = [
+        ErRelationship(
+            parent, child, RelationshipType.ONE, RelationshipType.ZERO_OR_MORE, "has"
+        )
+        for parent, child in zip(entities, entities[1:])
+    ]
+    return EntityRelationDiagram(entities, relationships)
+
+
+def build_piechart(n_elements: int) -> Piechart:
+    """A piechart with one slice per element."""
+    return Piechart("Slices", {f"slice {idx}": idx + 1 for idx in range(n_elements)})
+
+
+def build_user_journey(n_elements: int) -> UserJourney:
+    """A user journey with ten tasks per section."""
+    sections = [
+        Section(
+            f"Section {idx}",
+            [
+                Task(f"Task {task_idx}", task_idx % 5 + 1, ["Leia"])
+                for task_idx in range(idx, min(idx + 10, n_elements))
+            ],
+        )
+        for idx in range(0, n_elements, 10)
+    ]
+    return UserJourney("Journey", sections)
+
+
+def build_gantt(n_elements: int) -> Gantt:
+    """A Gantt diagram with ten consecutive tasks per section."""
+    sections = [
+        GanttSection(
+            f"Section {idx}",
+            [
+                GanttTask(f"Task {task_idx}", task_idx * 10, task_idx * 10 + 10)
+                for task_idx in range(idx, min(idx + 10, n_elements))
+            ],
+        )
+        for idx in range(0, n_elements, 10)
+    ]
+    return Gantt("Gantt", sections, date_format="x")
+
+
+BUILDERS: Dict[str, Callable[[int], MermaidBase]] = {
+    "flowchart": build_flowchart,
+    "gitgraph": build_gitgraph,
+    "er_diagram": build_er_diagram,
+    "piechart": build_piechart,
+    "user_journey": build_user_journey,
+    "gantt": build_gantt,
+}
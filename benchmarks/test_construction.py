@@ -0,0 +1,16 @@
+import pytest
+
+from benchmarks.diagrams import BUILDERS, benchmark_sizes, peak_memory
+
+pytest.importorskip("pytest_benchmark")
+
+
+@pytest.mark.parametrize("n_elements", benchmark_sizes())
+@pytest.mark.parametrize("diagram", sorted(BUILDERS))
+def test_build(benchmark, diagram, n_elements):
+    """Benchmark building a diagram."""
+    builder = BUILDERS[diagram]
+    benchmark.group = f"build-{diagram}"
+    benchmark.extra_info["peak_memory"] = peak_memory(lambda: builder(n_elements))
+
+    benchmark(builder, n_elements)
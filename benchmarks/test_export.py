@@ -0,0 +1,28 @@
+import pytest
+
+from benchmarks.diagrams import BUILDERS, benchmark_sizes
+
+pytest.importorskip("pytest_benchmark")
+
+
+@pytest.mark.parametrize("n_elements", benchmark_sizes())
+@pytest.mark.parametrize("diagram", sorted(BUILDERS))
+def test_save_html(benchmark, tmp_path, diagram, n_elements):
+    """Benchmark exporting a diagram to html."""
+    mermaid_object = BUILDERS[diagram](n_elements)
+    benchmark.group = f"save_html-{diagram}"
+
+    benchmark(mermaid_object.save_html, tmp_path / "diagram.html")
+
+
+@pytest.mark.parametrize("n_elements", benchmark_sizes())
+@pytest.mark.parametrize("diagram", sorted(BUILDERS))
+def test_save_image(benchmark, tmp_path, stub_mmdc, diagram, n_elements):
+    """Benchmark exporting a diagram through a stub mermaid-cli."""
+    mermaid_object = BUILDERS[diagram](n_elements)
+    benchmark.group = f"save_image-{diagram}"
+
+    benchmark.pedantic(
+        mermaid_object.save_image, args=(tmp_path / "diagram.svg",), rounds=3
+    )
+    assert (tmp_path / "diagram.svg").exists()
@@ -0,0 +1,17 @@
+import pytest
+
+from benchmarks.diagrams import BUILDERS, benchmark_sizes, peak_memory
+
+pytest.importorskip("pytest_benchmark")
+
+
+@pytest.mark.parametrize("n_elements", benchmark_sizes())
+@pytest.mark.parametrize("diagram", sorted(BUILDERS))
+def test_render(benchmark, diagram, n_elements):
+    """Benchmark rendering a diagram to mermaid text."""
+    mermaid_object = BUILDERS[diagram](n_elements)
+    benchmark.group = f"render-{diagram}"
+    benchmark.extra_info["peak_memory"] = peak_memory(lambda: str(mermaid_object))
+    benchmark.extra_info["bytes"] = len(str(mermaid_object).encode())
+
+    benchmark(str, mermaid_object)
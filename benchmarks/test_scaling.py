@@ -0,0 +1,47 @@
+"""Complexity checks that fail when build or render time grows superlinearly."""
+
+import os
+import timeit
+
+import pytest
+
+from benchmarks.diagrams import BUILDERS
+
+# Timing ratios are noisy on shared machines, so they only run when asked for.
+pytestmark = pytest.mark.skipif(
+    not os.environ.get("BARNACLEBOY_SCALING_TESTS"),
+    reason="set BARNACLEBOY_SCALING_TESTS=1 to run the scaling checks",
+)
+
+SMALL = 2_000
+GROWTH = 8
+# A linear implementation grows by GROWTH, a quadratic one by GROWTH ** 2. The
+# tolerance absorbs timer noise and allocator effects without hiding the latter.
+TOLERANCE = 3
+
+
+def best_time(function, n_elements, repeat=5):
+    """The fastest of several runs, which is the least noisy estimate."""
+    return min(timeit.repeat(lambda: function(n_elements), number=1, repeat=repeat))
+
+
+def assert_linear(function):
+    small = best_time(function, SMALL)
+    large = best_time(function, SMALL * GROWTH)
+
+    assert large / small < GROWTH * TOLERANCE
+
+
+@pytest.mark.parametrize("diagram", sorted(BUILDERS))
+def test_build_scales_linearly(diagram):
+    """Test that building a diagram is at most linear in its size."""
+    assert_linear(BUILDERS[diagram])
+
+
+@pytest.mark.parametrize("diagram", sorted(BUILDERS))
+def test_render_scales_linearly(diagram):
+    """Test that rendering a diagram is at most linear in its size."""
+    builder = BUILDERS[diagram]
+    diagrams = {n: builder(n) for n in (SMALL, SMALL * GROWTH)}
+
+    assert_linear(lambda n_elements: str(diagrams[n_elements]))
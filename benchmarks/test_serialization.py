@@ -0,0 +1,60 @@
+import pickle
+
+import pytest
+
+from barnacleboy.mermaid.flowchart import Flowchart
+from barnacleboy.mermaid.serialization import from_buffers, to_buffers
+from benchmarks.diagrams import benchmark_sizes, build_flowchart
+
+pytest.importorskip("pytest_benchmark")
+
+
+def out_of_band_dumps(flowchart):
+    meta, columns = to_buffers(flowchart)
+    buffers = []
+    tables = (meta, [pickle.PickleBuffer(column) for column in columns])
+    data = pickle.dumps(tables, 5, buffer_callback=buffers.append)
+    return data, buffers
+
+
+def out_of_band_loads(pickled):
+    data, buffers = pickled
+    meta, columns = pickle.loads(data, buffers=buffers)
+    return from_buffers(meta, *columns)
+
+
+SERIALIZERS = {
+    "pickle": (lambda flowchart: pickle.dumps(flowchart, 5), pickle.loads),
+    "out_of_band": (out_of_band_dumps, out_of_band_loads),
+    "to_bytes": (Flowchart.to_bytes, Flowchart.from_bytes),
+}
+
+
+def n_bytes(pickled):
+    if isinstance(pickled, tuple):
+        data, buffers = pickled
+        return len(data) + sum(buffer.raw().nbytes for buffer in buffers)
+    return len(pickled)
+
+
+@pytest.mark.parametrize("n_elements", benchmark_sizes())
+@pytest.mark.parametrize("serializer", sorted(SERIALIZERS))
+def test_dumps(benchmark, serializer, n_elements):
+    """Benchmark serializing a flowchart, recording the size in extra_info."""
+    flowchart = build_flowchart(n_elements)
+    dumps, _ = SERIALIZERS[serializer]
+    benchmark.group = f"dumps-flowchart-{n_elements}"
+    benchmark.extra_info["bytes"] = n_bytes(dumps(flowchart))
+
+    benchmark(dumps, flowchart)
+
+
+@pytest.mark.parametrize("n_elements", benchmark_sizes())
+@pytest.mark.parametrize("serializer", sorted(SERIALIZERS))
+def test_loads(benchmark, serializer, n_elements):
+    """Benchmark deserializing a flowchart."""
+    dumps, loads = SERIALIZERS[serializer]
+    pickled = dumps(build_flowchart(n_elements))
+    benchmark.group = f"loads-flowchart-{n_elements}"
+
+    benchmark(loads, pickled)
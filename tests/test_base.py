@@ -0,0 +1,60 @@
+import json
+
+import pytest
+
+from barnacleboy.mermaid.base import Theme, get_theme
+from barnacleboy.mermaid.flowchart import Flowchart
+from barnacleboy.mermaid.piechart import Piechart
+
+
+def test_get_theme_is_interned():
+    """Test that equal theme arguments share one object."""
+    theme = get_theme("base", primaryColor="#ffffff", fontSize=12)
+
+    assert get_theme("base", fontSize=12, primaryColor="#ffffff") is theme
+    assert get_theme("base") is not theme
+    assert hash(theme) == hash(Theme("base", theme.variables))
+
+
+def test_get_theme_validation():
+    """Test that invalid themes are rejected."""
+    with pytest.raises(ValueError):
+        get_theme("tatooine")
+    with pytest.raises(ValueError):
+        get_theme("dark", primaryColor="#ffffff")
+    with pytest.raises(ValueError):
+        get_theme("base", primaryColor="red")
+
+
+def test_theme_header_is_json():
+    """Test that the init header is valid JSON wrapped in a mermaid directive."""
+    theme = get_theme("base", primaryColor="#ffffff")
+
+    assert theme.header.startswith("%%{init: ")
+    assert json.loads(theme.header[len("%%{init: ") : -len("}%%\n")]) == {
+        "theme": "base",
+        "themeVariables": {"primaryColor": "#ffffff"},
+    }
+
+
+def test_diagrams_share_theme():
+    """Test that diagrams accept and share a theme object."""
+    theme = get_theme("forest")
+    flowchart = Flowchart(theme=theme)
+    piechart = Piechart("Delicacies", {"Bantha Fodder": 9}, theme="forest")
+
+    assert flowchart._theme is piechart._theme
+    assert flowchart.theme == "forest"
+    assert str(flowchart).startswith(theme.header)
+
+    with pytest.raises(ValueError):
+        Flowchart(theme=theme, primaryColor="#ffffff")
+
+
+def test_compact_header():
+    """Test that compact headers are minified and elided for the default theme."""
+    assert Flowchart(compact=True).get_init_string() == (
+        '%%{init:{"theme":"base"}}%%\n'
+    )
+    assert Flowchart(theme="default", compact=True).get_init_string() == ""
+    assert Flowchart(theme="default").get_init_string().startswith("%%{init: ")
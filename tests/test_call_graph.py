@@ -0,0 +1,74 @@
+import cProfile
+import pstats
+import time
+
+from barnacleboy.generators.call_graph import (
+    call_graph,
+    function_name,
+    hotness_color,
+)
+
+
+def slow():
+    time.sleep(0.02)
+
+
+def fast():
+    return sum(range(10))
+
+
+def pipeline():
+    for _ in range(3):
+        slow()
+    fast()
+
+
+def profile_pipeline(path=None):
+    profiler = cProfile.Profile()
+    profiler.runcall(pipeline)
+    if path is not None:
+        profiler.dump_stats(path)
+    return pstats.Stats(profiler)
+
+
+def test_function_name():
+    assert function_name(("/src/pipeline.py", 12, "run")) == "run (pipeline.py:12)"
+    assert function_name(("~", 0, "<built-in method len>")) == "<built-in method len>"
+
+
+def test_hotness_color():
+    assert hotness_color(0.0) == "#fff5cc"
+    assert hotness_color(1.0) == "#cc0000"
+    assert hotness_color(2.0) == "#cc0000"
+
+
+def test_call_graph(tmp_path):
+    """Test that fast functions are pruned and calls are labelled."""
+    path = tmp_path / "pipeline.prof"
+    profile_pipeline(path)
+
+    flowchart = call_graph(path, threshold=0.5)
+    names = [node.name for node in flowchart.nodes]
+
+    assert any("pipeline (test_call_graph.py" in name for name in names)
+    assert any("slow (test_call_graph.py" in name for name in names)
+    assert not any("fast" in name for name in names)
+    assert flowchart.orientation == "LR"
+
+    labels = {
+        (r.entities[0].name.split()[0], r.entities[1].name.split()[0]): r.label
+        for r in flowchart.relationships
+    }
+    assert labels[('"pipeline', '"slow')].startswith("3 calls, ")
+    assert names[0].startswith('"pipeline')
+    assert flowchart.nodes[0].style == {"fill": "#cc0000"}
+    # Functions with equally hot colors share a class.
+    assert "    classDef s0 fill:#cc0000\n" in str(flowchart)
+    assert "    class A,B" in str(flowchart)
+
+
+def test_call_graph_max_nodes():
+    flowchart = call_graph(profile_pipeline(), threshold=0.0, max_nodes=2)
+
+    assert len(flowchart.nodes) == 2
+    assert len(flowchart.relationships) == 1
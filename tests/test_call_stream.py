@@ -0,0 +1,55 @@
+import random
+from collections import Counter
+
+import pytest
+
+from barnacleboy.generators.call_stream import CallStream
+from barnacleboy.mermaid.heavy_hitters import HeavyHitters
+
+
+def test_heavy_hitters_bounds():
+    rng = random.Random(0)
+    items = [min(int(rng.paretovariate(1.2)), 500) for _ in range(20000)]
+    hitters = HeavyHitters(50)
+    for start in range(0, len(items), 1000):
+        hitters.update(items[start : start + 1000])
+
+    exact = Counter(items)
+    assert len(hitters.counts) == 50
+    assert hitters.total == len(items)
+    for item, count, error in hitters.top(50):
+        assert count - error <= exact[item] <= count
+    # Items above total / capacity are always counted.
+    for item, count in exact.items():
+        if count > len(items) / 50:
+            assert item in hitters.counts
+    assert hitters.top(1)[0][0] == exact.most_common(1)[0][0]
+
+
+def test_heavy_hitters_eviction():
+    hitters = HeavyHitters(2)
+    for item in "aab":
+        hitters.add(item)
+    hitters.add("c")
+    assert hitters.top(2) == [("a", 2, 0), ("c", 2, 1)]
+    with pytest.raises(ValueError):
+        HeavyHitters(0)
+
+
+def test_call_stream_flowchart():
+    stream = CallStream(capacity=3, service_capacity=10)
+    stream.update([("web", "api")] * 5 + [("api", "db")] * 3)
+    stream.add("api", "cache")
+    stream.add("web", "cdn")
+
+    flowchart = stream.flowchart(k=2)
+    assert flowchart.orientation == "LR"
+    assert [node.name for node in flowchart.nodes] == ['"web"', '"api"', '"db"']
+    assert [relationship.label for relationship in flowchart.relationships] == [
+        "5",
+        "3",
+    ]
+    assert stream.services.counts["api"] == 9
+
+    labels = [r.label for r in stream.flowchart(k=3).relationships]
+    assert labels[-1] == "~2"
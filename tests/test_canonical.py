@@ -0,0 +1,135 @@
+import pickle
+import random
+
+import pytest
+
+from barnacleboy.mermaid.canonical import canonical_config
+from barnacleboy.mermaid.er_diagram import (
+    Entity,
+    EntityRelationDiagram,
+    Field,
+    Relationship as ERRelationship,
+    RelationshipType,
+)
+from barnacleboy.mermaid.flowchart import Flowchart, Node, Relationship, Subgraph
+
+
+def build_flowchart(seed, canonical=True, extra=False):
+    rng = random.Random(seed)
+    names = ["api", "auth", "db", "cache", "web", "queue"] + (["extra"] * extra)
+    nodes = {name: Node(name) for name in names}
+    nodes["db"].style = {"stroke": "#000", "fill": "#f9f"}
+    nodes["web"].link = "https://example.com"
+    edges = [
+        ("web", "api", None),
+        ("api", "auth", None),
+        ("auth", "db", "reads"),
+        ("api", "queue", None),
+        ("db", "cache", None),
+    ]
+    order = list(nodes.values())
+    rng.shuffle(order)
+    rng.shuffle(edges)
+
+    flowchart = Flowchart(title="Platform", canonical=canonical)
+    flowchart.add_nodes(order)
+    flowchart.add_relationships(
+        [
+            Relationship([nodes[a], nodes[b]], output_arrow=">", label=label)
+            for a, b, label in edges
+        ]
+    )
+    storage = [nodes["cache"], nodes["db"]]
+    rng.shuffle(storage)
+    flowchart.create_subgraph("storage", storage)
+    flowchart.config = dict(rng.sample([("b", {"y": 1, "x": 2}), ("a", 1)], 2))
+    return flowchart
+
+
+def test_canonical_flowchart_is_order_independent():
+    texts = {str(build_flowchart(seed)) for seed in range(10)}
+    assert len(texts) == 1
+    assert len({str(build_flowchart(seed, canonical=False)) for seed in range(10)}) > 1
+
+
+def test_canonical_ids_are_stable():
+    lines = set(str(build_flowchart(0)).splitlines())
+    extended = set(str(build_flowchart(1, extra=True)).splitlines())
+    assert len(extended - lines) == 1
+    assert (extended - lines).pop().endswith("(extra)")
+
+
+def test_canonical_flowchart_keeps_original():
+    flowchart = build_flowchart(3)
+    ids = [node._internal_id for node in flowchart.nodes]
+    str(flowchart)
+    assert [node._internal_id for node in flowchart.nodes] == ids
+
+    copy = pickle.loads(pickle.dumps(flowchart))
+    assert copy.canonical
+    assert str(copy) == str(flowchart)
+
+    view = flowchart.derive(flowchart.nodes[:2], [])
+    assert view.canonical
+
+
+def test_canonical_duplicates():
+    flowchart = Flowchart(canonical=True)
+    first, second = flowchart.create_node("same"), flowchart.create_node("same")
+    flowchart.add_relationships([Relationship([first, second], output_arrow=">")])
+    lines = str(flowchart).splitlines()
+    assert lines[2].endswith("(same)")
+    assert lines[3] == lines[2].split("(")[0] + "_2(same)"
+
+
+def test_canonical_unknown_entity():
+    flowchart = Flowchart(canonical=True)
+    node = flowchart.create_node("a")
+    flowchart.relationships.append(Relationship([node, Node("b")]))
+    with pytest.raises(ValueError):
+        str(flowchart)
+
+    flowchart = Flowchart(canonical=True)
+    flowchart.subgraphs.append(Subgraph("outer", [Subgraph("inner", [])]))
+    with pytest.raises(ValueError):
+        str(flowchart)
+
+
+def build_er_diagram(seed):
+    rng = random.Random(seed)
+    fields = [
+        Field("int", "id", primary_key=True),
+        Field("string", "name"),
+        Field("int", "team_id", foreign_key=True),
+    ]
+    rng.shuffle(fields)
+    user = Entity("User", fields)
+    team = Entity(
+        "Team", [Field("string", "title"), Field("int", "id", primary_key=True)]
+    )
+    relationships = [
+        ERRelationship(
+            team, user, RelationshipType.ONE, RelationshipType.ZERO_OR_MORE, "members"
+        ),
+        ERRelationship(
+            team, team, RelationshipType.ONE, RelationshipType.ONE, "parent"
+        ),
+    ]
+    entities = [user, team]
+    rng.shuffle(entities)
+    rng.shuffle(relationships)
+    return EntityRelationDiagram(entities, relationships, canonical=True)
+
+
+def test_canonical_er_diagram():
+    texts = {str(build_er_diagram(seed)) for seed in range(10)}
+    assert len(texts) == 1
+    lines = texts.pop().splitlines()
+    assert lines[2:5] == ["Team {", "  int id PK", "  string title"]
+    assert lines[-2:] == ["Team||--||Team : parent", "Team||--o{User : members"]
+
+
+def test_canonical_config():
+    config = canonical_config({"b": {"y": 1, "x": 2}, "a": [3]})
+    assert list(config) == ["a", "b"]
+    assert list(config["b"]) == ["x", "y"]
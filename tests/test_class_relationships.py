@@ -0,0 +1,124 @@
+import os
+import textwrap
+
+import pytest
+
+from barnacleboy.generators.class_relationships import (
+    ClassScanner,
+    class_flowchart,
+    module_name,
+    scan_file,
+    to_flowchart,
+)
+
+
+def write_tree(root):
+    files = {
+        "fleet/__init__.py": "",
+        "fleet/ships.py": """
+            from dataclasses import dataclass
+            from typing import List, Optional
+
+            from .crew import Pilot
+
+
+            class Ship:
+                pass
+
+
+            @dataclass
+            class XWing(Ship):
+                pilot: Optional[Pilot]
+                wingmen: List["Pilot"]
+            """,
+        "fleet/crew.py": """
+            import fleet.ships
+
+
+            class Pilot:
+                def __init__(self):
+                    self.ship = fleet.ships.Ship()
+                    self.name = str("Luke")
+            """,
+    }
+    for name, source in files.items():
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(textwrap.dedent(source))
+
+
+def test_module_name(tmp_path):
+    assert module_name(tmp_path / "a" / "b.py", tmp_path) == "a.b"
+    assert module_name(tmp_path / "a" / "__init__.py", tmp_path) == "a"
+
+
+def test_scan_file(tmp_path):
+    """Test that bases and attribute types are resolved through imports."""
+    write_tree(tmp_path)
+
+    ship, xwing = scan_file(tmp_path / "fleet" / "ships.py", "fleet.ships")
+    (pilot,) = scan_file(tmp_path / "fleet" / "crew.py", "fleet.crew")
+
+    assert ship.bases == []
+    assert xwing.bases == ["fleet.ships.Ship"]
+    assert xwing.attributes == {
+        "typing.Optional": ["pilot"],
+        "fleet.crew.Pilot": ["pilot", "wingmen"],
+        "typing.List": ["wingmen"],
+    }
+    assert pilot.attributes == {"fleet.ships.Ship": ["ship"]}
+
+
+def test_to_flowchart(tmp_path):
+    """Test that classes are grouped by module and connected."""
+    write_tree(tmp_path)
+
+    flowchart = class_flowchart(tmp_path, n_jobs=1)
+
+    assert [subgraph.name for subgraph in flowchart.subgraphs] == [
+        "fleet.crew",
+        "fleet.ships",
+    ]
+    relationships = {
+        (r.entities[0].name, r.entities[1].name, r.label)
+        for r in flowchart.relationships
+    }
+    assert relationships == {
+        ("XWing", "Ship", "inherits"),
+        ("XWing", "Pilot", "pilot, wingmen"),
+        ("Pilot", "Ship", "ship"),
+    }
+
+
+def test_scanner_cache(tmp_path):
+    """Test that only changed files are parsed again."""
+    source = tmp_path / "src"
+    write_tree(source)
+    cache_dir = tmp_path / "cache"
+
+    scanner = ClassScanner(source, cache_dir=cache_dir, n_jobs=2)
+    classes = scanner.scan()
+    assert len(scanner.parsed_files) == 3
+
+    scanner.scan()
+    assert scanner.parsed_files == []
+
+    crew = source / "fleet" / "crew.py"
+    os.utime(crew, ns=(0, 0))
+    assert ClassScanner(source, cache_dir=cache_dir).scan() == classes
+
+    crew.write_text("class Pilot:\n    pass\n\n\nclass Droid:\n    pass\n")
+    scanner = ClassScanner(source, cache_dir=cache_dir, n_jobs=1)
+    classes = scanner.scan()
+    assert scanner.parsed_files == [crew]
+    assert [info.name for info in classes] == ["Pilot", "Droid", "Ship", "XWing"]
+    assert len(to_flowchart(classes).relationships) == 2
+
+
+def test_scanner_syntax_error(tmp_path):
+    (tmp_path / "broken.py").write_text("class :\n")
+
+    scanner = ClassScanner(tmp_path, n_jobs=1)
+    with pytest.warns(UserWarning):
+        assert scanner.scan() == []
+    assert scanner.failed_files == [tmp_path / "broken.py"]
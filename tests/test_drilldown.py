@@ -0,0 +1,79 @@
+import json
+
+from barnacleboy.mermaid.drilldown import drilldown_data
+from barnacleboy.mermaid.flowchart import Flowchart, Relationship
+
+
+def build():
+    flowchart = Flowchart(title="Platform")
+    api, auth, db, cache, web = (
+        flowchart.create_node(name) for name in ("api", "auth", "db", "cache", "web")
+    )
+    auth.style = {"fill": "#f00"}
+    web.link = "https://example.com"
+    flowchart.add_relationships(
+        [
+            Relationship([api, auth], output_arrow=">"),
+            Relationship([db, cache], output_arrow=">"),
+            Relationship([auth, db], output_arrow=">", label="reads"),
+            Relationship([web, api], output_arrow=">"),
+        ]
+    )
+    storage = flowchart.create_subgraph("storage", [db, cache])
+    flowchart.create_subgraph("backend", [api, auth, storage])
+    return flowchart
+
+
+def test_drilldown_data():
+    flowchart = build()
+    api, auth, db, cache, web = flowchart.nodes
+    storage, backend = flowchart.subgraphs
+    data = drilldown_data(flowchart)
+    json.dumps(data)
+
+    assert data["header"].endswith("title: Platform\n---\ngraph TB")
+    assert data["expanded"] == []
+    assert data["nodes"][auth._internal_id] == [
+        str(auth),
+        f"style {auth._internal_id} fill:#f00",
+    ]
+    assert data["nodes"][web._internal_id][1].startswith("click")
+
+    containers = data["containers"]
+    assert containers[""]["members"] == [web._internal_id, backend._internal_id]
+    assert containers[backend._internal_id]["members"] == [
+        api._internal_id,
+        auth._internal_id,
+        storage._internal_id,
+    ]
+    assert containers[storage._internal_id]["label"] == "storage"
+    assert data["parents"][db._internal_id] == storage._internal_id
+    assert data["parents"][storage._internal_id] == backend._internal_id
+
+    # Edges belong to the innermost subgraph containing both ends.
+    assert containers[""]["edges"] == [[web._internal_id, api._internal_id, "--->"]]
+    assert containers[backend._internal_id]["edges"] == [
+        [api._internal_id, auth._internal_id, "--->"],
+        [auth._internal_id, db._internal_id, "--->|reads|"],
+    ]
+    assert containers[storage._internal_id]["edges"] == [
+        [db._internal_id, cache._internal_id, "--->"]
+    ]
+
+    assert drilldown_data(flowchart, depth=1)["expanded"] == [backend._internal_id]
+    assert drilldown_data(flowchart, depth=2)["expanded"] == [
+        storage._internal_id,
+        backend._internal_id,
+    ]
+
+
+def test_save_drilldown(tmp_path):
+    flowchart = build()
+    flowchart.nodes[0].name = "</script>"
+    flowchart.save_drilldown(tmp_path / "drilldown.html")
+
+    page = (tmp_path / "drilldown.html").read_text()
+    assert "{{DATA}}" not in page
+    start = page.index('id="drilldown-data">') + len('id="drilldown-data">')
+    block = page[start : page.index("</script>", start)]
+    assert json.loads(block) == drilldown_data(flowchart)
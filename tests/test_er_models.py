@@ -0,0 +1,85 @@
+from typing import Dict, List, Optional, Union
+
+from pydantic import BaseModel, Field, conlist
+
+from barnacleboy.mermaid.er_diagram import EntityRelationDiagram
+from barnacleboy.mermaid.er_models import describe_model
+
+
+class Address(BaseModel):
+    street: str
+    number: Optional[int]
+
+
+class Employee(BaseModel):
+    name: str = Field(..., description="Full name")
+    manager: Optional["Employee"] = None
+    home: Address
+
+
+class Team(BaseModel):
+    lead: Employee
+    members: conlist(Employee, min_items=1)
+    offices: List[Address] = []
+    locations: Dict[str, Address] = {}
+    contact: Union[Employee, Address, None] = None
+    tags: List[str] = []
+    visitors: List[Union[Employee, Address]] = []
+    motto: str = Field("", description='Say "hello"')
+
+
+Employee.update_forward_refs()
+
+
+def test_from_models():
+    diagram = EntityRelationDiagram.from_models(Team)
+
+    assert [entity.name for entity in diagram.entities] == [
+        "Team",
+        "Employee",
+        "Address",
+    ]
+    assert [str(field) for field in diagram.entities[0].attributes] == [
+        "  str[] tags",
+        '  str motto "Say #quot;hello#quot;"',
+    ]
+    assert [str(field) for field in diagram.entities[1].attributes] == [
+        '  str name "Full name"'
+    ]
+    assert [str(field) for field in diagram.entities[2].attributes] == [
+        "  str street",
+        "  int number",
+    ]
+    assert [str(relationship) for relationship in diagram.relationships] == [
+        "Team||--||Employee : lead",
+        "Team||--|{Employee : members",
+        "Team||--o{Address : offices",
+        "Team||--o{Address : locations",
+        "Team||--o|Employee : contact",
+        "Team||--o|Address : contact",
+        "Team||--o{Employee : visitors",
+        "Team||--o{Address : visitors",
+        "Employee||--o|Employee : manager",
+        "Employee||--||Address : home",
+    ]
+
+
+def test_from_models_names_and_cache():
+    def make_address():
+        class Address(BaseModel):
+            city: str
+
+        return Address
+
+    class Person(BaseModel):
+        home: Address
+        work: make_address()
+
+    diagram = EntityRelationDiagram.from_models(Person, Address, theme="forest")
+    assert [entity.name for entity in diagram.entities] == [
+        "Person",
+        "Address",
+        "Address_2",
+    ]
+    assert diagram.theme == "forest"
+    assert describe_model(Address) is describe_model(Address)
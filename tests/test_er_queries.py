@@ -0,0 +1,98 @@
+import pytest
+
+from barnacleboy.mermaid.er_diagram import (
+    EntityRelationDiagram,
+    Field,
+    RelationshipType,
+)
+
+
+def build_schema():
+    """Build a schema of customers, orders and a detached audit table."""
+    diagram = EntityRelationDiagram()
+    for name in ["customer", "address", "order", "item", "product", "audit"]:
+        diagram.add_entity(name, [Field("int", f"{name}_id", primary_key=True)])
+    entities = {entity.name: entity for entity in diagram.entities}
+    for first, second in [
+        ("customer", "address"),
+        ("customer", "order"),
+        ("order", "item"),
+        ("product", "item"),
+        ("address", "order"),
+    ]:
+        diagram.add_relationship(
+            entities[first],
+            entities[second],
+            RelationshipType.ONE,
+            RelationshipType.ZERO_OR_MORE,
+            "has",
+        )
+    return diagram
+
+
+def names(diagram):
+    return [entity.name for entity in diagram.entities]
+
+
+def test_focus():
+    diagram = build_schema()
+
+    view = diagram.focus("order")
+    assert names(view) == ["customer", "address", "order", "item"]
+    assert len(view.relationships) == 4
+    assert view.entities[2] is diagram.entities[2]
+    assert names(diagram.focus("order", depth=2))[-1] == "product"
+    assert names(diagram.focus(diagram.entities[5], depth=3)) == ["audit"]
+
+    view = diagram.focus("order", attributes="focused")
+    assert [bool(entity.attributes) for entity in view.entities] == [
+        False,
+        False,
+        True,
+        False,
+    ]
+    assert "order {" in str(view) and "customer {" not in str(view)
+    assert view.relationships[0].entity1 is view.entities[0]
+    assert diagram.entities[0].attributes
+
+    with pytest.raises(ValueError):
+        diagram.focus("missing")
+    with pytest.raises(ValueError):
+        diagram.focus("order", attributes="some")
+
+
+def test_between():
+    diagram = build_schema()
+
+    view = diagram.between("customer", "item")
+    assert names(view) == ["customer", "order", "item"]
+    assert [str(r) for r in view.relationships] == [
+        "customer||--o{order : has",
+        "order||--o{item : has",
+    ]
+    assert names(diagram.between("address", "product", attributes="none")) == [
+        "address",
+        "order",
+        "item",
+        "product",
+    ]
+    assert names(diagram.between("order", "order")) == ["order"]
+    with pytest.raises(ValueError):
+        diagram.between("customer", "audit")
+
+
+def test_index_updates():
+    diagram = build_schema()
+    assert names(diagram.focus("audit")) == ["audit"]
+
+    diagram.add_relationship(
+        diagram.entities[5],
+        diagram.entities[0],
+        RelationshipType.ONE,
+        RelationshipType.ONE,
+        "logs",
+    )
+    assert names(diagram.focus("audit")) == ["customer", "audit"]
+
+    diagram.relationships = diagram.relationships[:5]
+    assert names(diagram.focus("audit")) == ["audit"]
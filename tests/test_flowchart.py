@@ -1,11 +1,16 @@
+import re
 import tempfile
 from pathlib import Path
+from typing import List, Tuple
+
+import pytest
 
 from barnacleboy.mermaid.flowchart import (
     Flowchart,
     Node,
     NodeShape,
     Relationship,
+    Subgraph,
 )
 
 
@@ -41,7 +46,7 @@ def test_flowchart():
 
     assert (
         str(flowchart)
-        == "%%{init: {'theme': 'base', 'themeVariables': {'primaryColor': '#ffffff', 'secondaryColor': '#ffffff'}}}%%\ngraph TB\n    A(Anakin Skywalker)\n    B(Darth Vader)\n\n    A---|Turns to the dark side|B\n"
+        == '%%{init: {"theme": "base", "themeVariables": {"primaryColor": "#ffffff", "secondaryColor": "#ffffff"}}}%%\ngraph TB\n    A(Anakin Skywalker)\n    B(Darth Vader)\n\n    A---|Turns to the dark side|B\n'
     )
 
 
@@ -70,3 +75,184 @@ def test_flowchart_with_subgraph():
         flowchart.save(temp_file.name)
 
         assert Path(temp_file.name).exists()
+
+
+def test_flowchart_subgraph_string():
+    """Test that nested subgraphs render each entity exactly once."""
+    flowchart = Flowchart()
+    anakin = flowchart.create_node("Anakin Skywalker")
+    vader = flowchart.create_node("Darth Vader")
+    obiwan = flowchart.create_node("Obi-Wan Kenobi")
+    dark_subgraph = flowchart.create_subgraph("The Dark Side", [vader])
+    all_subgraph = flowchart.create_subgraph("All", [dark_subgraph, anakin])
+
+    assert flowchart.parent(vader) is dark_subgraph
+    assert flowchart.parent(dark_subgraph) is all_subgraph
+    assert flowchart.parent(obiwan) is None
+    assert str(flowchart).split("\n")[1:] == [
+        "graph TB",
+        "    C(Obi-Wan Kenobi)",
+        "    subgraph E [All]",
+        "    direction TB",
+        "    A(Anakin Skywalker)",
+        "    subgraph D [The Dark Side]",
+        "    direction TB",
+        "    B(Darth Vader)",
+        "    end",
+        "    end",
+        "",
+        "",
+    ]
+
+
+def test_flowchart_subgraph_members_change():
+    """Test that parents follow changes to the entities of subgraphs."""
+    flowchart = Flowchart()
+    vader = flowchart.create_node("Darth Vader")
+    anakin = flowchart.create_node("Anakin Skywalker")
+    dark_subgraph = flowchart.create_subgraph("The Dark Side", [vader])
+    light_subgraph = flowchart.create_subgraph("The Light Side", [])
+
+    dark_subgraph.entities.remove(vader)
+    light_subgraph.entities.append(vader)
+    dark_subgraph.entities.append(anakin)
+    assert flowchart.parent(vader) is light_subgraph
+    assert flowchart.parent(anakin) is dark_subgraph
+
+    dark_subgraph.entities = []
+    assert flowchart.parent(anakin) is None
+    lines = str(flowchart).splitlines()
+    assert sum("(Anakin Skywalker)" in line for line in lines) == 1
+
+    empire = Subgraph("The Empire", [anakin])
+    flowchart.subgraphs.append(empire)
+    assert flowchart.parent(anakin) is empire
+    assert flowchart._stale == set()
+
+    dark_subgraph.entities.append(vader)
+    assert flowchart._stale == {dark_subgraph}
+    with pytest.raises(ValueError):
+        flowchart.parent(vader)
+
+
+def test_flowchart_subgraph_conflict():
+    """Test that an entity cannot be in two subgraphs."""
+    flowchart = Flowchart()
+    vader = flowchart.create_node("Darth Vader")
+    flowchart.create_subgraph("The Dark Side", [vader])
+
+    with pytest.raises(ValueError):
+        flowchart.create_subgraph("The Empire", [vader])
+
+
+def test_flowchart_deep_subgraphs():
+    """Test that deeply nested subgraphs render without recursion."""
+    depth = 5000
+    leaf = Node("leaf")
+    subgraph = Subgraph("level 0", [leaf])
+    for level in range(1, depth):
+        subgraph = Subgraph(f"level {level}", [subgraph])
+    flowchart = Flowchart(nodes=[leaf], subgraphs=[subgraph])
+
+    lines = str(flowchart).splitlines()
+
+    assert sum(line.strip().startswith("subgraph") for line in lines) == depth
+    assert sum(line.strip() == "end" for line in lines) == depth
+    assert sum("(leaf)" in line for line in lines) == 1
+
+
+def _normalized(flowchart: Flowchart) -> List[str]:
+    """Get the non-empty lines of a flowchart with IDs replaced by names."""
+    names = {e._internal_id: e.name for e in [*flowchart.nodes, *flowchart.subgraphs]}
+    text = re.sub(r"\w+", lambda match: names.get(match[0], match[0]), str(flowchart))
+    return [line.strip() for line in text.splitlines()[1:] if line.strip()]
+
+
+def test_flowchart_compact():
+    """Test that compact output describes the same chart with less text."""
+
+    def build(compact: bool) -> Flowchart:
+        flowchart = Flowchart(orientation="LR", compact=compact)
+        nodes = [flowchart.create_node(f"node {i}") for i in range(100)]
+        flowchart.create_subgraph("group", nodes[:3]).direction = "LR"
+        flowchart.add_relationships(
+            [Relationship([source, target]) for source, target in zip(nodes, nodes[1:])]
+        )
+        flowchart.set_internal_ids()
+        return flowchart
+
+    compact, verbose = build(True), build(False)
+    compact_lines = str(compact).splitlines()
+
+    assert len(str(compact)) < len(str(verbose))
+    assert not any(line.startswith(" ") or not line for line in compact_lines)
+    assert "a---b" in compact_lines
+    assert all(
+        entity._internal_id[0] not in "ox" and entity._internal_id != "end"
+        for entity in [*compact.nodes, *compact.subgraphs]
+    )
+    assert [
+        line for line in _normalized(verbose) if line != "direction LR"
+    ] == _normalized(compact)
+
+
+def _expand(line: str) -> List[Tuple[str, str]]:
+    """Expand a chained "&" line into its edges."""
+    groups = [part.split(" & ") for part in line.split("---")]
+    return [
+        (source, target)
+        for sources, targets in zip(groups, groups[1:])
+        for source in sources
+        for target in targets
+    ]
+
+
+def test_flowchart_compress_edges():
+    """Test that compressed edges expand to the original edges."""
+    flowchart = Flowchart(compress_edges=True)
+    a, b, c, d, e = (flowchart.create_node(name) for name in "abcde")
+    edges = [(a, c), (a, d), (b, c), (b, d), (c, e), (d, e), (e, a), (e, a)]
+    flowchart.add_relationships([Relationship([s, t]) for s, t in edges])
+    flowchart.create_relationship([a, b], style="DOTTED")
+
+    lines = [line.strip() for line in str(flowchart).split("\n\n")[1].splitlines()]
+    solid = [line for line in lines if "-.-" not in line]
+
+    assert "A & B---C & D---E---A" in str(flowchart)
+    assert "A-.-B" in lines
+    assert sorted(edge for line in solid for edge in _expand(line)) == sorted(
+        (s._internal_id, t._internal_id) for s, t in edges
+    )
+    assert len(lines) < len(flowchart.relationships)
+
+
+def test_flowchart_styles():
+    """Test that shared styles are rendered once as classes."""
+    flowchart = Flowchart()
+    nodes = [flowchart.create_node(f"node {i}") for i in range(6)]
+    flowchart.define_class("failing", {"stroke": "#f00"})
+    flowchart.assign_class(nodes[:2], "failing")
+    flowchart.style_nodes(nodes[2:4], {"fill": "#f96"})
+    nodes[4].style = {"fill": "#f96"}
+    nodes[5].style = {"fill": "#69f"}
+
+    lines = str(flowchart).splitlines()
+
+    assert lines[-5:] == [
+        "    classDef failing stroke:#f00",
+        "    classDef s0 fill:#f96",
+        "    class A,B failing",
+        "    class C,D,E s0",
+        "    style F fill:#69f",
+    ]
+    with pytest.raises(ValueError):
+        flowchart.assign_class(nodes, "passing")
+    with pytest.raises(ValueError):
+        flowchart.define_class("not a name", {})
+
+    # Generated classes do not take the names of defined ones.
+    flowchart.define_class("s0", {"stroke": "#000"})
+    nodes[5].style = nodes[4].style
+    lines = str(flowchart).splitlines()
+    assert "    classDef s1 fill:#f96" in lines
+    assert "    classDef s0 stroke:#000" in lines
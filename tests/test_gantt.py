@@ -0,0 +1,138 @@
+import json
+import tempfile
+from pathlib import Path
+
+import pytest
+
+from barnacleboy.mermaid.gantt import Gantt, GanttTask, _SpanAggregator, capacity
+
+
+def spans_to_lines(spans):
+    return [json.dumps(span) for span in spans]
+
+
+def test_gantt():
+    """Test the Gantt class."""
+    gantt = Gantt("Death Star", date_format="YYYY-MM-DD")
+    section = gantt.add_section("Construction")
+    section.add_task("Design: phase 1", "2023-01-01", "2023-02-01", ["done"])
+    section.add_task("Build", "2023-02-01", "2023-12-01")
+
+    assert str(gantt).split("\n")[1:] == [
+        "gantt",
+        "title Death Star",
+        "dateFormat YYYY-MM-DD",
+        "section Construction",
+        "Design#colon; phase 1 :done, 2023-01-01, 2023-02-01",
+        "Build :2023-02-01, 2023-12-01",
+        "",
+    ]
+
+    with tempfile.NamedTemporaryFile("w", suffix=".png") as temp_file:
+        gantt.save(temp_file.name)
+
+        assert Path(temp_file.name).exists()
+
+
+def test_gantt_from_spans(tmp_path):
+    """Test that spans are aggregated per parent and name."""
+    spans = [{"name": "pipeline", "start": 10.0, "end": 14.0}]
+    spans += [
+        {"name": "load", "start": 10.0 + i, "duration": 0.5, "parent": "pipeline"}
+        for i in range(4)
+    ]
+    spans += [{"name": "fit", "start": 12.0, "end": 13.0, "parent": "pipeline"}]
+    path = tmp_path / "spans.ndjson"
+    path.write_text("\n".join(spans_to_lines(spans)) + "\n\n")
+
+    gantt = Gantt.from_spans(path, top_n=1)
+
+    assert [section.title for section in gantt.sections] == [
+        "(root)",
+        "pipeline",
+        "Longest spans",
+    ]
+    assert [str(task) for task in gantt.sections[1].tasks] == [
+        "load (4x, 2s) :0, 3500",
+        "fit (1x, 1s) :2000, 3000",
+    ]
+    assert gantt.sections[2].tasks == [GanttTask("pipeline (4s)", 0, 4000, ["crit"])]
+    assert "dateFormat x\n" in str(gantt)
+
+
+def test_gantt_from_spans_bounded():
+    """Test that small sections and tasks are dropped or combined."""
+    spans = [
+        {"name": f"task {i}", "start": i, "end": i + 1 + i % 3, "parent": "big"}
+        for i in range(100)
+    ]
+    spans += [{"name": "tiny", "start": 0, "end": 0.1, "parent": "small"}]
+
+    gantt = Gantt.from_spans(spans_to_lines(spans), max_sections=1, max_tasks=5)
+
+    (section,) = gantt.sections
+    assert section.title == "big"
+    assert len(section.tasks) == 5
+    assert (
+        sum(task.name.startswith("other 96 tasks (96x") for task in section.tasks) == 1
+    )
+
+
+def test_gantt_from_spans_unique_parents():
+    """Test that memory stays bounded when every span has its own parent."""
+    spans = [
+        {"name": "hot", "start": i, "end": i + 10, "parent": "main"} for i in range(100)
+    ]
+    spans += [
+        {"name": f"call {i}", "start": i, "end": i + 0.1, "parent": f"span-{i}"}
+        for i in range(5000)
+    ]
+    spans += [
+        {"name": f"query {i}", "start": i, "end": i + 0.01, "parent": "main"}
+        for i in range(5000)
+    ]
+    aggregator = _SpanAggregator(0, False, 0.0, max_sections=5, max_tasks=5)
+
+    aggregator.consume(spans_to_lines(spans))
+
+    assert len(aggregator.tasks) <= capacity(5)
+    assert all(len(tasks) <= capacity(5) for tasks in aggregator.tasks.values())
+    sections = aggregator.sections(5, 5)
+    main = next(section for section in sections if section.title == "main")
+    names = [task.name for task in main.tasks]
+    assert len(names) == 5
+    assert "hot (100x, 1e+03s)" in names
+    assert sum(name.startswith("other tasks (") for name in names) == 1
+
+
+def test_gantt_from_spans_merge_lanes():
+    """Test that overlapping spans of a lane are merged into busy intervals."""
+    spans = [
+        {"name": "a", "start": 0.0, "end": 1.0, "parent": "worker"},
+        {"name": "b", "start": 0.5, "end": 2.0, "parent": "worker"},
+        {"name": "c", "start": 5.0, "end": 6.0, "parent": "worker"},
+        {"name": "d", "start": 2.1, "end": 3.0, "parent": "worker"},
+    ]
+
+    gantt = Gantt.from_spans(spans_to_lines(spans), merge_lanes=True, merge_gap=0.2)
+
+    assert [str(task) for task in gantt.sections[0].tasks] == [
+        "busy (3x, 3.4s) :0, 3000",
+        "busy (1x, 1s) :5000, 6000",
+    ]
+
+
+def test_gantt_from_spans_many_intervals():
+    spans = [
+        {"name": "a", "start": 2.0 * i, "end": 2.0 * i + 1, "parent": "worker"}
+        for i in range(10000)
+    ]
+
+    gantt = Gantt.from_spans(spans_to_lines(spans), merge_lanes=True, max_tasks=1000)
+
+    assert 0 < len(gantt.sections[0].tasks) <= 256
+
+
+def test_gantt_from_spans_invalid():
+    with pytest.raises(ValueError, match="line 2"):
+        Gantt.from_spans(['{"name": "a", "start": 0, "end": 1}', '{"name": "b"}'])
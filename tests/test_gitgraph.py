@@ -1,7 +1,9 @@
 import tempfile
 from pathlib import Path
 
-from barnacleboy.mermaid.gitgraph import GitGraph
+import pytest
+
+from barnacleboy.mermaid.gitgraph import Branch, Commit, GitGraph
 
 
 def test_commit():
@@ -69,3 +71,23 @@ def test_cherry_pick():
         git.save(temp_file.name)
 
         assert Path(temp_file.name).exists()
+
+
+def test_names_follow_lists():
+    """Test that checks use the commits and branches currently in the lists."""
+    git = GitGraph()
+    git.commit(id="A")
+    git.branch("develop")
+
+    git.commits.pop()
+    git.branches = [Branch("main"), Branch("release")]
+    git.commit(id="A")
+    git.branch("develop")
+    git.checkout("release")
+    git.commits.append(Commit("B"))
+    git.cherry_pick("B")
+
+    with pytest.raises(ValueError):
+        git.commit(id="B")
+    with pytest.raises(ValueError):
+        git.checkout("feature")
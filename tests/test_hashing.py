@@ -0,0 +1,135 @@
+import pickle
+
+from barnacleboy.mermaid.er_diagram import (
+    EntityRelationDiagram,
+    Field,
+    RelationshipType,
+)
+from barnacleboy.mermaid.flowchart import Flowchart, Node, Relationship
+from barnacleboy.mermaid.gantt import Gantt, GanttSection, GanttTask
+from barnacleboy.mermaid.hashing import fingerprint_of
+
+
+def build(names=("a", "b", "c")):
+    """Build a small flowchart with a chain of nodes and a subgraph."""
+    flowchart = Flowchart(title="Services")
+    nodes = [flowchart.create_node(name) for name in names]
+    flowchart.add_relationships(
+        [Relationship([s, t], output_arrow=">") for s, t in zip(nodes, nodes[1:])]
+    )
+    flowchart.create_subgraph("group", nodes[:2])
+    return flowchart
+
+
+def test_flowchart_fingerprint():
+    """Test that flowcharts that render the same have equal fingerprints."""
+    first, second = build(), build()
+    assert first is not second
+    assert first.fingerprint() == second.fingerprint()
+    assert first == second
+    assert hash(first) == hash(second)
+    assert len({first, second}) == 1
+    assert build() != build(("a", "b", "d"))
+
+    original = first.fingerprint()
+    first.nodes[1].name = "renamed"
+    assert first.fingerprint() != original
+    assert first != second
+    first.nodes[1].name = "b"
+    assert first.fingerprint() == original
+
+    first.relationships[0].label = "calls"
+    assert first.fingerprint() != original
+    first.relationships[0].label = None
+    first.nodes[0].style = {"fill": "#f00"}
+    assert first.fingerprint() != original
+    first.nodes[0].style = None
+    assert first.fingerprint() == original
+
+    # Dictionaries that are changed in place are hashed too.
+    first.config["flowchart"] = {"curve": "basis"}
+    assert first.fingerprint() != original
+    first.config.clear()
+    first.define_class("hot", {"fill": "#f00"})
+    assert first.fingerprint() != original
+
+
+def test_flowchart_fingerprint_appends():
+    """Test that adding and removing entities changes the fingerprint."""
+    flowchart = build()
+    before = flowchart.fingerprint()
+    node = flowchart.create_node("d")
+    flowchart.add_relationships(
+        [Relationship([flowchart.nodes[2], node], output_arrow=">")]
+    )
+    assert flowchart.fingerprint() != before
+    assert flowchart.fingerprint() == build(("a", "b", "c", "d")).fingerprint()
+
+    # Internal IDs of the subgraph were renumbered, so it renders differently.
+    flowchart.relationships.pop()
+    flowchart.nodes.pop()
+    assert flowchart.fingerprint() != before
+    flowchart.set_internal_ids()
+    assert flowchart.fingerprint() == before
+
+
+def test_assigned_lists_are_shared():
+    """Test that changing a list passed to a flowchart changes the flowchart."""
+    nodes = []
+    flowchart = Flowchart(nodes=nodes)
+    before = flowchart.fingerprint()
+    nodes.append(Node("b"))
+    assert flowchart.nodes is nodes
+    assert flowchart.fingerprint() != before
+    assert "(b)" in str(flowchart)
+
+
+def test_fingerprint_order():
+    """Test that the fingerprint of a list depends on the order of its items."""
+    first = ["a", "b"]
+    second = ["b", "a"]
+    assert fingerprint_of(first) != fingerprint_of(second)
+    second.reverse()
+    assert fingerprint_of(first) == fingerprint_of(second)
+
+
+def test_fingerprint_pickle():
+    """Test that unpickled diagrams are fingerprinted from their content."""
+    flowchart = build()
+    fingerprint = flowchart.fingerprint()
+    restored = pickle.loads(pickle.dumps(flowchart))
+    assert restored.fingerprint() == fingerprint
+    restored.nodes[0].name = "x"
+    assert restored.fingerprint() != fingerprint
+
+
+def test_other_diagrams():
+    """Test fingerprints of Gantt charts and entity relation diagrams."""
+
+    def gantt():
+        task = GanttTask("Design", "2024-01-01", "3d", tags=["active"])
+        return Gantt("Plan", sections=[GanttSection("Phase 1", [task])])
+
+    first, second = gantt(), gantt()
+    assert first == second
+    first.sections[0].tasks[0].tags.append("crit")
+    assert first != second
+
+    def diagram():
+        er = EntityRelationDiagram()
+        er.add_entity("Customer", [Field("string", "name", primary_key=True)])
+        er.add_entity("Order", [Field("int", "total")])
+        er.add_relationship(
+            er.entities[0],
+            er.entities[1],
+            RelationshipType.ONE,
+            RelationshipType.ZERO_OR_MORE,
+            "places",
+        )
+        return er
+
+    first_er, second_er = diagram(), diagram()
+    assert first_er == second_er
+    assert first_er != first
+    first_er.entities[1].name = "Invoice"
+    assert first_er != second_er
@@ -0,0 +1,74 @@
+import json
+import logging
+
+import pytest
+
+from barnacleboy import instrumentation
+from barnacleboy.mermaid.flowchart import Flowchart
+
+
+@pytest.fixture
+def sink_events():
+    return []
+
+
+@pytest.fixture
+def tracer(sink_events):
+    yield instrumentation.enable(sink_events.append)
+    instrumentation.disable()
+
+
+def test_disabled_is_noop():
+    """Test that spans and counters do nothing when disabled."""
+    assert instrumentation.get_tracer() is None
+    assert instrumentation.span("test") is instrumentation.span("other")
+    instrumentation.count("test")
+
+
+def test_spans_and_counters(tracer, sink_events):
+    """Test that spans nest and counters accumulate."""
+    with instrumentation.span("outer", diagram="flowchart"):
+        with instrumentation.span("inner"):
+            instrumentation.count("elements_rendered", 3)
+        instrumentation.count("elements_rendered", 2)
+
+    spans = [event for event in tracer.events if event.kind == "span"]
+    assert [(span.name, span.depth) for span in spans] == [("inner", 1), ("outer", 0)]
+    assert spans[1].attributes == {"diagram": "flowchart"}
+    assert tracer.counters["elements_rendered"] == 5
+    assert sink_events == tracer.events
+
+
+def test_flowchart_render_is_traced(tracer, tmp_path):
+    """Test that rendering and saving a flowchart emit spans and counters."""
+    flowchart = Flowchart()
+    anakin = flowchart.create_node("Anakin Skywalker")
+    vader = flowchart.create_node("Darth Vader")
+    flowchart.create_relationship([anakin, vader])
+
+    flowchart.save(tmp_path / "flowchart.html")
+
+    totals = tracer.totals()
+    for name in ("save", "save_html.template", "save_html.write", "render.flowchart"):
+        assert name in totals
+    assert tracer.counters["elements_rendered"] == 3
+    assert tracer.counters["bytes_written"] > 0
+
+    trace_file = tmp_path / "trace.json"
+    tracer.dump_json(trace_file)
+    trace = json.loads(trace_file.read_text())
+    assert {span["name"] for span in trace["spans"]} >= set(totals)
+    assert trace["counters"]["elements_rendered"] == 3
+
+
+def test_logging_sink(caplog):
+    """Test that the logging sink logs spans."""
+    instrumentation.enable(instrumentation.LoggingSink(level=logging.INFO))
+    try:
+        with caplog.at_level(logging.INFO, logger="barnacleboy"):
+            with instrumentation.span("export"):
+                pass
+    finally:
+        instrumentation.disable()
+
+    assert "export took" in caplog.text
@@ -0,0 +1,92 @@
+import io
+
+import pytest
+
+from barnacleboy.mermaid.flowchart import Flowchart
+from barnacleboy.mermaid.mapped import MappedFlowchart, write_mapped
+
+NAMES = ["Anakin", "Darth Vader", "Luke (Tatooine)", 'Leia "Princess"', "Yoda"]
+EDGES = [(0, 1), (1, 2), (1, 3), (4, 2)]
+
+
+@pytest.fixture
+def mapped(tmp_path):
+    nodes_path, edges_path = tmp_path / "nodes.bin", tmp_path / "edges.bin"
+    assert write_mapped(nodes_path, edges_path, iter(NAMES), iter(EDGES)) == (5, 4)
+    return Flowchart.from_mmap(nodes_path, edges_path, orientation="LR")
+
+
+def test_from_mmap(mapped):
+    """Test that a mapped flowchart renders like a regular flowchart."""
+    assert isinstance(mapped, MappedFlowchart)
+    assert [mapped.name(index) for index in mapped.nodes()] == NAMES
+    assert list(mapped.edges()) == EDGES
+    assert str(mapped).split("\n")[1:] == [
+        "graph LR",
+        '    N0("Anakin")',
+        '    N1("Darth Vader")',
+        '    N2("Luke (Tatooine)")',
+        '    N3("Leia #quot;Princess#quot;")',
+        '    N4("Yoda")',
+        "",
+        "    N0--->N1",
+        "    N1--->N2",
+        "    N1--->N3",
+        "    N4--->N2",
+        "",
+    ]
+
+
+def test_write(mapped, tmp_path):
+    output = io.StringIO()
+    mapped.write(output)
+    mapped.write(tmp_path / "graph.mmd")
+
+    assert output.getvalue() == str(mapped)
+    assert (tmp_path / "graph.mmd").read_text() == str(mapped)
+
+
+def test_fingerprint(mapped, tmp_path):
+    copy_nodes, copy_edges = tmp_path / "copy_nodes.bin", tmp_path / "copy_edges.bin"
+    write_mapped(copy_nodes, copy_edges, iter(NAMES), iter(EDGES))
+    copy = Flowchart.from_mmap(copy_nodes, copy_edges, orientation="LR")
+
+    assert copy == mapped
+    assert copy.filter(min_degree=2) == mapped.filter(min_degree=2)
+    assert copy.filter(min_degree=2) != mapped
+    copy.orientation = "TB"
+    assert copy != mapped
+
+
+def test_filters(mapped):
+    """Test that filters select nodes and keep edges between them."""
+    skywalkers = mapped.filter(pattern="^(Anakin|Luke|Darth)")
+    assert list(skywalkers.nodes()) == [0, 1, 2]
+    assert list(skywalkers.edges()) == [(0, 1), (1, 2)]
+    assert list(skywalkers.filter(min_degree=2).nodes()) == [1]
+    assert list(mapped.filter(max_degree=1).nodes()) == [0, 3, 4]
+
+    assert list(mapped.top_degree(2).nodes()) == [1, 2]
+    assert list(mapped.neighborhood(["Yoda"], depth=1).nodes()) == [2, 4]
+    assert list(mapped.neighborhood([4], depth=2).nodes()) == [1, 2, 4]
+    assert list(mapped.nodes()) == [0, 1, 2, 3, 4]
+
+
+def test_invalid(tmp_path):
+    with pytest.raises(ValueError):
+        write_mapped(tmp_path / "n", tmp_path / "e", ["a"], [(0, 1)])
+    (tmp_path / "n").write_bytes(b"\x00" * 64)
+    with pytest.raises(ValueError):
+        MappedFlowchart(tmp_path / "n", tmp_path / "n")
+
+
+def test_close(mapped):
+    with mapped as flowchart:
+        view = flowchart.filter(min_degree=2)
+        assert list(view.nodes()) == [1, 2]
+    assert all(file.map.closed for file in mapped._files)
+    with pytest.raises(ValueError):
+        mapped.name(0)
+    with pytest.raises(ValueError):
+        list(view.edges())
+    mapped.close()
@@ -0,0 +1,88 @@
+import pickle
+
+from barnacleboy.mermaid.flowchart import Flowchart, Relationship
+
+
+def build_part(services, edges, group=None):
+    """Build a part of a graph as a worker process would, and send it back."""
+    flowchart = Flowchart()
+    nodes = {name: flowchart.create_node(name) for name in services}
+    flowchart.add_relationships(
+        [Relationship([nodes[s], nodes[t]], output_arrow=">") for s, t in edges]
+    )
+    if group:
+        flowchart.create_subgraph(group, [nodes[name] for name in services[:2]])
+    return pickle.loads(pickle.dumps(flowchart))
+
+
+def test_merge():
+    """Test that merged parts share nodes and keep their relationships in order."""
+    first = build_part(
+        ["api", "auth", "db"], [("api", "auth"), ("auth", "db")], group="edge"
+    )
+    second = build_part(["auth", "db", "queue"], [("auth", "db"), ("db", "queue")])
+    third = build_part(["api", "worker"], [("api", "worker")], group="edge")
+    first_output = str(first)
+
+    merged = Flowchart.merge(first, second, third)
+
+    assert [node.name for node in merged.nodes] == [
+        "api",
+        "auth",
+        "db",
+        "queue",
+        "worker",
+    ]
+    assert len({node._internal_id for node in merged.nodes}) == 5
+    assert [(r.entities[0].name, r.entities[1].name) for r in merged.relationships] == [
+        ("api", "auth"),
+        ("auth", "db"),
+        ("db", "queue"),
+        ("api", "worker"),
+    ]
+    assert len(merged.subgraphs) == 1
+    assert [e.name for e in merged.subgraphs[0].entities] == ["api", "auth", "worker"]
+    assert merged.parent(merged.nodes[4]) is merged.subgraphs[0]
+    assert str(first) == first_output
+
+
+def test_merge_key():
+    """Test that nodes are matched with a custom key."""
+    first = build_part(["API"], [])
+    second = build_part(["api"], [])
+
+    assert len(Flowchart.merge(first, second).nodes) == 2
+    merged = Flowchart.merge(first, second, key=lambda node: node.name.lower())
+    assert [node.name for node in merged.nodes] == ["API"]
+
+
+def test_merge_classes():
+    """Test that clashing class names are renamed when merging."""
+    first = build_part(["api", "db"], [])
+    first.define_class("hot", {"fill": "#f00"})
+    first.assign_class(first.nodes[:1], "hot")
+    second = build_part(["db", "queue"], [])
+    second.define_class("hot", {"fill": "#f90"})
+    second.define_class("cold", {"fill": "#00f"})
+    second.assign_class(second.nodes, "hot")
+    third = build_part(["cache"], [])
+    third.define_class("hot", {"fill": "#f90"})
+    third.assign_class(third.nodes, "hot")
+
+    merged = Flowchart.merge(first, second, third)
+
+    assert merged.class_defs == {
+        "hot": {"fill": "#f00"},
+        "hot_2": {"fill": "#f90"},
+        "cold": {"fill": "#00f"},
+    }
+    assert [node.class_name for node in merged.nodes] == [
+        "hot",
+        "hot_2",
+        "hot_2",
+        "hot_2",
+    ]
+    lines = str(merged).splitlines()
+    assert "    classDef hot fill:#f00" in lines
+    assert "    classDef hot_2 fill:#f90" in lines
+    assert first.class_defs == {"hot": {"fill": "#f00"}}
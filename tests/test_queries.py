@@ -0,0 +1,120 @@
+import pytest
+
+from barnacleboy.mermaid.flowchart import Flowchart, Relationship
+
+
+def build_flowchart():
+    """Build a chain of services with a cycle and a detached node."""
+    flowchart = Flowchart()
+    names = ["gateway", "auth", "orders", "db", "cache", "audit"]
+    nodes = {name: flowchart.create_node(name) for name in names}
+    edges = [
+        ("gateway", "auth"),
+        ("gateway", "orders"),
+        ("orders", "db"),
+        ("orders", "cache"),
+        ("cache", "db"),
+        ("db", "orders"),
+    ]
+    flowchart.add_relationships([Relationship([nodes[s], nodes[t]]) for s, t in edges])
+    flowchart.create_subgraph("storage", [nodes["db"], nodes["cache"]])
+    return flowchart, nodes
+
+
+def names(flowchart):
+    return sorted(node.name for node in flowchart.nodes)
+
+
+def test_traversals():
+    flowchart, nodes = build_flowchart()
+
+    assert names(flowchart.descendants(nodes["orders"])) == [
+        "cache",
+        "db",
+        "orders",
+    ]
+    assert names(flowchart.ancestors(nodes["db"], depth=1)) == [
+        "cache",
+        "db",
+        "orders",
+    ]
+    assert names(flowchart.neighbors(nodes["auth"], depth=2)) == [
+        "auth",
+        "gateway",
+        "orders",
+    ]
+    assert names(flowchart.neighbors(nodes["audit"])) == ["audit"]
+
+
+def test_induced_subchart_shares_elements():
+    flowchart, nodes = build_flowchart()
+
+    subchart = flowchart.induced_subchart([nodes["db"], nodes["orders"]])
+
+    assert subchart.nodes == [nodes["orders"], nodes["db"]]
+    assert [r.entities for r in subchart.relationships] == [
+        [nodes["orders"], nodes["db"]],
+        [nodes["db"], nodes["orders"]],
+    ]
+    assert all(r in flowchart.relationships for r in subchart.relationships)
+    # The subgraph is copied without the cache.
+    assert [s.entities for s in subchart.subgraphs] == [[nodes["db"]]]
+    assert flowchart.subgraphs[0].entities == [nodes["db"], nodes["cache"]]
+    assert "(cache)" not in str(subchart)
+    assert str(nodes["db"]) in str(subchart)
+
+
+def test_induced_subchart_nested_subgraphs():
+    """Test that subgraphs around selected nodes are copied with their nesting."""
+    flowchart = Flowchart()
+    a, b, c = (flowchart.create_node(name) for name in "abc")
+    inner = flowchart.create_subgraph("inner", [a, b])
+    outer = flowchart.create_subgraph("outer", [inner, c])
+
+    subchart = flowchart.induced_subchart([a, c])
+
+    inner_copy, outer_copy = subchart.subgraphs
+    assert inner_copy.entities == [a]
+    assert outer_copy.entities == [inner_copy, c]
+    assert subchart.parent(a) is inner_copy
+    assert subchart.parent(inner_copy) is outer_copy
+    assert flowchart.parent(a) is inner
+    assert outer.entities == [inner, c]
+
+
+def test_adding_to_subchart_keeps_original_ids():
+    flowchart, nodes = build_flowchart()
+    original = str(flowchart)
+    subchart = flowchart.induced_subchart([nodes["db"], nodes["orders"]])
+
+    extra = [subchart.create_node(f"replica {idx}") for idx in range(30)]
+    subchart.create_subgraph("replicas", extra)
+    subchart.create_relationship([nodes["db"], extra[0]])
+
+    assert str(flowchart) == original
+    ids = [entity._internal_id for entity in subchart.nodes + subchart.subgraphs]
+    assert len(set(ids)) == len(ids)
+    assert str(nodes["db"]) in str(subchart)
+
+
+def test_shortest_path():
+    flowchart, nodes = build_flowchart()
+
+    path = flowchart.shortest_path(nodes["gateway"], nodes["db"])
+
+    assert names(path) == ["db", "gateway", "orders"]
+    assert len(path.relationships) == 2
+    with pytest.raises(ValueError):
+        flowchart.shortest_path(nodes["db"], nodes["gateway"])
+    assert len(flowchart.shortest_path(nodes["db"], nodes["gateway"], False).nodes) == 3
+
+
+def test_index_follows_appended_elements():
+    flowchart, nodes = build_flowchart()
+    assert names(flowchart.descendants(nodes["audit"])) == ["audit"]
+
+    flowchart.create_relationship([nodes["audit"], nodes["db"]])
+
+    assert "db" in names(flowchart.descendants(nodes["audit"]))
+    with pytest.raises(ValueError):
+        flowchart.neighbors(Flowchart().create_node("elsewhere"))
@@ -0,0 +1,154 @@
+from barnacleboy.mermaid.flowchart import Flowchart, Node, Relationship
+from barnacleboy.mermaid.reduction import (
+    collapse_chains,
+    collapse_hubs,
+    fold_communities,
+    fold_components,
+    transitive_reduction,
+)
+
+
+def build_flowchart(names, edges):
+    nodes = {name: Node(name) for name in names}
+    relationships = [
+        Relationship([nodes[source], nodes[target]], output_arrow=">")
+        for source, target in edges
+    ]
+    return Flowchart(nodes=list(nodes.values()), relationships=relationships), nodes
+
+
+def edge_names(flowchart):
+    return {
+        (relationship.entities[0].name, relationship.entities[1].name)
+        for relationship in flowchart.relationships
+    }
+
+
+def test_transitive_reduction():
+    """Test that implied relationships are removed, but cycles are kept."""
+    flowchart, _ = build_flowchart(
+        "ABCDEF",
+        [("A", "B"), ("B", "C"), ("A", "C"), ("D", "E"), ("E", "D"), ("D", "F")],
+    )
+    original = str(flowchart)
+
+    reduced, report = transitive_reduction(flowchart)
+
+    assert edge_names(reduced) == {
+        ("A", "B"),
+        ("B", "C"),
+        ("D", "E"),
+        ("E", "D"),
+        ("D", "F"),
+    }
+    assert len(report.removed_relationships) == 1
+    assert str(flowchart) == original
+
+
+def test_transitive_reduction_depth():
+    """Test that the search depth limits which relationships are removed."""
+    flowchart, _ = build_flowchart(
+        "ABCD", [("A", "B"), ("B", "C"), ("C", "D"), ("A", "D")]
+    )
+
+    assert len(transitive_reduction(flowchart)[0].relationships) == 4
+    assert len(transitive_reduction(flowchart, max_depth=None)[0].relationships) == 3
+
+
+def test_transitive_reduction_self_loop():
+    """Test that a relationship to itself is not taken for an alternative path."""
+    flowchart, _ = build_flowchart("ABC", [("A", "A"), ("A", "B"), ("C", "A")])
+
+    reduced, report = transitive_reduction(flowchart, max_depth=None)
+
+    assert edge_names(reduced) == {("A", "A"), ("A", "B"), ("C", "A")}
+    assert report.removed_relationships == []
+
+
+def test_collapse_chains():
+    """Test that linear chains are collapsed into a single node."""
+    flowchart, nodes = build_flowchart(
+        "SABCT", [("S", "A"), ("A", "B"), ("B", "C"), ("C", "T"), ("S", "T")]
+    )
+
+    reduced, report = collapse_chains(flowchart)
+
+    assert len(reduced.nodes) == 3
+    assert [collapse.members for collapse in report.collapses] == [
+        [nodes["A"], nodes["B"], nodes["C"]]
+    ]
+    replacement = report.collapses[0].replacement.name
+    assert edge_names(reduced) == {("S", replacement), (replacement, "T"), ("S", "T")}
+    assert "A ... C (3 nodes)" in str(reduced)
+
+
+def test_reduced_labels_are_quoted():
+    """Test that labels of collapsed and folded nodes render as quoted text."""
+    chain, _ = build_flowchart(
+        "SABCT", [("S", "A"), ("A", "B"), ("B", "C"), ("C", "T"), ("S", "T")]
+    )
+    cycle, _ = build_flowchart("ABCD", [("A", "B"), ("B", "C"), ("C", "A")])
+
+    chains, _ = collapse_chains(chain)
+    cycles, _ = fold_components(cycle)
+
+    chain_lines = [line.strip() for line in str(chains).splitlines()]
+    cycle_lines = [line.strip() for line in str(cycles).splitlines()]
+    assert any(line.endswith('[["A ... C (3 nodes)"]]') for line in chain_lines)
+    assert any(line.endswith('["Cycle: A (3 nodes)"]') for line in cycle_lines)
+
+
+def test_collapse_hubs():
+    """Test that the leaves of a hub are collapsed."""
+    names = ["hub"] + [f"leaf {idx}" for idx in range(30)] + ["other"]
+    edges = [("hub", f"leaf {idx}") for idx in range(30)] + [("hub", "other")]
+    edges += [("other", "hub")]
+    flowchart, _ = build_flowchart(names, edges)
+
+    reduced, report = collapse_hubs(flowchart, max_degree=10)
+
+    assert [node.name for node in reduced.nodes] == ["hub", "other", "30 nodes"]
+    assert report.summary() == {"hub": 30, "removed_relationships": 0}
+    assert len(reduced.relationships) == 3
+
+
+def test_fold_components():
+    """Test that cycles are folded into subgraphs."""
+    flowchart, nodes = build_flowchart(
+        "ABCD", [("A", "B"), ("B", "C"), ("C", "A"), ("C", "D")]
+    )
+
+    reduced, report = fold_components(flowchart)
+
+    assert len(reduced.subgraphs) == 1
+    assert reduced.subgraphs[0].entities == [nodes["A"], nodes["B"], nodes["C"]]
+    assert reduced.parent(nodes["A"]) is reduced.subgraphs[0]
+    assert flowchart.parent(nodes["A"]) is None
+    assert report.collapses[0].kind == "component"
+
+
+def test_fold_communities():
+    """Test that two loosely connected cliques are folded separately."""
+    edges = [(a, b) for a in "ABCD" for b in "ABCD" if a < b]
+    edges += [(a, b) for a in "EFGH" for b in "EFGH" if a < b]
+    flowchart, _ = build_flowchart("ABCDEFGH", edges + [("D", "E")])
+
+    reduced, report = fold_communities(flowchart)
+
+    assert sorted(len(subgraph.entities) for subgraph in reduced.subgraphs) == [4, 4]
+    assert report.summary()["community"] == 8
+
+
+def test_flowchart_reduce():
+    """Test that passes are combined and the original IDs are kept."""
+    flowchart, nodes = build_flowchart(
+        "SABCT", [("S", "A"), ("A", "B"), ("B", "C"), ("C", "T"), ("S", "B")]
+    )
+    ids = [node._internal_id for node in flowchart.nodes]
+
+    reduced, report = flowchart.reduce(transitive=True, chains=True)
+
+    assert [node._internal_id for node in flowchart.nodes] == ids
+    assert nodes["S"]._internal_id == "A"
+    assert len({node._internal_id for node in reduced.nodes}) == len(reduced.nodes)
+    assert report.summary() == {"chain": 3, "removed_relationships": 1}
@@ -0,0 +1,249 @@
+import http.client
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+from barnacleboy.mermaid.piechart import Piechart
+from barnacleboy.mermaid.rendering import (
+    HttpRenderer,
+    RenderError,
+    RenderSupervisor,
+    WorkerPoolRenderer,
+    get_renderer,
+)
+
+pytestmark = pytest.mark.skipif(os.name != "posix", reason="Uses POSIX scripts.")
+
+HEADER = f"""#!{sys.executable}
+import os, subprocess, sys, time
+output = sys.argv[sys.argv.index("-o") + 1]
+state = output + ".attempts"
+attempt = int(open(state).read()) + 1 if os.path.exists(state) else 1
+open(state, "w").write(str(attempt))
+"""
+
+
+def fake_mmdc(tmp_path, body):
+    """Write an executable that pretends to be mermaid-cli."""
+    path = tmp_path / "mmdc"
+    path.write_text(HEADER + body)
+    path.chmod(0o755)
+    return str(path)
+
+
+def test_render(tmp_path):
+    command = fake_mmdc(tmp_path, "open(output, 'w').write(open(sys.argv[2]).read())")
+    piechart = Piechart("Snacks", {"Bantha": 2})
+
+    piechart.save_image(tmp_path / "pie.svg", RenderSupervisor(command))
+
+    assert (tmp_path / "pie.svg").read_text() == str(piechart)
+
+
+def test_render_timeout_kills_process_group(tmp_path):
+    command = fake_mmdc(
+        tmp_path,
+        "child = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(60)'])\n"
+        "open(output + '.child', 'w').write(str(child.pid))\n"
+        "time.sleep(60)\n",
+    )
+    supervisor = RenderSupervisor(command, timeout=0.5, retries=0)
+    output = tmp_path / "graph.png"
+
+    start = time.perf_counter()
+    with pytest.raises(RenderError) as error:
+        supervisor.render("graph TB", output)
+
+    assert error.value.reason == "timeout"
+    assert time.perf_counter() - start < 10
+    child = int(Path(f"{output}.child").read_text())
+    status = Path(f"/proc/{child}/status")
+    for _ in range(100):
+        if not status.exists() or "zombie" in status.read_text():
+            break
+        time.sleep(0.05)
+    else:
+        pytest.fail("The child of mermaid-cli is still running.")
+
+
+def test_render_retries_with_backoff(tmp_path):
+    command = fake_mmdc(
+        tmp_path,
+        "if attempt < 3:\n"
+        "    os.kill(os.getpid(), 9)\n"
+        "open(output, 'w').write('ok')\n",
+    )
+    delays = []
+    supervisor = RenderSupervisor(command, retries=2, backoff=0.5, sleep=delays.append)
+
+    supervisor.render("graph TB", tmp_path / "graph.png")
+
+    assert delays == [0.5, 1.0]
+
+
+def test_render_failure_reasons(tmp_path):
+    command = fake_mmdc(tmp_path, "sys.exit('Parse error on line 1')")
+    supervisor = RenderSupervisor(command, retries=1, backoff=0, sleep=lambda _: None)
+
+    with pytest.raises(RenderError) as error:
+        supervisor.render("graph TB", tmp_path / "graph.png")
+    assert (error.value.reason, error.value.returncode) == ("exit", 1)
+    # Exits are deterministic, e.g. syntax errors, so they are not retried.
+    assert error.value.attempts == 1
+    assert "Parse error on line 1" in error.value.stderr
+
+    command = fake_mmdc(tmp_path, "os.kill(os.getpid(), 9)")
+    with pytest.raises(RenderError) as error:
+        RenderSupervisor(command, retries=0).render("graph TB", tmp_path / "a.png")
+    assert error.value.reason == "signal"
+
+    command = fake_mmdc(tmp_path, "pass")
+    with pytest.raises(RenderError) as error:
+        RenderSupervisor(command, retries=0).render("graph TB", tmp_path / "b.png")
+    assert error.value.reason == "no_output"
+
+    with pytest.raises(RenderError) as error:
+        RenderSupervisor(str(tmp_path / "missing")).render("graph TB", "c.png")
+    assert error.value.reason == "not_found"
+
+
+def test_render_memory_limit(tmp_path):
+    command = fake_mmdc(tmp_path, "data = bytearray(2 * 1024 ** 3)")
+    supervisor = RenderSupervisor(command, memory_limit=512 * 1024**2, retries=0)
+
+    with pytest.raises(RenderError) as error:
+        supervisor.render("graph TB", tmp_path / "graph.png")
+
+    assert error.value.reason == "memory"
+
+
+class KrokiHandler(BaseHTTPRequestHandler):
+    """A stand-in for Kroki that wraps diagrams in an svg element."""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        self.server.requests.append((self.path, self.client_address[1]))
+        if self.path.startswith("/broken/"):
+            status, data = 400, b"Syntax error"
+        elif self.path.startswith("/slow/"):
+            time.sleep(1)
+            status, data = 200, b""
+        else:
+            status, data = 200, b"<svg>" + body + b"</svg>"
+            time.sleep(0.05)
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+        # Drop keep-alive connections without telling the client.
+        self.close_connection = self.server.drop_connections
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def kroki():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), KrokiHandler)
+    server.requests = []
+    server.drop_connections = False
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_http_renderer(kroki, tmp_path):
+    url = f"http://127.0.0.1:{kroki.server_port}/kroki"
+    renderer = HttpRenderer(url, pool_size=2)
+    piechart = Piechart("Snacks", {"Bantha": 2})
+
+    piechart.save_image(tmp_path / "pie.svg", renderer)
+    assert (tmp_path / "pie.svg").read_text() == f"<svg>{piechart}</svg>"
+    assert kroki.requests[0][0] == "/kroki/mermaid/svg"
+
+    # Concurrent renders share at most two keep-alive connections.
+    texts = [f"graph TB\n    A{i}" for i in range(8)]
+    with ThreadPoolExecutor(8) as executor:
+        images = list(executor.map(lambda t: renderer.render_bytes(t, ".svg"), texts))
+    assert images == [f"<svg>{text}</svg>".encode() for text in texts]
+    assert len({port for _, port in kroki.requests}) <= 2
+
+    # Connections the server dropped are replaced.
+    kroki.drop_connections = True
+    for _ in range(3):
+        assert renderer.render_bytes("graph TB", ".svg") == b"<svg>graph TB</svg>"
+
+    with pytest.raises(RenderError) as error:
+        HttpRenderer(url.replace("kroki", "broken")).render_bytes("graph TB", ".svg")
+    assert (error.value.reason, error.value.returncode) == ("http", 400)
+    assert error.value.stderr == "Syntax error"
+    with pytest.raises(ValueError):
+        renderer.render_bytes("graph TB", ".md")
+    renderer.close()
+
+
+def test_http_renderer_failures(kroki, monkeypatch):
+    url = f"http://127.0.0.1:{kroki.server_port}"
+    renderer = HttpRenderer(url, pool_size=1, timeout=0.3)
+    renderer.render_bytes("graph TB", ".svg")
+
+    # A timeout on a reused connection is not retried on a new one.
+    renderer._path = "/slow"
+    with pytest.raises(RenderError) as error:
+        renderer.render_bytes("graph TB", ".svg")
+    assert error.value.reason == "timeout"
+    assert len(kroki.requests) == 2
+
+    # Connections are closed on any error, not returned to the pool.
+    closed = []
+    monkeypatch.setattr(http.client.HTTPConnection, "close", lambda c: closed.append(c))
+
+    def interrupt(connection, path, body):
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(HttpRenderer, "_request", staticmethod(interrupt))
+    with pytest.raises(KeyboardInterrupt):
+        renderer.render_bytes("graph TB", ".svg")
+    assert len(closed) == 1
+    assert renderer._idle.empty()
+
+
+def test_worker_pool_renderer(kroki, tmp_path):
+    url = f"http://127.0.0.1:{kroki.server_port}"
+    renderer = WorkerPoolRenderer(HttpRenderer(url), workers=2)
+    try:
+        futures = [
+            renderer.submit(f"graph TB\n    A{i}", tmp_path / f"{i}.svg")
+            for i in range(4)
+        ]
+        for future in futures:
+            future.result()
+        assert (tmp_path / "3.svg").read_text() == "<svg>graph TB\n    A3</svg>"
+        assert renderer.render_bytes("graph LR", ".svg") == b"<svg>graph LR</svg>"
+
+        command = fake_mmdc(tmp_path, "sys.exit('Parse error')")
+        failing = WorkerPoolRenderer(RenderSupervisor(command, retries=0), workers=1)
+        with pytest.raises(RenderError) as error:
+            failing.render("graph TB", tmp_path / "graph.png")
+        assert error.value.reason == "exit"
+        assert "Parse error" in error.value.stderr
+        failing.close()
+    finally:
+        renderer.close()
+
+
+def test_get_renderer(monkeypatch):
+    assert isinstance(get_renderer("mmdc"), RenderSupervisor)
+    assert get_renderer("http") is get_renderer("http")
+    with pytest.raises(ValueError):
+        get_renderer("mermaid.ink")
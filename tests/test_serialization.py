@@ -0,0 +1,121 @@
+import copy
+import pickle
+
+import pytest
+
+from barnacleboy.mermaid.flowchart import (
+    Flowchart,
+    Node,
+    NodeShape,
+    Relationship,
+    Subgraph,
+)
+from barnacleboy.mermaid.serialization import from_buffers, to_buffers
+
+
+def build_flowchart():
+    flowchart = Flowchart(title="The Empire", primaryColor="#ffffff")
+    flowchart.config = {"flowchart": {"curve": "basis"}}
+    vader = flowchart.create_node("Darth Vader", link="https://starwars.com")
+    sidious = flowchart.create_node("Darth Sidious", NodeShape.HEXAGON)
+    tarkin = flowchart.create_node("Tarkin", style={"fill": "#f00"})
+    sith = flowchart.create_subgraph("Sith", [vader, sidious])
+    flowchart.create_subgraph("Empire", [sith, tarkin])
+    flowchart.define_class("sith", {"stroke": "#000"})
+    flowchart.assign_class([vader, sidious], "sith")
+    flowchart.create_relationship(
+        [sidious, vader], style="THICK", output_arrow=">", label="Commands"
+    )
+    flowchart.relationships.append(Relationship([tarkin, sith], input_arrow="<"))
+    return flowchart
+
+
+def test_to_bytes():
+    """Test that a flowchart survives encoding unchanged."""
+    flowchart = build_flowchart()
+
+    decoded = Flowchart.from_bytes(flowchart.to_bytes())
+
+    assert str(decoded) == str(flowchart)
+    assert decoded.parent(decoded.nodes[0]) is decoded.subgraphs[0]
+    assert decoded.nodes[2].style == {"fill": "#f00"}
+    assert decoded._theme is flowchart._theme
+
+
+@pytest.mark.parametrize("protocol", range(2, pickle.HIGHEST_PROTOCOL + 1))
+def test_pickle(protocol):
+    flowchart = build_flowchart()
+
+    assert str(pickle.loads(pickle.dumps(flowchart, protocol))) == str(flowchart)
+
+
+def test_pickle_entities_outside_lists():
+    """Test that flowcharts that cannot be encoded are still pickled and copied."""
+    flowchart = Flowchart()
+    vader = flowchart.create_node("Darth Vader")
+    flowchart.subgraphs.append(Subgraph("Empire", [Subgraph("Sith", [vader])]))
+    flowchart.relationships.append(Relationship([vader, Node("Luke")]))
+    flowchart.set_internal_ids()
+    flowchart.relationships[0].entities[1]._internal_id = "L"
+
+    with pytest.raises(ValueError):
+        flowchart.to_bytes()
+    assert str(pickle.loads(pickle.dumps(flowchart))) == str(flowchart)
+    assert str(copy.deepcopy(flowchart)) == str(flowchart)
+
+
+def test_pickle_keeps_identity():
+    """Test that nodes pickled with their flowchart stay the same objects."""
+    flowchart = build_flowchart()
+    node = flowchart.nodes[0]
+
+    restored, restored_node = pickle.loads(pickle.dumps((flowchart, node)))
+
+    assert restored.nodes[0] is restored_node
+    assert restored.parent(restored_node) is restored.subgraphs[0]
+    assert restored.relationships[0].entities[1] is restored_node
+
+
+def test_buffers_out_of_band():
+    """Test that the tables can be pickled as out-of-band buffers."""
+    flowchart = build_flowchart()
+    meta, columns = to_buffers(flowchart)
+    buffers = []
+
+    data = pickle.dumps(
+        (meta, [pickle.PickleBuffer(column) for column in columns]),
+        5,
+        buffer_callback=buffers.append,
+    )
+    meta, columns = pickle.loads(data, buffers=buffers)
+
+    assert len(buffers) > 1
+    assert str(from_buffers(meta, *columns)) == str(flowchart)
+
+
+def test_encoding_size():
+    """Test that encoded flowcharts are smaller than their pickles."""
+    nodes = [Node(f"node {idx}") for idx in range(1000)]
+    flowchart = Flowchart(nodes=nodes)
+    for source, target in zip(nodes, nodes[1:]):
+        flowchart.create_relationship([source, target], output_arrow=">")
+
+    assert len(flowchart.to_bytes()) < len(pickle.dumps(flowchart, 5)) / 2
+
+
+def test_derived_ids():
+    """Test that internal IDs of derived flowcharts are preserved."""
+    flowchart = build_flowchart()
+    derived = flowchart.derive(flowchart.nodes[2:], [])
+
+    assert str(Flowchart.from_bytes(derived.to_bytes())) == str(derived)
+
+
+def test_invalid():
+    flowchart = build_flowchart()
+    flowchart.subgraphs[0].entities.append(Node("Stranger"))
+
+    with pytest.raises(ValueError):
+        flowchart.to_bytes()
+    with pytest.raises(ValueError):
+        Flowchart.from_bytes(b"not a flowchart")
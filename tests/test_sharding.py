@@ -0,0 +1,108 @@
+import random
+
+import pytest
+
+from barnacleboy.mermaid.flowchart import Flowchart, Node, Relationship
+
+
+def build_flowchart(n_components, component_size):
+    flowchart = Flowchart(title="Galaxy")
+    for component in range(n_components):
+        nodes = [
+            flowchart.create_node(f"planet {component}.{idx}")
+            for idx in range(component_size)
+        ]
+        for source, target in zip(nodes, nodes[1:]):
+            flowchart.create_relationship([source, target], output_arrow=">")
+    return flowchart
+
+
+def test_shard_components():
+    """Test that connected components are packed into shards."""
+    flowchart = build_flowchart(n_components=6, component_size=4)
+
+    shards = flowchart.shard(max_nodes=8)
+
+    assert len(shards) == 3
+    assert all(len(shard.flowchart.nodes) == 8 for shard in shards)
+    assert all(not shard.stubs for shard in shards)
+    assert sum(len(shard.flowchart.relationships) for shard in shards) == 18
+
+
+def test_shard_edge_cut_stubs():
+    """Test that relationships across shards are replaced by linked stubs."""
+    flowchart = build_flowchart(n_components=1, component_size=10)
+    original = str(flowchart)
+
+    shards = flowchart.shard(max_nodes=5, strategy="edge_cut")
+
+    assert len(shards) == 2
+    first, second = shards
+    assert list(first.stubs.values()) == [1]
+    assert list(second.stubs.values()) == [0]
+    assert '>"planet 0.5 (page 2)"]' in str(first.flowchart)
+    assert first.flowchart.title == "Galaxy (1/2)"
+    assert str(flowchart) == original
+
+
+def test_shard_edge_cut_max_nodes():
+    """Test that cutting subgraphs of several nodes never overfills a shard."""
+    rng = random.Random(0)
+    for _ in range(40):
+        flowchart = Flowchart()
+        previous = None
+        for idx in range(rng.randrange(5, 15)):
+            nodes = [
+                flowchart.create_node(f"moon {idx}.{member}")
+                for member in range(rng.choice([1, 1, 3, 4]))
+            ]
+            if len(nodes) > 1:
+                flowchart.create_subgraph(f"planet {idx}", nodes)
+            if previous is not None:
+                flowchart.create_relationship([previous, nodes[0]])
+            previous = nodes[0]
+
+        shards = flowchart.shard(max_nodes=10, strategy="edge_cut")
+
+        assert all(
+            len(shard.flowchart.nodes) - len(shard.stubs) <= 10 for shard in shards
+        )
+
+
+def test_shard_subgraphs():
+    """Test that every top-level subgraph gets its own shard."""
+    flowchart = build_flowchart(n_components=1, component_size=4)
+    first, second, third, fourth = flowchart.nodes
+    flowchart.create_subgraph("Core", [first, second])
+    flowchart.create_subgraph("Rim", [third, fourth])
+
+    shards = flowchart.shard(strategy="subgraphs")
+
+    assert [shard.flowchart.subgraphs[0].name for shard in shards] == ["Core", "Rim"]
+    assert len(shards[0].stubs) == 1
+
+
+def test_shard_max_chars():
+    """Test that shards are split further to fit in the text size."""
+    flowchart = build_flowchart(n_components=1, component_size=40)
+
+    shards = flowchart.shard(max_nodes=100, max_chars=1000)
+
+    assert len(shards) > 1
+    assert all(len(str(shard.flowchart)) < 1500 for shard in shards)
+
+
+def test_shard_invalid_strategy():
+    with pytest.raises(ValueError):
+        build_flowchart(1, 2).shard(strategy="random")
+
+
+def test_shard_save(tmp_path):
+    """Test that shards are saved with links and an index page."""
+    flowchart = build_flowchart(n_components=1, component_size=10)
+
+    index = flowchart.shard(max_nodes=5, strategy="edge_cut").save(tmp_path)
+
+    assert index.read_text().count("<li>") == 2
+    assert 'href "shard_1.html"' in (tmp_path / "shard_0.html").read_text()
+    assert 'href "shard_0.html"' in (tmp_path / "shard_1.html").read_text()
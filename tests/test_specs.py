@@ -0,0 +1,183 @@
+import io
+import json
+
+import pytest
+
+from barnacleboy.mermaid import specs
+from barnacleboy.mermaid.er_diagram import EntityRelationDiagram
+from barnacleboy.mermaid.flowchart import Flowchart
+from barnacleboy.mermaid.gitgraph import GitGraph
+from barnacleboy.mermaid.piechart import Piechart
+from barnacleboy.mermaid.specs import SpecError
+from barnacleboy.mermaid.user_journey import UserJourney
+
+FLOWCHART = [
+    {"type": "flowchart", "orientation": "LR", "theme": "dark"},
+    {"kind": "node", "id": "vader", "name": "Darth Vader"},
+    {"kind": "node", "id": "luke", "name": "Luke Skywalker", "shape": "HEXAGON"},
+    {"kind": "subgraph", "id": "family", "name": "Skywalkers", "members": ["luke"]},
+    {"kind": "edge", "source": "vader", "target": "family", "label": "Father of"},
+]
+
+
+def write_ndjson(path, records):
+    path.write_text("\n".join(json.dumps(record) for record in records) + "\n")
+    return path
+
+
+def test_load_ndjson(tmp_path):
+    """Test loading a flowchart from NDJSON."""
+    flowchart = specs.load(write_ndjson(tmp_path / "spec.ndjson", FLOWCHART))
+
+    assert isinstance(flowchart, Flowchart)
+    assert flowchart.orientation == "LR"
+    assert flowchart.theme == "dark"
+    assert [node.name for node in flowchart.nodes] == ["Darth Vader", "Luke Skywalker"]
+    assert flowchart.parent(flowchart.nodes[1]) is flowchart.subgraphs[0]
+    assert str(flowchart.relationships[0]) == "A---|Father of|C"
+
+
+def test_load_json(tmp_path, monkeypatch):
+    """Test that JSON specs are read in chunks and give the same diagram."""
+    monkeypatch.setattr(specs, "CHUNK_SIZE", 7)
+    document = {**FLOWCHART[0], "elements": FLOWCHART[1:]}
+    path = tmp_path / "spec.json"
+    path.write_text(json.dumps(document, indent=2))
+
+    from_json = specs.load(path)
+    from_ndjson = specs.load(write_ndjson(tmp_path / "spec.jsonl", FLOWCHART))
+
+    assert str(from_json) == str(from_ndjson)
+    assert str(specs.loads(json.dumps({"type": "piechart", "title": "Empty"})))
+
+
+def test_load_json_literal_across_chunks(tmp_path, monkeypatch):
+    """Test that literals split by the end of a chunk are read."""
+    monkeypatch.setattr(specs, "CHUNK_SIZE", 16)
+    element = {"kind": "node", "id": "a", "name": "A", "link": None}
+    expected = None
+    for padding in range(1, specs.CHUNK_SIZE + 1):
+        document = {"type": "flowchart", "title": "x" * padding, "elements": [element]}
+        path = tmp_path / "spec.json"
+        path.write_text(json.dumps(document))
+        flowchart = specs.load(path)
+        assert flowchart.nodes[0].link is None
+        text = str(flowchart).replace("x" * padding, "")
+        assert expected is None or text == expected
+        expected = text
+
+
+def test_load_json_error_fails_fast(monkeypatch):
+    """Test that an invalid element fails without reading the rest of the file."""
+    monkeypatch.setattr(specs, "CHUNK_SIZE", 64)
+    element = json.dumps({"kind": "node", "id": "a", "name": "A"})
+    file = io.StringIO(
+        '{"type": "flowchart", "elements": [{"kind": "node",]}, '
+        + ", ".join([element] * 10000)
+        + "]}"
+    )
+
+    with pytest.raises(SpecError, match="line 1"):
+        specs.load(file)
+    assert file.tell() <= specs.CHUNK_SIZE
+
+
+def test_load_other_diagrams():
+    """Test loading every other diagram type."""
+    er = specs.loads(
+        json.dumps(
+            {
+                "type": "er_diagram",
+                "elements": [
+                    {"kind": "entity", "name": "Jedi"},
+                    {
+                        "kind": "entity",
+                        "name": "Padawan",
+                        "attributes": [
+                            {"type": "int", "name": "id", "primary_key": True}
+                        ],
+                    },
+                    {
+                        "kind": "relationship",
+                        "source": "Jedi",
+                        "target": "Padawan",
+                        "source_cardinality": "ONE",
+                        "target_cardinality": "ZERO_OR_MORE",
+                        "label": "trains",
+                    },
+                ],
+            }
+        )
+    )
+    git = specs.load_lines(
+        [
+            '{"type": "gitgraph", "main_branch_name": "main"}',
+            '{"kind": "commit", "id": "a"}',
+            '{"kind": "branch", "name": "develop"}',
+            '{"kind": "commit", "type": "HIGHLIGHT"}',
+            '{"kind": "checkout", "branch": "main"}',
+            '{"kind": "merge", "branch": "develop"}',
+        ]
+    )
+    pie = specs.load_lines(
+        [
+            '{"type": "piechart", "title": "Pets"}',
+            '{"kind": "slice", "label": "Dogs", "value": 3}',
+            '{"kind": "slice", "label": "Cats", "value": 2.5}',
+        ]
+    )
+    journey = specs.load_lines(
+        [
+            '{"type": "user_journey", "title": "Day"}',
+            '{"kind": "section", "title": "Morning"}',
+            '{"kind": "task", "description": "Coffee", "rating": 5, "people": ["Me"]}',
+        ]
+    )
+
+    assert isinstance(er, EntityRelationDiagram)
+    assert str(er.relationships[0]) == "Jedi||--o{Padawan : trains"
+    assert isinstance(git, GitGraph)
+    assert git.log[-1] == "merge develop"
+    assert isinstance(pie, Piechart)
+    assert pie.data == {"Dogs": 3, "Cats": 2.5}
+    assert isinstance(journey, UserJourney)
+    assert str(journey.sections[0].tasks[0]) == "Coffee: 5: Me"
+
+
+@pytest.mark.parametrize(
+    "element, line, field",
+    [
+        ({"kind": "node", "id": "vader"}, 6, "id"),
+        ({"kind": "node", "id": "leia", "shape": "SQUARE"}, 6, "shape"),
+        ({"kind": "node", "id": "leia", "colour": "red"}, 6, "colour"),
+        ({"kind": "node", "id": 3}, 6, "id"),
+        ({"kind": "edge", "source": "vader", "target": "leia"}, 6, "target"),
+        ({"kind": "edge", "source": "vader", "target": "luke", "style": 1}, 6, "style"),
+        ({"kind": "subgraph", "id": "twins", "members": ["luke"]}, 6, "members"),
+        ({"kind": "droid", "id": "r2"}, 6, "kind"),
+    ],
+)
+def test_errors(element, line, field):
+    """Test that errors report the line and field of the problem."""
+    lines = [json.dumps(record) for record in FLOWCHART + [element]]
+
+    with pytest.raises(SpecError) as error:
+        specs.load_lines(lines)
+
+    assert error.value.line == line
+    assert error.value.field == field
+
+
+def test_json_errors():
+    with pytest.raises(SpecError, match="line 3"):
+        specs.loads('{"type": "flowchart",\n"elements": [\n{"kind": "node"}]}')
+    with pytest.raises(SpecError, match="line 2"):
+        specs.loads('{"type": "flowchart", "elements": [\n{"kind": "node",]}')
+    with pytest.raises(SpecError, match="precede"):
+        specs.loads('{"elements": [], "type": "flowchart"}')
+    with pytest.raises(SpecError, match="Unsupported"):
+        specs.loads('{"type": "sequence"}')
+    with pytest.raises(SpecError, match="theme"):
+        specs.loads('{"type": "flowchart", "theme_variables": {"fontSize": -1}}')
+    with pytest.raises(SpecError, match="header"):
+        specs.load_lines(['{"kind": "node", "id": "a"}'])